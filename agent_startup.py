@@ -0,0 +1,71 @@
+"""
+Startup helpers shared by the LangChain and LlamaIndex agent REPLs.
+
+StartupProfile records a timeline of the import and initialization steps
+(printed with --profile-startup). ainput() reads a line on a daemon thread so
+the prompt can be shown while the MCP server and LLM client are still
+starting in the background.
+"""
+import asyncio
+import contextlib
+import threading
+import time
+
+# Reference point for the timeline: when this module was first imported
+STARTED = time.perf_counter()
+
+
+class StartupProfile:
+    """
+    Timeline of startup steps (milliseconds since launch).
+
+    Args:
+        enabled: When False, recording is skipped and report() prints nothing.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.events = []
+
+    @contextlib.contextmanager
+    def span(self, label: str):
+        """Record how long the enclosed block took (also works around `await`)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if self.enabled:
+                self.events.append((start - STARTED, time.perf_counter() - start, label))
+
+    def mark(self, label: str):
+        """Record a point in time, e.g. "prompt ready" """
+        if self.enabled:
+            self.events.append((time.perf_counter() - STARTED, None, label))
+
+    def report(self):
+        if not self.enabled:
+            return
+        print("\nStartup profile (ms since launch, spans can overlap):")
+        for start, duration, label in sorted(self.events):
+            length = f"+{duration * 1000:8.1f}" if duration is not None else " " * 9
+            print(f"  {start * 1000:8.1f} {length}  {label}")
+
+
+async def ainput(prompt: str = "") -> str:
+    """
+    input() that doesn't block the event loop. A daemon thread is used so a
+    pending read never keeps the interpreter alive on exit.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def read():
+        try:
+            result = input(prompt)
+        except BaseException as e:  # EOFError / KeyboardInterrupt are re-raised in the caller
+            loop.call_soon_threadsafe(lambda error=e: future.done() or future.set_exception(error))
+        else:
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(result))
+
+    threading.Thread(target=read, daemon=True).start()
+    return await future
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Load generator for the multi-session agent service.
+
+Starts everything locally: the OpenWeatherMap stand-in, one MCP server over
+streamable HTTP, and weather_agent_langchain/service.py with the scripted
+stand-in model (so no Gemini quota is used). It then simulates many users.
+Each user is a session with its own thread that asks a few weather
+questions in sequence, and a number of sessions run at once.
+
+It reports sessions/sec, turns/sec, p50/p95/p99 turn latency and how many
+requests were turned away with 503 (backpressure). Rejected turns are retried
+after the Retry-After delay. Results are written to benchmarks/results/.
+
+Usage:
+    python benchmarks/bench_agent_service.py
+    python benchmarks/bench_agent_service.py --sessions 500 --concurrency 200 --max-in-flight 32 --llm-latency-ms 300
+"""
+import argparse
+import asyncio
+import json
+import os
+import pathlib
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+from bench_mcp import RESULTS_DIR, SERVER_PATH, free_port, git_revision, percentile, server_env, start_standin
+
+REPO_ROOT = pathlib.Path(__file__).parent.parent
+SERVICE_PATH = REPO_ROOT / "weather_agent_langchain" / "service.py"
+
+QUESTIONS = [
+    "What's the weather in {city}?",
+    "How is the weather in {city} today?",
+    "Compare the weather between {city} and {other}",
+]
+CITIES = ["London", "Paris", "New York", "Tokyo", "Sydney", "Seattle", "Portland", "Austin", "Denver", "Omaha"]
+
+
+async def wait_until_ready(url: str, timeout: float = 30.0):
+    deadline = time.time() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.time() < deadline:
+            try:
+                if (await client.get(url)).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"{url} did not become ready")
+
+
+async def wait_for_port(port: int, timeout: float = 30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"Nothing listening on port {port}")
+
+
+async def run_session(client, service_url: str, session_index: int, turns: int, stats: dict):
+    user_id = f"loadtest-{session_index}"
+    for turn in range(turns):
+        city = CITIES[(session_index + turn) % len(CITIES)]
+        other = CITIES[(session_index + turn + 3) % len(CITIES)]
+        message = QUESTIONS[turn % len(QUESTIONS)].format(city=city, other=other)
+        while True:
+            started = time.perf_counter()
+            try:
+                response = await client.post(f"{service_url}/chat", json={"user_id": user_id, "message": message})
+            except httpx.TransportError:
+                response = None
+                break
+            if response.status_code == 503:
+                stats["rejected"] += 1
+                await asyncio.sleep(float(response.headers.get("Retry-After", "1")))
+                continue
+            break
+        if response is not None and response.status_code == 200:
+            stats["latencies"].append(time.perf_counter() - started)
+        else:
+            stats["errors"] += 1
+
+
+async def run_load(service_url: str, sessions: int, concurrency: int, turns: int) -> dict:
+    stats = {"latencies": [], "rejected": 0, "errors": 0}
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(limits=limits, timeout=120) as client:
+        async def limited(index):
+            async with semaphore:
+                await run_session(client, service_url, index, turns, stats)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(limited(index) for index in range(sessions)))
+        elapsed = time.perf_counter() - started
+        health = (await client.get(f"{service_url}/health")).json()
+
+    latencies = sorted(stats["latencies"])
+    return {
+        "sessions": sessions,
+        "concurrency": concurrency,
+        "turns_per_session": turns,
+        "elapsed_seconds": round(elapsed, 3),
+        "sessions_per_sec": round(sessions / elapsed, 2),
+        "turns_per_sec": round(len(latencies) / elapsed, 2),
+        "latency_ms": {
+            name: round(percentile(latencies, pct) * 1000, 1) if latencies else None
+            for name, pct in (("p50", 50), ("p95", 95), ("p99", 99))
+        },
+        "rejected_503": stats["rejected"],
+        "errors": stats["errors"],
+        "service": health,
+    }
+
+
+async def run_benchmark(args) -> dict:
+    processes = []
+    standin, base_url = start_standin(args)
+    processes.append(standin)
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir, open(os.devnull, "w") as devnull:
+            mcp_port, service_port = free_port(), free_port()
+            processes.append(subprocess.Popen(
+                [sys.executable, str(SERVER_PATH), "--transport", "streamable-http", "--port", str(mcp_port)],
+                env=server_env(base_url, cache_dir, cold=False), stdout=devnull, stderr=devnull,
+            ))
+            await wait_for_port(mcp_port)
+
+            processes.append(subprocess.Popen(
+                [sys.executable, str(SERVICE_PATH), "--port", str(service_port),
+                 "--server-url", f"http://127.0.0.1:{mcp_port}/mcp",
+                 "--max-in-flight", str(args.max_in_flight), "--max-queued", str(args.max_queued),
+                 "--llm-standin", "--llm-standin-latency-ms", str(args.llm_latency_ms)],
+                stdout=devnull, stderr=devnull,
+            ))
+            service_url = f"http://127.0.0.1:{service_port}"
+            await wait_until_ready(f"{service_url}/health")
+
+            result = await run_load(service_url, args.sessions, args.concurrency, args.turns)
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            process.wait()
+
+    latency = result["latency_ms"]
+    print(f"sessions={result['sessions']} concurrency={result['concurrency']} "
+          f"sessions/sec={result['sessions_per_sec']} turns/sec={result['turns_per_sec']}")
+    print(f"    latency p50={latency['p50']}ms p95={latency['p95']}ms p99={latency['p99']}ms "
+          f"rejected(503)={result['rejected_503']} errors={result['errors']}")
+
+    return {
+        "benchmark": "agent_service_load",
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {
+            "max_in_flight": args.max_in_flight,
+            "max_queued": args.max_queued,
+            "llm_latency_ms": args.llm_latency_ms,
+            "upstream_latency_ms": args.upstream_latency_ms,
+        },
+        "result": result,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the multi-session agent service")
+    parser.add_argument("--sessions", type=int, default=200, help="Simulated user sessions")
+    parser.add_argument("--concurrency", type=int, default=50, help="Sessions active at the same time")
+    parser.add_argument("--turns", type=int, default=3, help="Questions per session")
+    parser.add_argument("--max-in-flight", type=int, default=32, help="Service's concurrent turn limit")
+    parser.add_argument("--max-queued", type=int, default=128, help="Service's wait queue size")
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0, help="Stand-in model delay per call")
+    parser.add_argument("--upstream-latency-ms", type=float, default=50.0,
+                        help="Latency added by the OpenWeatherMap stand-in")
+    parser.add_argument("--output", type=pathlib.Path, help="Where to write the JSON results")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_benchmark(args))
+
+    output = args.output or RESULTS_DIR / f"bench_agent_service-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"\nResults saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark for the LangChain agent's conversation checkpointers.
+
+Drives a graph shaped like the agent's (chat node -> tool node -> chat node,
+with the same state and token-budgeted history window) through many turns,
+with a fake model and a fake weather tool so no API keys or servers are
+needed. It samples the process RSS as it goes.
+
+Each backend runs in its own subprocess so their memory doesn't mix (only
+sqlite runs by default; MemorySaver would need gigabytes for 10k turns):
+
+- memory: LangGraph's MemorySaver (the default without --checkpoint-db)
+- sqlite: CompactingSqliteSaver (weather_agent_langchain/checkpointer.py)
+
+For the sqlite backend it also reopens the database afterwards and checks
+that every thread can be resumed. Results are written to benchmarks/results/.
+
+Usage:
+    python benchmarks/bench_checkpointer.py
+    python benchmarks/bench_checkpointer.py --turns 2000 --backends memory sqlite
+"""
+import argparse
+import asyncio
+import json
+import os
+import pathlib
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+REPO_ROOT = pathlib.Path(__file__).parent.parent
+AGENT_DIR = REPO_ROOT / "weather_agent_langchain"
+RESULTS_DIR = pathlib.Path(__file__).parent / "results"
+
+# Roughly the size of a get_weather report
+FAKE_REPORT = json.dumps({
+    "location": "Paris, FR",
+    "current_weather": {"temperature_celsius": 18.2, "description": "scattered clouds", "humidity": 61},
+    "today_forecast": {"min_temp": 11.0, "max_temp": 21.4, "precipitation_probability": 20},
+    "hourly": [{"hour": h, "temp": 15 + h % 7, "pop": h % 3 * 10} for h in range(24)],
+})
+
+
+def rss_mb() -> float:
+    """Current resident set size (falls back to the peak where /proc isn't available)"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return round(int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20, 1)
+    except OSError:
+        scale = 2**20 if sys.platform == "darwin" else 2**10
+        return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1)
+
+
+def build_graph(checkpointer):
+    """The agent's graph shape with a scripted model and weather tool"""
+    sys.path.insert(0, str(AGENT_DIR))
+    from langchain_core.messages import AIMessage, ToolMessage
+    from langgraph.graph import END, START, StateGraph
+    from langgraph.prebuilt import tools_condition
+    from history import ConversationWindow
+    from graph import State, build_system_context
+
+    window = ConversationWindow()
+
+    async def chat_node(state):
+        messages, removed = window.prepare(state["messages"])
+        update = {}
+        if removed:
+            update["earlier"] = window.earlier_questions(state.get("earlier"), removed)
+        build_system_context({**state, **update})
+        if isinstance(messages[-1], ToolMessage):
+            response = AIMessage("It's 18°C with scattered clouds in Paris; 20% chance of rain today.")
+        else:
+            response = AIMessage("", tool_calls=[{
+                "name": "get_weather", "args": {"location": "Paris"}, "id": f"call-{len(messages)}"
+            }])
+        update["messages"] = window.removals(removed) + [response]
+        return update
+
+    async def tool_node(state):
+        call = state["messages"][-1].tool_calls[0]
+        return {"messages": [ToolMessage(FAKE_REPORT, tool_call_id=call["id"], name=call["name"])]}
+
+    graph = StateGraph(State)
+    graph.add_node("chat_node", chat_node)
+    graph.add_node("tool_node", tool_node)
+    graph.add_edge(START, "chat_node")
+    graph.add_conditional_edges("chat_node", tools_condition, {"tools": "tool_node", "__end__": END})
+    graph.add_edge("tool_node", "chat_node")
+    return graph.compile(checkpointer=checkpointer)
+
+
+async def run_backend(backend: str, turns: int, threads: int, db_path: str) -> dict:
+    """Run all turns against one backend (called inside the worker subprocess)"""
+    sys.path.insert(0, str(AGENT_DIR))
+    from langgraph.checkpoint.memory import MemorySaver
+    from checkpointer import open_checkpointer
+
+    samples = []
+    started = time.perf_counter()
+    store = open_checkpointer(db_path) if backend == "sqlite" else None
+    checkpointer = await store.__aenter__() if store else MemorySaver()
+    try:
+        graph = build_graph(checkpointer)
+        sample_every = max(1, turns // 20)
+        for turn in range(1, turns + 1):
+            config = {"configurable": {"thread_id": f"user-{turn % threads}"}}
+            await graph.ainvoke({"messages": [("user", f"What's the weather in Paris? (turn {turn})")]}, config)
+            if turn % sample_every == 0 or turn == 1:
+                samples.append({"turn": turn, "rss_mb": rss_mb()})
+        elapsed = time.perf_counter() - started
+        saver_stats = checkpointer.stats() if backend == "sqlite" else {}
+        if saver_stats:
+            # Every turn loads its thread's latest checkpoint; a write-through hot set serves nearly all of them
+            lookups = saver_stats["hot_hits"] + saver_stats["hot_misses"]
+            saver_stats["hot_hit_ratio"] = round(saver_stats["hot_hits"] / lookups, 3) if lookups else None
+    finally:
+        if store:
+            await store.__aexit__(None, None, None)
+
+    result = {
+        "backend": backend,
+        "turns": turns,
+        "threads": threads,
+        "turns_per_sec": round(turns / elapsed, 1),
+        "rss_samples": samples,
+        "saver": saver_stats,
+    }
+    if backend == "sqlite":
+        # Simulate a restart: reopen the database and resume every thread
+        async with open_checkpointer(db_path) as reopened:
+            graph = build_graph(reopened)
+            resumed = 0
+            for thread in range(threads):
+                state = await graph.aget_state({"configurable": {"thread_id": f"user-{thread}"}})
+                resumed += bool(state.values.get("messages"))
+        result["threads_resumed_after_restart"] = resumed
+        result["db_size_mb"] = round(os.path.getsize(db_path) / 2**20, 2)
+    return result
+
+
+def run_in_subprocess(backend: str, args, db_path: str) -> dict:
+    command = [sys.executable, __file__, "--worker", backend, "--turns", str(args.turns),
+               "--threads", str(args.threads), "--db", db_path]
+    completed = subprocess.run(command, capture_output=True, text=True, check=True)
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RSS benchmark for the agent's conversation checkpointers")
+    parser.add_argument("--turns", type=int, default=10000, help="Agent turns per backend")
+    parser.add_argument("--threads", type=int, default=10, help="Conversations the turns are spread across")
+    parser.add_argument("--backends", nargs="+", choices=["memory", "sqlite"], default=["sqlite"],
+                        help="MemorySaver grows by roughly 0.2MB per turn; compare with fewer --turns")
+    parser.add_argument("--output", type=pathlib.Path, help="Where to write the JSON results")
+    parser.add_argument("--worker", choices=["memory", "sqlite"], help=argparse.SUPPRESS)
+    parser.add_argument("--db", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(asyncio.run(run_backend(args.worker, args.turns, args.threads, args.db))))
+        return
+
+    runs = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in args.backends:
+            result = run_in_subprocess(backend, args, os.path.join(tmp, f"{backend}.sqlite"))
+            runs.append(result)
+            samples = result["rss_samples"]
+            print(f"{backend:<7} turns/sec={result['turns_per_sec']:<8} "
+                  f"rss first={samples[0]['rss_mb']}MB mid={samples[len(samples) // 2]['rss_mb']}MB "
+                  f"last={samples[-1]['rss_mb']}MB")
+            if backend == "sqlite":
+                saver = result["saver"]
+                print(f"        db={result['db_size_mb']}MB resumed={result['threads_resumed_after_restart']}"
+                      f"/{args.threads} hot hits={saver['hot_hits']} misses={saver['hot_misses']} "
+                      f"hit_ratio={saver['hot_hit_ratio']} saver={saver}")
+
+    results = {
+        "benchmark": "agent_checkpointer_rss",
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "runs": runs,
+    }
+    output = args.output or RESULTS_DIR / f"bench_checkpointer-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"\nResults saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
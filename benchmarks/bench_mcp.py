@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+End-to-end latency/throughput benchmark for the weather MCP server.
+
+Starts the OpenWeatherMap stand-in (owm_standin/server.py), launches
+mcp_server/main.py over stdio exactly like the agents do, and drives
+`get_weather` through a ClientSession at several concurrency levels.
+
+For each level it reports p50/p95/p99 latency, calls/sec and a per-stage
+breakdown (stdio JSON-RPC overhead vs. geocoding, One Call and formatting,
+taken from the server's metrics://stages resource). Results are written
+to benchmarks/results/ as JSON; pass --baseline to compare against an
+earlier run.
+
+Usage:
+    python benchmarks/bench_mcp.py
+    python benchmarks/bench_mcp.py --concurrency 1 8 32 --calls 200 --cold --upstream-latency-ms 80
+    python benchmarks/bench_mcp.py --baseline benchmarks/results/<earlier>.json --fail-on-regression 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import pathlib
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+
+REPO_ROOT = pathlib.Path(__file__).parent.parent
+SERVER_PATH = REPO_ROOT / "mcp_server" / "main.py"
+STANDIN_PATH = REPO_ROOT / "owm_standin" / "server.py"
+RESULTS_DIR = pathlib.Path(__file__).parent / "results"
+
+WARM_LOCATIONS = ["London", "Paris", "New York", "Tokyo", "Sydney", "Seattle", "Austin", "Denver"]
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def start_standin(args) -> tuple[subprocess.Popen, str]:
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, str(STANDIN_PATH), "--port", str(port),
+         "--latency-ms", str(args.upstream_latency_ms), "--seed", "1"],
+        stdout=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return process, base_url
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError("OpenWeatherMap stand-in did not start")
+
+
+def server_env(base_url: str, cache_dir: str, cold: bool) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "OWM_BASE_URL": base_url,
+        "OPENWEATHERMAP_API_KEY": "benchmark",
+        "GEOCODE_CACHE_PATH": os.path.join(cache_dir, "geocode.sqlite3"),
+        "QUOTA_LEDGER_PATH": os.path.join(cache_dir, "quota.sqlite3"),
+        "ONECALL_DAILY_QUOTA": str(10 ** 9),
+        "OWM_CALLS_PER_MINUTE": str(10 ** 9),
+        "OWM_BURST": str(10 ** 6),
+    })
+    if cold:
+        # Every call goes upstream: no forecast reuse (locations are unique, so no geocode reuse either)
+        env.update({"FORECAST_TTL_CURRENT_SECONDS": "0", "FORECAST_MAX_STALE_SECONDS": "0"})
+    return env
+
+
+async def read_stages(session) -> dict:
+    response = await session.read_resource("metrics://stages")
+    return json.loads(response.contents[0].text)
+
+
+def stage_breakdown(before: dict, after: dict) -> dict:
+    """Mean milliseconds per stage between two metrics://stages snapshots"""
+    breakdown = {}
+    for stage, totals in after.items():
+        previous = before.get(stage, {"count": 0, "total_ms": 0.0})
+        count = totals["count"] - previous["count"]
+        if count:
+            breakdown[stage] = round((totals["total_ms"] - previous["total_ms"]) / count, 3)
+    return breakdown
+
+
+async def run_level(session, concurrency: int, calls: int, cold: bool, level_index: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one_call(i):
+        nonlocal errors
+        if cold:
+            location = f"Benchcity{level_index}x{i}"
+        else:
+            location = WARM_LOCATIONS[i % len(WARM_LOCATIONS)]
+        async with semaphore:
+            start = time.perf_counter()
+            result = await session.call_tool("get_weather", {"location": location})
+            latencies.append(time.perf_counter() - start)
+        if result.isError or '"error"' in result.content[0].text:
+            errors += 1
+
+    before = await read_stages(session)
+    started = time.perf_counter()
+    await asyncio.gather(*(one_call(i) for i in range(calls)))
+    elapsed = time.perf_counter() - started
+    stages = stage_breakdown(before, await read_stages(session))
+
+    latencies.sort()
+    mean_ms = sum(latencies) / len(latencies) * 1000
+    if "get_weather" in stages:
+        # Whatever the server didn't spend inside the tool went to stdio JSON-RPC and (de)serialization
+        stages["rpc_overhead"] = round(mean_ms - stages["get_weather"], 3)
+    return {
+        "concurrency": concurrency,
+        "calls": calls,
+        "errors": errors,
+        "calls_per_sec": round(calls / elapsed, 2),
+        "latency_ms": {
+            "mean": round(mean_ms, 3),
+            "p50": round(percentile(latencies, 50) * 1000, 3),
+            "p95": round(percentile(latencies, 95) * 1000, 3),
+            "p99": round(percentile(latencies, 99) * 1000, 3),
+            "max": round(latencies[-1] * 1000, 3),
+        },
+        "stage_mean_ms": stages,
+    }
+
+
+async def run_benchmark(args) -> dict:
+    standin, base_url = start_standin(args)
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            params = StdioServerParameters(
+                command=sys.executable,
+                args=[str(SERVER_PATH)],
+                env=server_env(base_url, cache_dir, args.cold),
+            )
+            # The server logs every request to stderr; keep benchmark output readable
+            with open(os.devnull, "w") as server_log:
+                async with stdio_client(params, errlog=server_log) as (read, write):
+                    async with ClientSession(read, write) as session:
+                        await session.initialize()
+                        # Warm up connections and (for warm runs) the caches
+                        for location in WARM_LOCATIONS:
+                            await session.call_tool("get_weather", {"location": location})
+
+                        levels = []
+                        for index, concurrency in enumerate(args.concurrency):
+                            level = await run_level(session, concurrency, args.calls, args.cold, index)
+                            levels.append(level)
+                            latency = level["latency_ms"]
+                            print(f"concurrency={concurrency:<4} calls/sec={level['calls_per_sec']:<9} "
+                                  f"p50={latency['p50']}ms p95={latency['p95']}ms p99={latency['p99']}ms "
+                                  f"errors={level['errors']}")
+                            print(f"    stages (mean ms): {level['stage_mean_ms']}")
+    finally:
+        standin.terminate()
+        standin.wait()
+
+    return {
+        "benchmark": "mcp_get_weather",
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {
+            "mode": "cold" if args.cold else "warm",
+            "calls_per_level": args.calls,
+            "upstream_latency_ms": args.upstream_latency_ms,
+        },
+        "levels": levels,
+    }
+
+
+def compare(results: dict, baseline: dict) -> float:
+    """Print p95/throughput deltas against a baseline; returns the worst p95 regression in percent"""
+    worst = 0.0
+    base_levels = {level["concurrency"]: level for level in baseline["levels"]}
+    print(f"\nComparison with baseline {baseline.get('git_revision')} ({baseline.get('timestamp')}):")
+    for level in results["levels"]:
+        base = base_levels.get(level["concurrency"])
+        if base is None:
+            continue
+        p95_delta = (level["latency_ms"]["p95"] / base["latency_ms"]["p95"] - 1) * 100
+        rate_delta = (level["calls_per_sec"] / base["calls_per_sec"] - 1) * 100
+        worst = max(worst, p95_delta)
+        print(f"  concurrency={level['concurrency']:<4} p95 {p95_delta:+.1f}%  calls/sec {rate_delta:+.1f}%")
+    return worst
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the weather MCP server over stdio")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--calls", type=int, default=200, help="get_weather calls per concurrency level")
+    parser.add_argument("--cold", action="store_true",
+                        help="Unique locations and no forecast caching, so every call goes upstream")
+    parser.add_argument("--upstream-latency-ms", type=float, default=50.0,
+                        help="Latency added by the OpenWeatherMap stand-in")
+    parser.add_argument("--output", type=pathlib.Path, help="Where to write the JSON results")
+    parser.add_argument("--baseline", type=pathlib.Path, help="Earlier results file to compare against")
+    parser.add_argument("--fail-on-regression", type=float, metavar="PCT",
+                        help="Exit non-zero if p95 regresses by more than PCT percent vs. the baseline")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_benchmark(args))
+
+    output = args.output or RESULTS_DIR / (
+        f"bench_mcp-{results['settings']['mode']}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"\nResults saved to {output}")
+
+    if args.baseline:
+        worst = compare(results, json.loads(args.baseline.read_text()))
+        if args.fail_on_regression is not None and worst > args.fail_on_regression:
+            print(f"p95 regressed by {worst:.1f}% (limit {args.fail_on_regression}%)")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
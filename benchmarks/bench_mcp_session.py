@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Per-call latency of the LlamaIndex agent's MCP client, before and after
+session reuse.
+
+- per_call: a new stdio server and session for every request, which is what
+  llama_index's BasicMCPClient does. The real BasicMCPClient is used when
+  llama_index is installed; otherwise the same open/initialize/call/close
+  sequence is done with the mcp SDK directly.
+- persistent: weather_agent_Llamaindex/mcp_session.py's PersistentMCPClient,
+  one session for all calls.
+
+Both call get_weather against the OpenWeatherMap stand-in with warm caches,
+so the numbers are dominated by the client's session handling. Afterwards the
+persistent client's server process is killed to measure how long the next
+call takes to recover (reconnect + retry). Results are written to
+benchmarks/results/.
+
+Usage:
+    python benchmarks/bench_mcp_session.py
+    python benchmarks/bench_mcp_session.py --calls 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import pathlib
+import platform
+import signal
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from bench_mcp import REPO_ROOT, RESULTS_DIR, SERVER_PATH, WARM_LOCATIONS, git_revision, percentile, server_env, start_standin
+
+sys.path.insert(0, str(REPO_ROOT / "weather_agent_Llamaindex"))
+from mcp_session import PersistentMCPClient
+
+
+class PerCallClient:
+    """BasicMCPClient's behaviour (new stdio server and session per request) using the mcp SDK"""
+
+    def __init__(self, command: str, args: list[str], env: dict):
+        self.command, self.args, self.env = command, args, env
+
+    async def call_tool(self, name: str, arguments: dict):
+        from mcp import ClientSession, StdioServerParameters
+        from mcp.client.stdio import stdio_client
+
+        parameters = StdioServerParameters(command=self.command, args=self.args, env=self.env)
+        async with stdio_client(parameters) as (read, write):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                return await session.call_tool(name, arguments)
+
+
+def per_call_client(env: dict):
+    try:
+        from llama_index.tools.mcp import BasicMCPClient
+    except ImportError:
+        return PerCallClient(sys.executable, [str(SERVER_PATH)], env), "mcp SDK (BasicMCPClient equivalent)"
+    return BasicMCPClient(sys.executable, args=[str(SERVER_PATH)], env=env), "llama_index BasicMCPClient"
+
+
+async def time_calls(client, calls: int) -> dict:
+    latencies = []
+    for index in range(calls):
+        started = time.perf_counter()
+        result = await client.call_tool("get_weather", {"location": WARM_LOCATIONS[index % len(WARM_LOCATIONS)]})
+        latencies.append(time.perf_counter() - started)
+        if result.isError:
+            raise RuntimeError(f"get_weather failed: {result.content}")
+    latencies.sort()
+    return {
+        "calls": calls,
+        "latency_ms": {
+            name: round(percentile(latencies, pct) * 1000, 2)
+            for name, pct in (("p50", 50), ("p95", 95), ("p99", 99))
+        },
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2),
+    }
+
+
+def child_pids() -> list[int]:
+    """Direct children of this process (the stdio MCP servers)"""
+    children = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as stat:
+                parent = int(stat.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        if parent == os.getpid():
+            children.append(int(entry))
+    return children
+
+
+async def measure_recovery(client: PersistentMCPClient, keep: int) -> dict | None:
+    """Kill the persistent client's server (every child but `keep`, the stand-in) and time the next call"""
+    if not os.path.isdir("/proc"):
+        return None
+    for pid in child_pids():
+        if pid != keep:
+            os.kill(pid, signal.SIGKILL)
+    started = time.perf_counter()
+    result = await client.call_tool("get_weather", {"location": WARM_LOCATIONS[0]})
+    return {
+        "first_call_after_server_killed_ms": round((time.perf_counter() - started) * 1000, 1),
+        "succeeded": not result.isError,
+        "client": client.stats(),
+    }
+
+
+async def run_benchmark(args) -> dict:
+    standin, base_url = start_standin(args)
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            env = server_env(base_url, cache_dir, cold=False)
+
+            before_client, before_kind = per_call_client(env)
+            before = await time_calls(before_client, args.per_call_calls)
+
+            async with PersistentMCPClient(sys.executable, args=[str(SERVER_PATH)], env=env) as client:
+                # First call pays for the server start; keep it out of the steady-state numbers
+                started = time.perf_counter()
+                await client.call_tool("get_weather", {"location": WARM_LOCATIONS[0]})
+                connect_ms = round((time.perf_counter() - started) * 1000, 1)
+                after = await time_calls(client, args.calls)
+                recovery = await measure_recovery(client, keep=standin.pid)
+    finally:
+        standin.terminate()
+        standin.wait()
+
+    after["first_call_ms"] = connect_ms
+    speedup = round(before["latency_ms"]["p50"] / after["latency_ms"]["p50"], 1)
+    print(f"per_call   ({before_kind}) p50={before['latency_ms']['p50']}ms p95={before['latency_ms']['p95']}ms")
+    print(f"persistent p50={after['latency_ms']['p50']}ms p95={after['latency_ms']['p95']}ms "
+          f"(first call {connect_ms}ms) -> {speedup}x faster at p50")
+    if recovery:
+        print(f"recovery   first call after the server was killed: "
+              f"{recovery['first_call_after_server_killed_ms']}ms, succeeded={recovery['succeeded']}")
+
+    return {
+        "benchmark": "llamaindex_mcp_session",
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "per_call": {"client": before_kind, **before},
+        "persistent": after,
+        "p50_speedup": speedup,
+        "recovery": recovery,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-call vs persistent MCP session latency")
+    parser.add_argument("--calls", type=int, default=200, help="Calls over the persistent session")
+    parser.add_argument("--per-call-calls", type=int, default=20,
+                        help="Calls with a new session each (every one starts a server)")
+    parser.add_argument("--upstream-latency-ms", type=float, default=0.0,
+                        help="Latency added by the OpenWeatherMap stand-in")
+    parser.add_argument("--output", type=pathlib.Path, help="Where to write the JSON results")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_benchmark(args))
+
+    output = args.output or RESULTS_DIR / f"bench_mcp_session-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"\nResults saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
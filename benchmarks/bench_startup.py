@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark for the two agent entry points.
+
+Launches each agent with --profile-startup, a placeholder Gemini key and a
+piped stdin, and measures from the outside:
+
+- time to prompt: launch until "You:" is printed (the user can type)
+- time to ready: launch until the agent reports it is ready to answer
+  (MCP server started, tools loaded, LLM client created)
+
+No questions are sent, so no API quota is used. The MCP server talks to the
+OpenWeatherMap stand-in. The agent's own timeline (--profile-startup) from the
+last run is saved with the results in benchmarks/results/.
+
+The LlamaIndex agent is skipped when llama_index isn't installed.
+
+Usage:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 10 --agents langchain
+"""
+import argparse
+import importlib.util
+import json
+import os
+import pathlib
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+from bench_mcp import REPO_ROOT, RESULTS_DIR, git_revision, server_env, start_standin
+
+AGENTS = {
+    "langchain": REPO_ROOT / "weather_agent_langchain" / "main.py",
+    "llamaindex": REPO_ROOT / "weather_agent_Llamaindex" / "main.py",
+}
+
+
+def run_once(script: pathlib.Path, env: dict, timeout: float) -> dict:
+    """Start one agent, wait for its prompt and its ready report, then quit"""
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, str(script), "--profile-startup"], cwd=script.parent, env=env,
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+    )
+    seen = {"prompt": None, "ready": None}
+    output = []
+    done = threading.Event()
+
+    def read():
+        # The prompt has no trailing newline, so read byte by byte
+        line = b""
+        while True:
+            byte = process.stdout.read(1)
+            if not byte:
+                break
+            line += byte
+            now = time.perf_counter() - started
+            if seen["prompt"] is None and line.endswith(b"You: "):
+                seen["prompt"] = now
+            if byte == b"\n":
+                text = line.decode(errors="replace").rstrip()
+                output.append(text)
+                if seen["ready"] is None and text.strip().endswith("agent ready"):
+                    seen["ready"] = now
+                line = b""
+                if seen["ready"] is not None:
+                    # "agent ready" is the last event of the profile, so the report is complete
+                    break
+        done.set()
+
+    threading.Thread(target=read, daemon=True).start()
+    done.wait(timeout)
+    try:
+        process.stdin.write(b"quit\n")
+        process.stdin.close()
+        process.wait(timeout=10)
+    except (OSError, subprocess.TimeoutExpired):
+        process.kill()
+        process.wait()
+
+    if seen["prompt"] is None or seen["ready"] is None:
+        raise RuntimeError(f"{script} did not report ready within {timeout}s:\n" + "\n".join(output[-20:]))
+    return {
+        "prompt_seconds": round(seen["prompt"], 3),
+        "ready_seconds": round(seen["ready"], 3),
+        "profile": [line.strip() for line in output if line.strip()[:1].isdigit()],
+    }
+
+
+def summarize(runs: list, key: str) -> dict:
+    values = [run[key] for run in runs]
+    return {"median": round(statistics.median(values), 3), "min": min(values), "max": max(values)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time to prompt and time to ready for the agents")
+    parser.add_argument("--runs", type=int, default=5, help="Launches per agent")
+    parser.add_argument("--agents", nargs="+", choices=list(AGENTS), default=list(AGENTS))
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds to wait for an agent to be ready")
+    parser.add_argument("--upstream-latency-ms", type=float, default=0.0,
+                        help="Latency added by the OpenWeatherMap stand-in")
+    parser.add_argument("--output", type=pathlib.Path, help="Where to write the JSON results")
+    args = parser.parse_args()
+
+    results = {}
+    standin, base_url = start_standin(args)
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            env = server_env(base_url, cache_dir, cold=False)
+            env.update({"GOOGLE_GEMINI_API_KEY": "benchmark", "PYTHONUNBUFFERED": "1"})
+            env.pop("WEATHER_MCP_URL", None)
+            for agent in args.agents:
+                if agent == "llamaindex" and importlib.util.find_spec("llama_index") is None:
+                    print(f"{agent:<11} skipped (llama_index is not installed)")
+                    results[agent] = {"skipped": "llama_index is not installed"}
+                    continue
+                runs = [run_once(AGENTS[agent], env, args.timeout) for _ in range(args.runs)]
+                results[agent] = {
+                    "prompt_seconds": summarize(runs, "prompt_seconds"),
+                    "ready_seconds": summarize(runs, "ready_seconds"),
+                    "runs": [{key: run[key] for key in ("prompt_seconds", "ready_seconds")} for run in runs],
+                    "last_profile": runs[-1]["profile"],
+                }
+                print(f"{agent:<11} prompt median={results[agent]['prompt_seconds']['median']}s "
+                      f"ready median={results[agent]['ready_seconds']['median']}s (runs={args.runs})")
+    finally:
+        standin.terminate()
+        standin.wait()
+
+    output = args.output or RESULTS_DIR / f"bench_startup-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({
+        "benchmark": "agent_startup",
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "agents": results,
+    }, indent=2))
+    print(f"\nResults saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Bulk weather enrichment for delivery logs.
+
+Reads a log of "Order #N: Delivered to City" lines, fetches weather once per
+unique destination city (concurrently, through the server's caches) and
+writes one enriched JSON object per order to a JSONL file.
+
+The log is streamed twice instead of being loaded: the first pass collects
+the unique cities, the second writes the enriched records. Memory therefore
+grows with the number of distinct cities, not with the length of the log.
+
+Usage:
+    python mcp_server/delivery_enrichment.py weather_agent_langchain/delivery_log.txt -o enriched.jsonl
+"""
+import asyncio
+import json
+import pathlib
+import re
+import time
+
+from geocode_cache import normalize_location
+
+DELIVERY_LINE = re.compile(r"^\s*Order\s+#(\d+)\s*:\s*Delivered to\s+(.+?)\s*$", re.IGNORECASE)
+
+
+def iter_deliveries(log_path):
+    """
+    Stream (order_id, city) pairs from a delivery log.
+    Lines that don't match the expected format yield (None, line).
+    """
+    with open(log_path, encoding="utf-8") as log_file:
+        for line in log_file:
+            if not line.strip():
+                continue
+            match = DELIVERY_LINE.match(line)
+            if match:
+                yield int(match.group(1)), match.group(2)
+            else:
+                yield None, line.strip()
+
+
+def summarize_report(report: dict) -> dict:
+    """Reduce a get_weather report to the fields that matter for a delivery"""
+    current = report.get("current_weather", {})
+    today = report.get("today_forecast", {})
+    summary = {
+        "location": report.get("location"),
+        "description": current.get("description"),
+        "temperature": current.get("temperature_celsius"),
+        "wind_speed": current.get("wind_speed_mps"),
+        "humidity": current.get("humidity"),
+        "precipitation_probability_today": today.get("precipitation_probability"),
+    }
+    if report.get("alerts"):
+        summary["alerts"] = [alert["event"] for alert in report["alerts"]]
+    return summary
+
+
+async def enrich_delivery_log(log_path, output_path, fetch_weather, max_concurrency: int = 10) -> dict:
+    """
+    Enrich every order in a delivery log with its destination's weather.
+
+    Args:
+        log_path: Delivery log to read.
+        output_path: JSONL file to write (one object per order).
+        fetch_weather: Coroutine function returning a get_weather report (or {"error": ...}).
+        max_concurrency: Maximum simultaneous weather lookups.
+
+    Returns:
+        A summary with line/order/city counts and the output path.
+    """
+    started = time.perf_counter()
+    log_path = pathlib.Path(log_path)
+    output_path = pathlib.Path(output_path)
+
+    # Pass 1: unique destinations (normalized, keeping the first spelling seen)
+    cities = {}
+    for order_id, city in iter_deliveries(log_path):
+        if order_id is not None:
+            cities.setdefault(normalize_location(city), city)
+
+    # Fetch each unique city exactly once
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def fetch_city(city):
+        async with semaphore:
+            report = await fetch_weather(city)
+        return {"error": report["error"]} if "error" in report else {"weather": summarize_report(report)}
+
+    results = await asyncio.gather(*(fetch_city(city) for city in cities.values()))
+    weather_by_city = dict(zip(cities.keys(), results))
+
+    # Pass 2: stream the log again and write one enriched record per order
+    lines = orders = malformed = 0
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as output_file:
+        for order_id, city in iter_deliveries(log_path):
+            lines += 1
+            if order_id is None:
+                malformed += 1
+                continue
+            orders += 1
+            record = {"order_id": order_id, "city": city}
+            record.update(weather_by_city[normalize_location(city)])
+            output_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    failed_cities = sum(1 for result in results if "error" in result)
+    return {
+        "output_path": str(output_path),
+        "lines": lines,
+        "orders": orders,
+        "malformed_lines": malformed,
+        "unique_cities": len(cities),
+        "cities_failed": failed_cities,
+        "elapsed_seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Enrich a delivery log with destination weather (JSONL output)")
+    parser.add_argument("log_path", help="Delivery log with 'Order #N: Delivered to City' lines")
+    parser.add_argument("-o", "--output", help="Output JSONL file (default: <log>.enriched.jsonl)")
+    parser.add_argument("--concurrency", type=int, default=10, help="Simultaneous weather lookups")
+    args = parser.parse_args()
+
+    # Imported here so the server module (and its caches) only load for CLI runs
+    import main as server
+
+    output = args.output or str(pathlib.Path(args.log_path).with_suffix(".enriched.jsonl"))
+    summary = asyncio.run(enrich_delivery_log(args.log_path, output, server.fetch_weather, args.concurrency))
+    print(json.dumps(summary, indent=2))
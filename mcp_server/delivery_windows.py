@@ -0,0 +1,171 @@
+"""
+Best delivery windows from the One Call hourly forecast.
+
+The 48-hour `hourly` array is loaded into NumPy arrays (temperature, chance of
+precipitation, wind, rain/snow volume) and scored without Python loops:
+
+1. Every hour gets a penalty per variable, scaled to 0-1 against the thresholds:
+   pop / max_pop, wind / max_wind, precipitation / max_rain_mm, and the distance
+   outside the ideal temperature band. An hour's score is 1 minus the weighted
+   mean of its penalties.
+2. An hour that breaks a hard threshold (pop, wind, precipitation or the
+   min/max temperature) is unsuitable. Windows that contain one are dropped.
+3. Window scores are rolling means of the hour scores, computed from a cumulative
+   sum. Per-window maxima and totals come from a sliding window view.
+
+Hours that have already ended are skipped (a cached payload can be over an
+hour old), so windows and the horizon start at the current hour. The best
+`top_k` non-overlapping windows are returned, with times in the location's
+local time.
+"""
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Relative importance of each penalty (normalized by their sum)
+DEFAULT_WEIGHTS = {
+    "pop": 0.4,
+    "rain": 0.25,
+    "wind": 0.2,
+    "temp": 0.15,
+}
+
+# Hard limits (an hour beyond any of them is unsuitable) and the ideal temperature band
+DEFAULT_THRESHOLDS = {
+    "max_pop": 60.0,        # % chance of precipitation
+    "max_wind": 12.0,       # m/s
+    "max_rain_mm": 2.0,     # rain + snow per hour
+    "min_temp": -10.0,      # °C
+    "max_temp": 38.0,       # °C
+    "ideal_min_temp": 5.0,  # °C, no temperature penalty inside the ideal band
+    "ideal_max_temp": 25.0,
+}
+
+# Degrees outside the ideal band at which the temperature penalty reaches 1
+TEMP_PENALTY_SPAN = 10.0
+
+
+def hourly_arrays(hourly: list[dict], horizon_hours: int = 48, now: float | None = None) -> dict:
+    """
+    Column arrays from the One Call `hourly` list: `horizon_hours` entries from the
+    hour in progress at `now` onwards. Missing wind or precipitation values count as 0.
+    """
+    now = time.time() if now is None else now
+    first = next((index for index, hour in enumerate(hourly) if hour["dt"] + 3600 > now), len(hourly))
+    hours = hourly[first:first + horizon_hours]
+    count = len(hours)
+
+    def column(values, dtype=np.float64):
+        return np.fromiter(values, dtype=dtype, count=count)
+
+    return {
+        "dt": column((hour["dt"] for hour in hours), np.int64),
+        "temp": column(hour["temp"] for hour in hours),
+        "pop": column(hour.get("pop", 0.0) * 100 for hour in hours),
+        "wind": column(hour.get("wind_speed", 0.0) for hour in hours),
+        "precip": column(
+            (hour.get("rain") or {}).get("1h", 0.0) + (hour.get("snow") or {}).get("1h", 0.0)
+            for hour in hours
+        ),
+    }
+
+
+def hour_scores(columns: dict, weights: dict, thresholds: dict) -> tuple[np.ndarray, np.ndarray]:
+    """Per-hour score (0-1, higher is better) and a mask of unsuitable hours"""
+    temp = columns["temp"]
+    penalties = {
+        "pop": np.clip(columns["pop"] / thresholds["max_pop"], 0, 1),
+        "rain": np.clip(columns["precip"] / thresholds["max_rain_mm"], 0, 1),
+        "wind": np.clip(columns["wind"] / thresholds["max_wind"], 0, 1),
+        "temp": np.clip(
+            np.maximum(thresholds["ideal_min_temp"] - temp, temp - thresholds["ideal_max_temp"])
+            / TEMP_PENALTY_SPAN, 0, 1
+        ),
+    }
+    total_weight = sum(weights.values())
+    penalty = sum(weights[name] * penalties[name] for name in weights) / total_weight
+    scores = 1.0 - penalty
+
+    unsuitable = (
+        (columns["pop"] > thresholds["max_pop"])
+        | (columns["wind"] > thresholds["max_wind"])
+        | (columns["precip"] > thresholds["max_rain_mm"])
+        | (temp < thresholds["min_temp"])
+        | (temp > thresholds["max_temp"])
+    )
+    return scores, unsuitable
+
+
+def rolling_sum(values: np.ndarray, window: int) -> np.ndarray:
+    """Sum of every `window`-long run of values (len(values) - window + 1 results)"""
+    cumulative = np.concatenate(([0.0], np.cumsum(values, dtype=np.float64)))
+    return cumulative[window:] - cumulative[:-window]
+
+
+def best_windows(hourly: list[dict], window_hours: int = 3, top_k: int = 3, horizon_hours: int = 48,
+                 weights: dict | None = None, thresholds: dict | None = None,
+                 utc_offset_seconds: int = 0, now: float | None = None) -> dict:
+    """
+    Scores every window of `window_hours` consecutive hours and returns the best ones.
+
+    Args:
+        hourly: One Call `hourly` entries.
+        window_hours: Length of a delivery window.
+        top_k: Number of non-overlapping windows to return.
+        horizon_hours: How far ahead to look, counted from the current hour.
+        weights: Overrides for DEFAULT_WEIGHTS.
+        thresholds: Overrides for DEFAULT_THRESHOLDS.
+        utc_offset_seconds: The location's UTC offset, for local window times.
+        now: Current time (defaults to time.time()); hours that ended before it are skipped.
+
+    Returns:
+        The windows (best first) with their score and weather, the number of hours
+        considered and how many of them were unsuitable.
+    """
+    weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+    thresholds = dict(DEFAULT_THRESHOLDS, **(thresholds or {}))
+    columns = hourly_arrays(hourly, horizon_hours, now)
+    hours = len(columns["dt"])
+    result = {"hours_considered": hours, "unsuitable_hours": 0, "windows": []}
+    if hours < window_hours:
+        return result
+
+    scores, unsuitable = hour_scores(columns, weights, thresholds)
+    result["unsuitable_hours"] = int(unsuitable.sum())
+
+    window_scores = rolling_sum(scores, window_hours) / window_hours
+    usable = rolling_sum(unsuitable.astype(np.float64), window_hours) == 0
+    candidates = np.flatnonzero(usable)
+    if candidates.size == 0:
+        return result
+
+    # Best first; ties go to the earlier window
+    ranked = candidates[np.argsort(-window_scores[candidates], kind="stable")]
+    chosen = []
+    taken = np.zeros(hours, dtype=bool)
+    for start in ranked:
+        if not taken[start:start + window_hours].any():
+            chosen.append(int(start))
+            taken[start:start + window_hours] = True
+            if len(chosen) == top_k:
+                break
+
+    starts = np.array(chosen)
+    views = {name: sliding_window_view(columns[name], window_hours)[starts]
+             for name in ("temp", "pop", "wind", "precip")}
+    local = timezone(timedelta(seconds=utc_offset_seconds))
+    for index, start in enumerate(chosen):
+        begins = datetime.fromtimestamp(int(columns["dt"][start]), tz=local)
+        result["windows"].append({
+            "start": begins.strftime("%Y-%m-%d %H:%M"),
+            "end": (begins + timedelta(hours=window_hours)).strftime("%Y-%m-%d %H:%M"),
+            "score": round(float(window_scores[start]) * 100, 1),
+            "temp_min": round(float(views["temp"][index].min()), 1),
+            "temp_max": round(float(views["temp"][index].max()), 1),
+            "max_pop": round(float(views["pop"][index].max())),
+            "max_wind": round(float(views["wind"][index].max()), 1),
+            "precip_mm": round(float(views["precip"][index].sum()), 1),
+        })
+    return result
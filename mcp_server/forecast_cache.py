@@ -0,0 +1,182 @@
+"""
+In-memory TTL cache for One Call API responses.
+
+Entries are keyed by rounded coordinates and units, so nearby lookups for the
+same city share one upstream call. Each response section (current, daily,
+alerts, ...) has its own TTL; a request is only as fresh as the most
+short-lived section it uses. Entries past their TTL but still within the
+`max_stale` window can be served immediately while the caller refreshes them
+in the background (stale-while-revalidate). While upstream quota is low,
+older entries may be served as well, up to `low_quota_max_age`.
+
+Forecasts vary little over a few kilometres, so with a `nearby_radius_km` a
+lookup that has no fresh entry of its own is served from the nearest fresh
+entry within that radius (found through a geohash index in O(log n)) instead
+of going upstream. `nearby_max_age` limits how old that entry may be.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from spatial_index import GeohashIndex
+
+FRESH = "fresh"
+STALE = "stale"
+MISS = "miss"
+
+DEFAULT_TTLS = {
+    "current": 600,
+    "daily": 3600,
+    "alerts": 900,
+}
+
+
+class ForecastCache:
+    """
+    LRU-bounded cache of raw One Call payloads.
+
+    Args:
+        ttls: Seconds each section stays fresh, e.g. {"current": 600, "daily": 3600}.
+        max_entries: Maximum number of cached locations; least recently used are evicted.
+        max_stale: Seconds past expiry during which a stale entry may still be served.
+        low_quota_max_age: Oldest entry, in seconds, served with allow_expired (low quota).
+        coord_precision: Decimal places lat/lon are rounded to when building keys.
+        nearby_radius_km: Serve the nearest fresh entry within this distance when a location
+            has no fresh entry of its own (0 disables).
+        nearby_max_age: Oldest entry, in seconds, that may be served to a nearby location
+            (it must also be within the TTL of the sections requested).
+    """
+
+    def __init__(self, ttls=None, max_entries: int = 256, max_stale: float = 3600,
+                 coord_precision: int = 2, nearby_radius_km: float = 0.0, nearby_max_age: float = 900,
+                 low_quota_max_age: float = 21600):
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.max_entries = max_entries
+        self.max_stale = max_stale
+        self.low_quota_max_age = low_quota_max_age
+        self.coord_precision = coord_precision
+        self.nearby_radius_km = nearby_radius_km
+        self.nearby_max_age = nearby_max_age
+        self._entries = OrderedDict()
+        self._index = GeohashIndex()
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.nearby_hits = 0
+        self.evictions = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+
+    def key(self, lat: float, lon: float, units: str = "metric") -> tuple:
+        """Build the cache key for a coordinate pair"""
+        return (round(lat, self.coord_precision), round(lon, self.coord_precision), units)
+
+    def get(self, lat: float, lon: float, units: str = "metric", sections=None,
+            allow_expired: bool = False):
+        """
+        Look up a cached payload.
+
+        Args:
+            sections: Response sections the caller needs (defaults to all with a TTL).
+            allow_expired: Serve entries older than the max_stale window, up to
+                low_quota_max_age, as STALE instead of MISS (used when upstream quota
+                is running low).
+
+        Returns:
+            A (payload, state) tuple where state is FRESH, STALE or MISS.
+        """
+        key = self.key(lat, lon, units)
+        ttl = min(self.ttls[section] for section in (sections or self.ttls))
+        with self._lock:
+            entry = self._entries.get(key)
+            now = time.time()
+            if entry is not None and now - entry[1] <= ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0], FRESH
+
+            # No fresh copy of our own: a fresh one for a nearby location is better than a stale one
+            if self.nearby_radius_km > 0:
+                nearby = self._nearest_fresh(lat, lon, units, min(ttl, self.nearby_max_age), now)
+                if nearby is not None:
+                    self._entries.move_to_end(nearby)
+                    self.nearby_hits += 1
+                    return self._entries[nearby][0], FRESH
+
+            if entry is None:
+                self.misses += 1
+                return None, MISS
+
+            payload, fetched_at = entry
+            age = now - fetched_at
+            if age <= ttl + self.max_stale or (allow_expired and age <= self.low_quota_max_age):
+                self._entries.move_to_end(key)
+                self.stale_hits += 1
+                return payload, STALE
+
+            self.misses += 1
+            return None, MISS
+
+    def _nearest_fresh(self, lat: float, lon: float, units: str, max_age: float, now: float):
+        """Key of the closest entry within nearby_radius_km that is at most max_age old, or None"""
+        best = None
+        for distance, key in self._index.nearby(lat, lon, self.nearby_radius_km):
+            if key[2] == units and now - self._entries[key][1] <= max_age:
+                if best is None or distance < best[0]:
+                    best = (distance, key)
+        return best[1] if best else None
+
+    def put(self, lat: float, lon: float, units: str, payload: dict):
+        """Store a freshly fetched payload"""
+        key = self.key(lat, lon, units)
+        with self._lock:
+            self._entries[key] = (payload, time.time())
+            self._entries.move_to_end(key)
+            self._index.add(key, key[0], key[1])
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self._index.remove(evicted)
+                self.evictions += 1
+
+    def begin_refresh(self, lat: float, lon: float, units: str = "metric") -> bool:
+        """Claim a background refresh for a key; False if one is already running"""
+        key = self.key(lat, lon, units)
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            return True
+
+    def end_refresh(self, lat: float, lon: float, units: str = "metric", ok: bool = True):
+        """Release a background refresh claimed with begin_refresh()"""
+        key = self.key(lat, lon, units)
+        with self._lock:
+            self._refreshing.discard(key)
+            self.refreshes += 1
+            if not ok:
+                self.refresh_failures += 1
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and configuration for TTL tuning"""
+        with self._lock:
+            lookups = self.hits + self.nearby_hits + self.stale_hits + self.misses
+            served = self.hits + self.nearby_hits + self.stale_hits
+            return {
+                "hits": self.hits,
+                "nearby_hits": self.nearby_hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "hit_ratio": round(served / lookups, 3) if lookups else None,
+                "evictions": self.evictions,
+                "background_refreshes": self.refreshes,
+                "background_refresh_failures": self.refresh_failures,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttls_seconds": dict(self.ttls),
+                "max_stale_seconds": self.max_stale,
+                "low_quota_max_age_seconds": self.low_quota_max_age,
+                "nearby_radius_km": self.nearby_radius_km,
+                "nearby_max_age_seconds": self.nearby_max_age,
+            }
@@ -0,0 +1,327 @@
+"""
+Columnar store of the latest forecast for every location the server has fetched.
+
+Answering "which of our 500 delivery cities will have more than 70% chance of
+rain tomorrow" with get_weather means 500 calls and 500 nested reports. This
+store keeps every One Call payload the server fetches as one row of
+location x time float32 matrices, one per variable:
+
+- current: temp, feels, humidity, wind (one column)
+- hourly: temp, pop, wind, precip (48 columns, one per hour)
+- daily: temp_min, temp_max, pop, wind, precip (8 columns, one per day)
+
+Every fetch overwrites only its own location's row, in place. A query reads
+one column per field across all rows. The row's hour or day is picked with a
+per-row index, because locations were fetched at different times and sit in
+different time zones. Filters, top-k and aggregates are then plain NumPy
+operations. Missing values are NaN and never match a filter.
+
+Memory use is about 1 KB per location (500 locations take about 500 KB).
+"""
+import operator
+import threading
+import time
+import warnings
+
+import numpy as np
+
+HOURS = 48
+DAYS = 8
+
+# Variables kept per matrix; fields are named "<matrix>.<variable>", e.g. "daily.pop"
+CURRENT_FIELDS = ("temp", "feels", "humidity", "wind")
+HOURLY_FIELDS = ("temp", "pop", "wind", "precip")
+DAILY_FIELDS = ("temp_min", "temp_max", "pop", "wind", "precip")
+
+# How an hourly variable is reduced over the requested hours
+HOURLY_REDUCTIONS = {
+    "temp_min": ("temp", np.nanmin),
+    "temp_max": ("temp", np.nanmax),
+    "pop": ("pop", np.nanmax),
+    "wind": ("wind", np.nanmax),
+    "precip": ("precip", np.nansum),
+}
+
+FIELD_UNITS = {"temp": "°C", "feels": "°C", "temp_min": "°C", "temp_max": "°C", "humidity": "%",
+               "wind": "m/s", "pop": "%", "precip": "mm"}
+
+OPERATORS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+
+def field_names() -> list[str]:
+    """Every queryable field, e.g. "current.temp", "daily.pop", "hourly.precip" """
+    return ([f"current.{name}" for name in CURRENT_FIELDS]
+            + [f"daily.{name}" for name in DAILY_FIELDS]
+            + [f"hourly.{name}" for name in HOURLY_REDUCTIONS])
+
+
+def _precip(entry: dict, hourly: bool) -> float:
+    rain, snow = entry.get("rain"), entry.get("snow")
+    if hourly:
+        return (rain or {}).get("1h", 0.0) + (snow or {}).get("1h", 0.0)
+    return (rain or 0.0) + (snow or 0.0)
+
+
+class ForecastStore:
+    """
+    Location x time float32 matrices of the latest One Call payload per location.
+
+    Args:
+        max_locations: Rows kept; when full, the least recently updated location is replaced.
+        initial_capacity: Rows allocated up front (doubled as needed, up to max_locations).
+    """
+
+    def __init__(self, max_locations: int = 5000, initial_capacity: int = 64):
+        self.max_locations = max_locations
+        self._rows = {}       # key -> row index
+        self._keys = []       # row index -> key
+        self._names = []      # row index -> display name
+        self._lock = threading.Lock()
+        self._allocate(min(initial_capacity, max_locations))
+        self.updates = 0
+        self.replaced = 0
+        self.queries = 0
+
+    def _allocate(self, capacity: int):
+        """(Re)allocate every array with room for `capacity` rows, keeping existing rows"""
+        def grow(old, shape, dtype=np.float32, fill=np.nan):
+            array = np.full(shape, fill, dtype=dtype)
+            if old is not None:
+                array[:len(old)] = old
+            return array
+
+        current, hourly, daily = (getattr(self, name, {}) for name in ("current", "hourly", "daily"))
+        self.current = {name: grow(current.get(name), capacity) for name in CURRENT_FIELDS}
+        self.hourly = {name: grow(hourly.get(name), (capacity, HOURS)) for name in HOURLY_FIELDS}
+        self.daily = {name: grow(daily.get(name), (capacity, DAYS)) for name in DAILY_FIELDS}
+        self.lat = grow(getattr(self, "lat", None), capacity)
+        self.lon = grow(getattr(self, "lon", None), capacity)
+        # Per-row time bases: unix time of the first hour, local day number of the first day,
+        # UTC offset and fetch time
+        for name, dtype in (("first_hour", np.int64), ("first_day", np.int64),
+                            ("utc_offset", np.int64), ("fetched_at", np.float64)):
+            setattr(self, name, grow(getattr(self, name, None), capacity, dtype, 0))
+        self._capacity = capacity
+
+    def _row_for(self, key) -> int:
+        row = self._rows.get(key)
+        if row is not None:
+            return row
+        count = len(self._keys)
+        if count == self.max_locations:
+            # Full: reuse the row of the location updated longest ago
+            row = int(np.argmin(self.fetched_at[:count]))
+            del self._rows[self._keys[row]]
+            self._keys[row] = key
+            self._names[row] = None
+            self.replaced += 1
+        else:
+            if count == self._capacity:
+                self._allocate(min(self._capacity * 2, self.max_locations))
+            row = count
+            self._keys.append(key)
+            self._names.append(None)
+        self._rows[key] = row
+        return row
+
+    def update(self, key, name: str | None, lat: float, lon: float, payload: dict, fetched_at: float | None = None):
+        """
+        Overwrite one location's row with a One Call payload (metric units).
+
+        Args:
+            key: The location's forecast cache key.
+            name: Display name (kept from an earlier update when None).
+            lat: Latitude.
+            lon: Longitude.
+            payload: Raw One Call response.
+            fetched_at: When the payload was fetched (default: now).
+        """
+        current = payload.get("current", {})
+        hourly = payload.get("hourly", [])[:HOURS]
+        daily = payload.get("daily", [])[:DAYS]
+        offset = int(payload.get("timezone_offset", 0))
+
+        hourly_values = {
+            "temp": [hour.get("temp", np.nan) for hour in hourly],
+            "pop": [hour.get("pop", np.nan) * 100 for hour in hourly],
+            "wind": [hour.get("wind_speed", np.nan) for hour in hourly],
+            "precip": [_precip(hour, hourly=True) for hour in hourly],
+        }
+        daily_values = {
+            "temp_min": [day.get("temp", {}).get("min", np.nan) for day in daily],
+            "temp_max": [day.get("temp", {}).get("max", np.nan) for day in daily],
+            "pop": [day.get("pop", np.nan) * 100 for day in daily],
+            "wind": [day.get("wind_speed", np.nan) for day in daily],
+            "precip": [_precip(day, hourly=False) for day in daily],
+        }
+
+        with self._lock:
+            row = self._row_for(key)
+            if name is not None or self._names[row] is None:
+                self._names[row] = name or f"{lat:.2f},{lon:.2f}"
+            self.lat[row], self.lon[row] = lat, lon
+            for field, source in (("temp", "temp"), ("feels", "feels_like"),
+                                  ("humidity", "humidity"), ("wind", "wind_speed")):
+                self.current[field][row] = current.get(source, np.nan)
+            for field, values in hourly_values.items():
+                self.hourly[field][row] = np.nan
+                self.hourly[field][row, :len(values)] = values
+            for field, values in daily_values.items():
+                self.daily[field][row] = np.nan
+                self.daily[field][row, :len(values)] = values
+            self.first_hour[row] = hourly[0]["dt"] if hourly else 0
+            self.first_day[row] = (daily[0]["dt"] + offset) // 86400 if daily else 0
+            self.utc_offset[row] = offset
+            self.fetched_at[row] = time.time() if fetched_at is None else fetched_at
+            self.updates += 1
+
+    def column(self, field: str, rows: np.ndarray, now: float, day: int = 1, hours: int = 24) -> np.ndarray:
+        """
+        One value per row for a field.
+
+        Args:
+            field: A name from field_names().
+            rows: Row indexes to read.
+            now: Current unix time; hours and days are counted from it, per row.
+            day: For daily fields, 0 = today, 1 = tomorrow, ... in each location's local time.
+            hours: For hourly fields, how many hours from now to reduce over.
+
+        Raises:
+            ValueError: For an unknown field.
+        """
+        matrix, _, variable = field.partition(".")
+        if matrix == "current" and variable in CURRENT_FIELDS:
+            return self.current[variable][rows]
+
+        if matrix == "daily" and variable in DAILY_FIELDS:
+            # Each row's own column for the requested local day (NaN if not covered)
+            today = (int(now) + self.utc_offset[rows]) // 86400
+            columns = today + day - self.first_day[rows]
+            covered = (columns >= 0) & (columns < DAYS)
+            values = self.daily[variable][rows, np.clip(columns, 0, DAYS - 1)]
+            return np.where(covered, values, np.float32(np.nan))
+
+        if matrix == "hourly" and variable in HOURLY_REDUCTIONS:
+            source, reduce = HOURLY_REDUCTIONS[variable]
+            # Columns from each row's current hour onwards; hours past the forecast are NaN
+            starts = np.maximum((int(now) - self.first_hour[rows]) // 3600, 0)
+            columns = starts[:, None] + np.arange(hours)
+            values = np.take_along_axis(self.hourly[source][rows], np.clip(columns, 0, HOURS - 1), axis=1)
+            values = np.where(columns < HOURS, values, np.float32(np.nan))
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN rows, masked below
+                reduced = reduce(values, axis=1)
+            # nansum of an all-NaN row is 0; keep it missing instead
+            return np.where(np.isnan(values).all(axis=1), np.float32(np.nan), reduced)
+
+        raise ValueError(f"Unknown field '{field}'. Use one of: {', '.join(field_names())}.")
+
+    def query(self, filters: list[dict] | None = None, sort_by: str | None = None, top_k: int = 10,
+              ascending: bool = False, aggregates: list[str] | None = None, day: int = 1, hours: int = 24,
+              max_age: float | None = None) -> dict:
+        """
+        Filter, rank and aggregate every stored location at once.
+
+        Args:
+            filters: Conditions that must all hold, e.g. [{"field": "daily.pop", "op": ">", "value": 70}].
+            sort_by: Field to rank the matches by (default: the first filter's field).
+            top_k: Number of matching locations to return.
+            ascending: Rank lowest first instead of highest first.
+            aggregates: Fields to summarize (count/min/mean/max) over all matches.
+            day: Which local day daily fields refer to (0 = today, 1 = tomorrow).
+            hours: How many hours from now hourly fields are reduced over.
+            max_age: Ignore locations whose forecast is older than this many seconds.
+
+        Returns:
+            The number of locations scanned and matched, the top matches with their
+            values, and the aggregates.
+
+        Raises:
+            ValueError: For an unknown field or operator.
+        """
+        filters = filters or []
+        sort_by = sort_by or (filters[0]["field"] if filters else None)
+        fields = list(dict.fromkeys([f["field"] for f in filters] + ([sort_by] if sort_by else [])))
+        for condition in filters:
+            if condition.get("op") not in OPERATORS:
+                raise ValueError(f"Unknown operator '{condition.get('op')}'. Use one of: {', '.join(OPERATORS)}.")
+        now = time.time()
+
+        with self._lock:
+            self.queries += 1
+            rows = np.arange(len(self._keys))
+            if max_age is not None:
+                rows = rows[now - self.fetched_at[rows] <= max_age]
+            columns = {field: self.column(field, rows, now, day, hours) for field in fields}
+            matched = np.ones(len(rows), dtype=bool)
+            for condition in filters:
+                # Comparisons with NaN are False, so missing values never match
+                matched &= OPERATORS[condition["op"]](columns[condition["field"]], float(condition["value"]))
+            selected = np.flatnonzero(matched)
+
+            if sort_by and selected.size:
+                keys = columns[sort_by][selected]
+                keys = np.where(np.isnan(keys), np.inf if ascending else -np.inf, keys)
+                keys = keys if ascending else -keys
+                if selected.size > top_k:
+                    best = np.argpartition(keys, top_k - 1)[:top_k]
+                    selected, keys = selected[best], keys[best]
+                selected = selected[np.argsort(keys, kind="stable")]
+            else:
+                selected = selected[:top_k]
+
+            results = []
+            for index in selected:
+                row = int(rows[index])
+                results.append({
+                    "location": self._names[row],
+                    "lat": round(float(self.lat[row]), 4),
+                    "lon": round(float(self.lon[row]), 4),
+                    **{field: _value(columns[field][index]) for field in fields},
+                    "age_minutes": round(float(now - self.fetched_at[row]) / 60, 1),
+                })
+
+            summary = {}
+            if aggregates:
+                matched_rows = rows[matched]
+                for field in aggregates:
+                    values = self.column(field, matched_rows, now, day, hours)
+                    values = values[~np.isnan(values)]
+                    summary[field] = {
+                        "count": int(values.size),
+                        "min": _value(values.min()) if values.size else None,
+                        "mean": _value(values.mean(dtype=np.float64)) if values.size else None,
+                        "max": _value(values.max()) if values.size else None,
+                    }
+
+        response = {"scanned": int(len(rows)), "matched": int(matched.sum()), "results": results}
+        if summary:
+            response["aggregates"] = summary
+        return response
+
+    def stats(self) -> dict:
+        with self._lock:
+            arrays = [*self.current.values(), *self.hourly.values(), *self.daily.values(), self.first_hour,
+                      self.first_day, self.utc_offset, self.fetched_at, self.lat, self.lon]
+            return {
+                "locations": len(self._keys),
+                "capacity": self._capacity,
+                "max_locations": self.max_locations,
+                "memory_bytes": sum(array.nbytes for array in arrays),
+                "updates": self.updates,
+                "replaced": self.replaced,
+                "queries": self.queries,
+            }
+
+
+def _value(value):
+    value = float(value)
+    return None if np.isnan(value) else round(value, 1)
+
@@ -0,0 +1,311 @@
+"""
+Offline gazetteer: resolves city names to coordinates without a network call.
+
+The index is built once from a GeoNames cities dump (cities500.txt,
+cities15000.txt, ... from https://download.geonames.org/export/dump/):
+
+    python mcp_server/gazetteer.py build cities15000.txt
+
+This writes a single binary file: a small JSON header followed by flat
+arrays. The arrays are memory-mapped on the first lookup, so the server only
+reads the pages it touches. The file holds:
+
+- Search keys (each city's name and ASCII name, lowercased and without
+  accents), sorted and stored back to back in one byte blob.
+- Per city: latitude, longitude, country code, admin1 (state) code,
+  population and display name.
+
+An exact name lookup and a prefix lookup are binary searches over the sorted
+keys, O(log n). When a prefix matches nothing, suggestions fall back to
+fuzzy matching among the most populous names that share its first letter.
+"""
+import difflib
+import json
+import mmap
+import pathlib
+import threading
+import unicodedata
+
+import numpy as np
+
+MAGIC = b"WGAZ1\n"
+ALIGNMENT = 8
+
+
+def fold(text: str) -> str:
+    """Search form of a name: lowercase, accents removed, whitespace collapsed"""
+    decomposed = unicodedata.normalize("NFKD", text)
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(stripped.lower().split())
+
+
+def parse_query(normalized: str) -> tuple[str, str | None, str | None]:
+    """(name, state, country) from a normalize_location() string such as "san diego,ca,us" """
+    parts = [fold(part) for part in normalized.split(",")]
+    name = parts[0]
+    state = country = None
+    if len(parts) >= 3:
+        state, country = parts[-2], parts[-1]
+    elif len(parts) == 2:
+        country = parts[1]
+    return name, state, country
+
+
+def build_index(source, output, min_population: int = 0) -> int:
+    """
+    Build a gazetteer index from a GeoNames cities dump.
+
+    Args:
+        source: GeoNames tab-separated file (e.g. cities15000.txt).
+        output: Index file to write.
+        min_population: Skip places with fewer inhabitants.
+
+    Returns:
+        The number of places indexed.
+    """
+    names, lats, lons, countries, states, populations = [], [], [], [], [], []
+    keys = []
+    with open(source, encoding="utf-8") as rows:
+        for row in rows:
+            fields = row.rstrip("\n").split("\t")
+            if len(fields) < 15:
+                continue
+            population = int(fields[14] or 0)
+            if population < min_population:
+                continue
+            city = len(names)
+            names.append(fields[1])
+            lats.append(float(fields[4]))
+            lons.append(float(fields[5]))
+            countries.append(fields[8].encode("ascii", "ignore")[:2])
+            states.append(fields[10].encode("ascii", "ignore")[:8])
+            populations.append(population)
+            for key in {fold(fields[1]), fold(fields[2])}:
+                if key:
+                    keys.append((key.encode("utf-8"), city))
+
+    keys.sort()
+    key_bytes = [key for key, _ in keys]
+    name_bytes = [name.encode("utf-8") for name in names]
+    arrays = {
+        "key_offsets": np.cumsum([0] + [len(key) for key in key_bytes], dtype=np.uint32),
+        "key_blob": np.frombuffer(b"".join(key_bytes), dtype=np.uint8),
+        "key_city": np.array([city for _, city in keys], dtype=np.uint32),
+        "lat": np.array(lats, dtype=np.float32),
+        "lon": np.array(lons, dtype=np.float32),
+        "country": np.array(countries, dtype="S2"),
+        "state": np.array(states, dtype="S8"),
+        "population": np.array(populations, dtype=np.uint32),
+        "name_offsets": np.cumsum([0] + [len(name) for name in name_bytes], dtype=np.uint32),
+        "name_blob": np.frombuffer(b"".join(name_bytes), dtype=np.uint8),
+    }
+
+    header, offset = {"places": len(names), "keys": len(keys), "arrays": {}}, 0
+    for name, array in arrays.items():
+        header["arrays"][name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+    header_bytes = json.dumps(header).encode("utf-8")
+    # Arrays start on an aligned boundary after the magic, the header length and the header
+    data_start = -(-(len(MAGIC) + 8 + len(header_bytes)) // ALIGNMENT) * ALIGNMENT
+
+    output = pathlib.Path(output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "wb") as index:
+        index.write(MAGIC)
+        index.write(len(header_bytes).to_bytes(8, "little"))
+        index.write(header_bytes)
+        index.write(b"\0" * (data_start - index.tell()))
+        for name, array in arrays.items():
+            index.seek(data_start + header["arrays"][name]["offset"])
+            index.write(array.tobytes())
+    return len(names)
+
+
+class Gazetteer:
+    """
+    Lazily memory-mapped gazetteer index.
+
+    Args:
+        path: Index built with build_index(); a missing file leaves the gazetteer unavailable.
+    """
+
+    def __init__(self, path):
+        self.path = pathlib.Path(path) if path else None
+        self._arrays = None
+        self._load_error = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.suggestions = 0
+
+    @property
+    def available(self) -> bool:
+        return self._load() is not None
+
+    def _load(self):
+        if self._arrays is not None or self._load_error is not None:
+            return self._arrays
+        with self._lock:
+            if self._arrays is None and self._load_error is None:
+                try:
+                    self._arrays = self._map()
+                except (OSError, ValueError) as e:
+                    self._load_error = e
+        return self._arrays
+
+    def _map(self) -> dict:
+        if self.path is None or not self.path.exists():
+            raise FileNotFoundError(f"No gazetteer index at {self.path}")
+        with open(self.path, "rb") as index:
+            if index.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{self.path} is not a gazetteer index")
+            header_length = int.from_bytes(index.read(8), "little")
+            header = json.loads(index.read(header_length))
+            # Pages are read from disk only when a lookup touches them
+            mapped = mmap.mmap(index.fileno(), 0, access=mmap.ACCESS_READ)
+        data_start = -(-(len(MAGIC) + 8 + header_length) // ALIGNMENT) * ALIGNMENT
+        arrays = {}
+        for name, spec in header["arrays"].items():
+            dtype = np.dtype(spec["dtype"])
+            arrays[name] = np.frombuffer(mapped, dtype=dtype, count=int(np.prod(spec["shape"])),
+                                         offset=data_start + spec["offset"])
+        arrays["places"] = header["places"]
+        # Keys are compared as bytes sliced straight from the mapping
+        arrays["mapped"] = mapped
+        arrays["key_start"] = data_start + header["arrays"]["key_blob"]["offset"]
+        return arrays
+
+    def _key(self, index: int) -> bytes:
+        offsets, start = self._arrays["key_offsets"], self._arrays["key_start"]
+        return self._arrays["mapped"][start + int(offsets[index]):start + int(offsets[index + 1])]
+
+    def _bisect(self, target: bytes) -> int:
+        """Index of the first key >= target"""
+        low, high = 0, len(self._arrays["key_city"])
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < target:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _range(self, key: str, prefix: bool) -> tuple[int, int]:
+        target = key.encode("utf-8")
+        start = self._bisect(target)
+        # Every key with this prefix sorts before prefix + 0xff
+        end = self._bisect(target + b"\xff" if prefix else target + b"\0")
+        return start, end
+
+    def _place(self, city: int) -> dict:
+        arrays = self._arrays
+        offsets = arrays["name_offsets"]
+        return {
+            "lat": round(float(arrays["lat"][city]), 4),
+            "lon": round(float(arrays["lon"][city]), 4),
+            "name": arrays["name_blob"][offsets[city]:offsets[city + 1]].tobytes().decode("utf-8"),
+            "country": arrays["country"][city].decode("ascii"),
+            "state": arrays["state"][city].decode("ascii"),
+            "population": int(arrays["population"][city]),
+        }
+
+    def _ranked(self, cities: np.ndarray, limit: int) -> list[int]:
+        """Up to `limit` unique cities, most populous first"""
+        # A city has at most two keys (name and ASCII name), so the top 2 * limit keys are enough
+        keep = 2 * limit
+        populations = -self._arrays["population"][cities].astype(np.int64)
+        if cities.size > keep:
+            best = np.argpartition(populations, keep - 1)[:keep]
+            cities, populations = cities[best], populations[best]
+        ordered = cities[np.argsort(populations, kind="stable")]
+        return list(dict.fromkeys(int(city) for city in ordered))[:limit]
+
+    def _filter(self, cities: np.ndarray, state: str | None, country: str | None) -> np.ndarray:
+        if country:
+            cities = cities[self._arrays["country"][cities] == country.upper().encode("ascii", "ignore")]
+        if state:
+            cities = cities[self._arrays["state"][cities] == state.upper().encode("ascii", "ignore")]
+        return cities
+
+    def lookup(self, normalized: str):
+        """
+        Resolve a normalize_location() string ("name", "name,cc" or "name,state,cc").
+
+        Returns:
+            A geocoding result like the Geocoding API's ({"lat", "lon", "name", "country"}),
+            the most populous match, or None when the gazetteer has no match.
+        """
+        if self._load() is None:
+            return None
+        name, state, country = parse_query(normalized)
+        start, end = self._range(name, prefix=False)
+        cities = self._filter(self._arrays["key_city"][start:end], state, country)
+        if cities.size == 0:
+            self.misses += 1
+            return None
+        self.hits += 1
+        place = self._place(self._ranked(cities, 1)[0])
+        return {key: place[key] for key in ("lat", "lon", "name", "country")}
+
+    def suggest(self, prefix: str, limit: int = 5) -> list[dict]:
+        """
+        Places whose name starts with `prefix` (most populous first), or the closest
+        fuzzy matches when none does. A "name,cc" prefix restricts the country.
+        """
+        if self._load() is None:
+            return []
+        self.suggestions += 1
+        name, state, country = parse_query(prefix)
+        if not name:
+            return []
+        start, end = self._range(name, prefix=True)
+        cities = self._filter(self._arrays["key_city"][start:end], state, country)
+        if cities.size == 0:
+            cities = self._fuzzy(name, state, country, limit)
+        return [self._place(city) for city in self._ranked(cities, limit)]
+
+    def _fuzzy(self, name: str, state, country, limit: int, pool: int = 500) -> np.ndarray:
+        """Cities whose name start is closest to `name`, among the most populous sharing its first letter"""
+        start, end = self._range(name[0], prefix=True)
+        key_indexes = np.arange(start, end)
+        if key_indexes.size > pool:
+            populations = self._arrays["population"][self._arrays["key_city"][key_indexes]].astype(np.int64)
+            key_indexes = key_indexes[np.argpartition(-populations, pool - 1)[:pool]]
+        candidates = {}
+        for index in key_indexes:
+            key = self._key(int(index)).decode("utf-8")
+            candidates.setdefault(key[:len(name) + 1], []).append(int(index))
+        close = difflib.get_close_matches(name, list(candidates), n=limit * 3, cutoff=0.7)
+        matches = [self._arrays["key_city"][index] for key in close for index in candidates[key]]
+        return self._filter(np.array(matches, dtype=np.uint32), state, country)
+
+    def stats(self) -> dict:
+        return {
+            "available": self._arrays is not None,
+            "path": str(self.path) if self.path else None,
+            "places": self._arrays["places"] if self._arrays is not None else None,
+            "error": str(self._load_error) if self._load_error else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "suggestions": self.suggestions,
+        }
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Build the offline gazetteer index from a GeoNames dump")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    build = subcommands.add_parser("build", help="Build an index from a GeoNames cities file")
+    build.add_argument("source", help="GeoNames cities file, e.g. cities15000.txt")
+    build.add_argument("--output", default=str(pathlib.Path(__file__).parent / ".cache" / "gazetteer.idx"),
+                       help="Index file to write (default: mcp_server/.cache/gazetteer.idx)")
+    build.add_argument("--min-population", type=int, default=0, help="Skip smaller places")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    places = build_index(args.source, args.output, args.min_population)
+    size = pathlib.Path(args.output).stat().st_size
+    print(f"Indexed {places} places into {args.output} ({size / 1e6:.1f} MB) "
+          f"in {time.perf_counter() - started:.1f}s")
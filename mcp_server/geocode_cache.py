@@ -0,0 +1,154 @@
+"""
+Persistent geocoding cache for the weather MCP server.
+
+City coordinates practically never change, so every resolved location is kept
+in an on-disk SQLite store (surviving server restarts) with a small in-memory
+LRU in front of it. Unknown locations are cached too ("negative caching"), but
+only for a limited time so that typos don't stick around forever.
+"""
+import json
+import pathlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Sentinel returned by GeocodeCache.get() when nothing is cached for a location.
+# (None is a valid cached value: it means "known to be unknown".)
+MISS = object()
+
+# Common country aliases mapped to the ISO 3166 codes used by OpenWeatherMap
+COUNTRY_ALIASES = {
+    "uk": "gb",
+    "england": "gb",
+    "scotland": "gb",
+    "wales": "gb",
+    "great britain": "gb",
+    "united kingdom": "gb",
+    "usa": "us",
+    "u.s.": "us",
+    "u.s.a.": "us",
+    "united states": "us",
+    "united states of america": "us",
+    "deutschland": "de",
+    "germany": "de",
+    "france": "fr",
+    "india": "in",
+    "japan": "jp",
+    "canada": "ca",
+    "australia": "au",
+}
+
+
+def normalize_location(location: str) -> str:
+    """Normalize a location string so equivalent spellings share one cache key"""
+    parts = [" ".join(part.split()).lower() for part in location.split(",")]
+    parts = [part for part in parts if part]
+    if len(parts) > 1:
+        parts[-1] = COUNTRY_ALIASES.get(parts[-1], parts[-1])
+    return ",".join(parts)
+
+
+class GeocodeCache:
+    """
+    Two-level (memory LRU + SQLite) cache of location name -> coordinates.
+
+    Args:
+        path: Location of the SQLite database file (created if missing).
+        max_memory_entries: Size of the in-memory LRU in front of SQLite.
+        negative_ttl: Seconds to remember that a location could not be found.
+    """
+
+    def __init__(self, path, max_memory_entries: int = 1024, negative_ttl: float = 86400):
+        self.path = pathlib.Path(path)
+        self.max_memory_entries = max_memory_entries
+        self.negative_ttl = negative_ttl
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS geocode ("
+            " key TEXT PRIMARY KEY,"
+            " payload TEXT,"
+            " created_at REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    def get(self, location: str):
+        """
+        Look up a location.
+
+        Returns:
+            The cached geocoding result (a dict), None if the location is known
+            not to exist, or MISS if nothing usable is cached.
+        """
+        key = normalize_location(location)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                row = self._db.execute(
+                    "SELECT payload, created_at FROM geocode WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    payload, created_at = row
+                    entry = (json.loads(payload) if payload is not None else None, created_at)
+                    self._remember(key, entry)
+            else:
+                self._memory.move_to_end(key)
+
+            if entry is None:
+                self.misses += 1
+                return MISS
+
+            value, created_at = entry
+            if value is None:
+                # Negative entries expire so that newly added/fixed names are retried
+                if now - created_at > self.negative_ttl:
+                    self._forget(key)
+                    self.misses += 1
+                    return MISS
+                self.negative_hits += 1
+                return None
+
+            self.hits += 1
+            return value
+
+    def put(self, location: str, value):
+        """Store a geocoding result, or None to record that the location is unknown"""
+        key = normalize_location(location)
+        entry = (value, time.time())
+        with self._lock:
+            self._remember(key, entry)
+            self._db.execute(
+                "INSERT OR REPLACE INTO geocode (key, payload, created_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value) if value is not None else None, entry[1]),
+            )
+            self._db.commit()
+
+    def stats(self) -> dict:
+        """Return hit/miss counters for monitoring"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "negative_hits": self.negative_hits,
+                "misses": self.misses,
+                "memory_entries": len(self._memory),
+            }
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _forget(self, key):
+        self._memory.pop(key, None)
+        self._db.execute("DELETE FROM geocode WHERE key = ?", (key,))
+        self._db.commit()
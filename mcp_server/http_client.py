@@ -0,0 +1,174 @@
+"""
+Shared async HTTP client for the weather MCP server's upstream calls.
+
+A single httpx.AsyncClient is reused for every request so connections to
+OpenWeatherMap are kept alive and pooled instead of paying a fresh TCP/TLS
+handshake per call. HTTP/2 is used when the optional `h2` package is
+installed, and responses are requested gzip-compressed.
+
+Requests are paced by an optional token bucket, and 429/5xx responses or
+transport errors are retried with exponential backoff and full jitter,
+honoring the server's Retry-After header. A quota ledger is charged before
+each attempt, and the charge is refunded when the API answers with a
+429/5xx or no response arrives (transport error), since those calls served
+no data.
+
+With a Counters and a StageTimings attached, every response is counted by
+path and status code, transport errors by exception class, and the request
+and the JSON decoding are timed separately ("http_request", "json_decode").
+"""
+import asyncio
+import logging
+import random
+import time
+from email.utils import parsedate_to_datetime
+import httpx
+
+# httpx logs every request URL at INFO level, and ours carry the API key
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+try:
+    import h2  # noqa: F401  (only needed to enable HTTP/2 in httpx)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class UpstreamClient:
+    """
+    Lazily created, connection-pooled async HTTP client.
+
+    Args:
+        connect_timeout: Seconds to wait for a connection to be established.
+        read_timeout: Seconds to wait for response data.
+        max_connections: Upper bound on concurrently open connections.
+        max_keepalive: Number of idle connections kept open for reuse.
+        http2: Use HTTP/2 when available (ignored if `h2` is not installed).
+        max_retries: Retries after a 429/5xx response or transport error.
+        backoff_base: Initial backoff in seconds (doubled on every retry).
+        backoff_max: Longest wait between attempts; a longer Retry-After is not retried.
+        rate_limiter: Optional TokenBucket acquired before every attempt.
+        counters: Optional Counters for upstream status codes and transport errors.
+        timings: Optional StageTimings for the request and JSON decoding stages.
+    """
+
+    def __init__(self, connect_timeout: float = 5.0, read_timeout: float = 10.0,
+                 max_connections: int = 100, max_keepalive: int = 20, http2: bool = True,
+                 max_retries: int = 3, backoff_base: float = 0.5, backoff_max: float = 8.0,
+                 rate_limiter=None, counters=None, timings=None):
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+        )
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.rate_limiter = rate_limiter
+        self.counters = counters
+        self.timings = timings
+        self.retries = 0
+        self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Created on first use so it binds to the server's running event loop
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=self.limits,
+                http2=self.http2,
+                headers={"Accept-Encoding": "gzip, deflate"},
+            )
+        return self._client
+
+    async def get_json(self, url: str, params: dict, quota=None):
+        """
+        GET a URL and decode the JSON body, retrying transient failures.
+
+        Args:
+            url: Endpoint to call.
+            params: Query parameters.
+            quota: Optional QuotaLedger charged for every attempt the API serves.
+
+        Raises:
+            httpx.HTTPStatusError: For 4xx/5xx responses once retries are exhausted.
+            httpx.TransportError: For network errors once retries are exhausted.
+            QuotaExceededError: If the quota ledger refuses the call.
+        """
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire()
+            # The ledger's SQLite writes block, so they run off the event loop
+            charged_day = await asyncio.to_thread(quota.consume) if quota is not None else None
+
+            started = time.perf_counter()
+            try:
+                response = await self.client.get(url, params=params)
+            except httpx.TransportError as e:
+                self._count("upstream_transport_errors", url, error_class=type(e).__name__)
+                if charged_day is not None:
+                    # No response arrived (timeout, reset, ...), so no call completed
+                    await asyncio.to_thread(quota.refund, charged_day)
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+            else:
+                self._record("http_request", started)
+                self._count("upstream_responses", url, status=response.status_code)
+                if charged_day is not None and response.status_code in RETRYABLE_STATUS_CODES:
+                    # Throttled or failed upstream: no data was served, so don't spend quota on it
+                    await asyncio.to_thread(quota.refund, charged_day)
+                if response.status_code not in RETRYABLE_STATUS_CODES or attempt >= self.max_retries:
+                    response.raise_for_status()
+                    started = time.perf_counter()
+                    data = response.json()
+                    self._record("json_decode", started)
+                    return data
+                delay = self._retry_after(response)
+                if delay is None:
+                    delay = self._backoff(attempt)
+                elif delay > self.backoff_max:
+                    # The server wants us to back off longer than a caller should wait
+                    response.raise_for_status()
+
+            attempt += 1
+            self.retries += 1
+            await asyncio.sleep(delay)
+
+    def _count(self, name: str, url: str, **labels):
+        if self.counters is not None:
+            self.counters.inc(name, path=httpx.URL(url).path, **labels)
+
+    def _record(self, stage: str, started: float):
+        if self.timings is not None:
+            self.timings.record(stage, time.perf_counter() - started)
+
+    def _backoff(self, attempt: int) -> float:
+        """Exponential backoff with full jitter"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    @staticmethod
+    def _retry_after(response: httpx.Response):
+        """Parse a Retry-After header (seconds or HTTP date) into seconds, if present"""
+        value = response.headers.get("Retry-After")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    async def aclose(self):
+        """Close pooled connections"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -1,9 +1,26 @@
 import os
-import requests
+import asyncio
+import contextlib
+import time
+import weakref
+import httpx
+from pydantic import AnyUrl
 from mcp.server.fastmcp import FastMCP
 from dotenv import load_dotenv
 import pathlib
 from datetime import datetime, timezone
+from geocode_cache import GeocodeCache, MISS, normalize_location
+from gazetteer import Gazetteer
+from forecast_cache import ForecastCache, STALE
+from forecast_store import DAYS, FIELD_UNITS, HOURS, ForecastStore, field_names
+from http_client import UpstreamClient
+from singleflight import SingleFlight
+from rate_limiter import TokenBucket, QuotaLedger, QuotaExceededError
+from metrics import Counters, StageTimings, ValueStats, estimate_tokens, render_prometheus, timed_handler
+import delivery_enrichment
+import delivery_windows
+from weather_compare import compare_reports
+from watchlist import Watchlist
 
 # Load environment variables from the parent directory's .env file
 env_path = pathlib.Path(__file__).parent.parent / '.env'
@@ -15,6 +32,98 @@ if not OPENWEATHERMAP_API_KEY:
     print("Warning: OPENWEATHERMAP_API_KEY environment variable is not set!")
     print("Please set your OpenWeatherMap API key in the .env file.")
 
+# Persistent geocoding cache (location name -> coordinates)
+GEOCODE_CACHE_PATH = os.getenv(
+    "GEOCODE_CACHE_PATH", str(pathlib.Path(__file__).parent / ".cache" / "geocode.sqlite3")
+)
+geocode_cache = GeocodeCache(
+    GEOCODE_CACHE_PATH,
+    max_memory_entries=int(os.getenv("GEOCODE_CACHE_MEMORY_ENTRIES", "1024")),
+    negative_ttl=float(os.getenv("GEOCODE_NEGATIVE_TTL_SECONDS", "86400")),
+)
+
+# Optional offline gazetteer (build it with `python mcp_server/gazetteer.py build cities15000.txt`).
+# Memory-mapped on first use; the Geocoding API is only called for names it does not know.
+gazetteer = Gazetteer(os.getenv(
+    "GAZETTEER_PATH", str(pathlib.Path(__file__).parent / ".cache" / "gazetteer.idx")
+))
+
+# TTL cache for One Call responses, keyed by rounded coordinates and units.
+# Locations without a fresh entry of their own reuse the nearest fresh one within the radius.
+forecast_cache = ForecastCache(
+    ttls={
+        "current": float(os.getenv("FORECAST_TTL_CURRENT_SECONDS", "600")),
+        "daily": float(os.getenv("FORECAST_TTL_DAILY_SECONDS", "3600")),
+        "alerts": float(os.getenv("FORECAST_TTL_ALERTS_SECONDS", "900")),
+        "hourly": float(os.getenv("FORECAST_TTL_HOURLY_SECONDS", "1800")),
+    },
+    max_entries=int(os.getenv("FORECAST_CACHE_MAX_ENTRIES", "256")),
+    max_stale=float(os.getenv("FORECAST_MAX_STALE_SECONDS", "3600")),
+    low_quota_max_age=float(os.getenv("FORECAST_LOW_QUOTA_MAX_AGE_SECONDS", "21600")),
+    nearby_radius_km=float(os.getenv("FORECAST_NEARBY_RADIUS_KM", "3")),
+    nearby_max_age=float(os.getenv("FORECAST_NEARBY_MAX_AGE_SECONDS", "900")),
+)
+
+# Columnar copy of every fetched forecast, for fleet-wide queries (query_forecasts)
+forecast_store = ForecastStore(max_locations=int(os.getenv("FORECAST_STORE_MAX_LOCATIONS", "5000")))
+
+# Daily One Call quota ledger, persisted across restarts
+quota_ledger = QuotaLedger(
+    os.getenv("QUOTA_LEDGER_PATH", str(pathlib.Path(__file__).parent / ".cache" / "quota.sqlite3")),
+    daily_limit=int(os.getenv("ONECALL_DAILY_QUOTA", "1000")),
+    low_threshold=int(os.getenv("ONECALL_LOW_QUOTA_THRESHOLD", "100")),
+)
+
+# Per-minute pacing of all OpenWeatherMap calls
+rate_limiter = TokenBucket(
+    rate=float(os.getenv("OWM_CALLS_PER_MINUTE", "60")) / 60,
+    capacity=float(os.getenv("OWM_BURST", "10")),
+)
+
+# Per-stage latency of weather requests (geocode, onecall, http_request, json_decode, format,
+# get_weather) and of every tool/resource handler ("tool:<name>", "resource:<uri>")
+stage_timings = StageTimings()
+
+# Upstream status codes, transport errors and weather error classes
+counters = Counters()
+
+# Connection-pooled async HTTP client shared by all upstream calls
+upstream = UpstreamClient(
+    connect_timeout=float(os.getenv("UPSTREAM_CONNECT_TIMEOUT_SECONDS", "5")),
+    read_timeout=float(os.getenv("UPSTREAM_READ_TIMEOUT_SECONDS", "10")),
+    max_connections=int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100")),
+    max_keepalive=int(os.getenv("UPSTREAM_MAX_KEEPALIVE", "20")),
+    max_retries=int(os.getenv("UPSTREAM_MAX_RETRIES", "3")),
+    backoff_base=float(os.getenv("UPSTREAM_BACKOFF_BASE_SECONDS", "0.5")),
+    backoff_max=float(os.getenv("UPSTREAM_BACKOFF_MAX_SECONDS", "8")),
+    rate_limiter=rate_limiter,
+    counters=counters,
+    timings=stage_timings,
+)
+
+# Both endpoints live on the same host, so geocoding uses HTTPS too and shares the pooled connection.
+# OWM_BASE_URL can point at a local stand-in (see owm_standin/) for testing and benchmarks.
+OWM_BASE_URL = os.getenv("OWM_BASE_URL", "https://api.openweathermap.org").rstrip("/")
+GEOCODING_URL = f"{OWM_BASE_URL}/geo/1.0/direct"
+ONECALL_URL = f"{OWM_BASE_URL}/data/3.0/onecall"
+
+# Coalesce concurrent identical lookups into one upstream call each
+geocode_flights = SingleFlight()
+onecall_flights = SingleFlight()
+
+# Limits for get_weather_batch
+WEATHER_BATCH_CONCURRENCY = int(os.getenv("WEATHER_BATCH_CONCURRENCY", "10"))
+WEATHER_BATCH_MAX_LOCATIONS = int(os.getenv("WEATHER_BATCH_MAX_LOCATIONS", "50"))
+
+# enrich_delivery_log only reads and writes files inside this directory
+DELIVERY_DATA_DIR = pathlib.Path(os.getenv("DELIVERY_DATA_DIR", ".")).resolve()
+
+# Approximate response size (tokens) per get_weather detail level, to measure savings
+response_sizes = ValueStats()
+
+# Strong references to in-flight background refreshes so they are not garbage collected
+_background_tasks = set()
+
 def unix_to_human_time(unix_timestamp):
     """Convert Unix timestamp to human-readable time"""
     try:
@@ -24,10 +133,211 @@ def unix_to_human_time(unix_timestamp):
         return "Invalid timestamp"
 
 
-# Initialize the FastMCP server
-mcp = FastMCP("WeatherAssistant")
+async def geocode_location(location):
+    """
+    Resolve a location name to coordinates, using the geocode cache or the offline
+    gazetteer when possible. Returns None when the location could not be found.
+    """
+    geo_result = geocode_cache.get(location)
+    if geo_result is not MISS:
+        return geo_result
+
+    geo_result = gazetteer.lookup(normalize_location(location))
+    if geo_result is not None:
+        return geo_result
+
+    # Concurrent lookups of the same normalized location share one request
+    return await geocode_flights.do(
+        normalize_location(location), lambda: _geocode_upstream(location)
+    )
+
+
+async def _geocode_upstream(location):
+    """Call the Geocoding API and cache the result"""
+    geocoding_params = {
+        "q": location,
+        "limit": 1,
+        "appid": OPENWEATHERMAP_API_KEY
+    }
+    geo_data = await upstream.get_json(GEOCODING_URL, geocoding_params)
+    
+    # Unknown locations are cached as None (negative caching)
+    geo_result = {
+        "lat": geo_data[0]["lat"],
+        "lon": geo_data[0]["lon"],
+        "name": geo_data[0]["name"],
+        "country": geo_data[0].get("country", "")
+    } if geo_data else None
+    geocode_cache.put(location, geo_result)
+    return geo_result
+
+
+async def fetch_onecall(lat, lon, units="metric", name=None):
+    """
+    Fetch One Call API 3.0 data for a coordinate pair and store it in the forecast cache
+    (and, for metric units, in the forecast store under `name`)
+    """
+    # Concurrent fetches for the same rounded coordinates share one request
+    return await onecall_flights.do(
+        forecast_cache.key(lat, lon, units), lambda: _fetch_onecall_upstream(lat, lon, units, name)
+    )
+
+
+async def _fetch_onecall_upstream(lat, lon, units, name=None):
+    """Call the One Call API 3.0 and cache the result"""
+    onecall_params = {
+        "lat": lat,
+        "lon": lon,
+        "exclude": "minutely",  # Exclude minutely data to reduce response size
+        "units": units,
+        "appid": OPENWEATHERMAP_API_KEY
+    }
+    
+    # One Call requests count against the daily subscription quota
+    weather_data = await upstream.get_json(ONECALL_URL, onecall_params, quota=quota_ledger)
+    forecast_cache.put(lat, lon, units, weather_data)
+    if units == "metric":
+        # Only this location's row is rewritten
+        forecast_store.update(forecast_cache.key(lat, lon, units), name, lat, lon, weather_data)
+    return weather_data
+
+
+def refresh_forecast_in_background(lat, lon, units="metric", name=None):
+    """Re-fetch a stale forecast cache entry without blocking the caller"""
+    if not forecast_cache.begin_refresh(lat, lon, units):
+        return  # A refresh for this location is already running
+
+    async def refresh():
+        ok = True
+        try:
+            await fetch_onecall(lat, lon, units, name)
+        except Exception:
+            ok = False  # Keep serving the stale copy; the next request retries
+        finally:
+            forecast_cache.end_refresh(lat, lon, units, ok=ok)
+
+    task = asyncio.create_task(refresh())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+async def refresh_watched_location(location):
+    """Fetch a watched location from upstream (updating the caches); returns (display name, payload)"""
+    geo_result = await geocode_location(location)
+    if geo_result is None:
+        raise LookupError(f"Could not find coordinates for '{location}'")
+    name = display_name(geo_result)
+    return name, await fetch_onecall(geo_result["lat"], geo_result["lon"], "metric", name)
+
+
+async def publish_alert_changes(changes):
+    """Tell subscribed clients that the watched locations' alerts changed"""
+    counters.inc("watchlist_alert_changes", amount=len(changes))
+    await notify_resource_updated("watchlist://alerts")
+
+
+# Background refresh of watched locations (opt-in: WATCHLIST_ENABLED=1 or --watchlist).
+# The watchlist gets WATCHLIST_QUOTA_SHARE of the daily One Call quota, split between workers.
+# Refreshing more often than the current conditions' TTL would waste calls, so 90% of it is the floor.
+watchlist = Watchlist(
+    refresh_watched_location,
+    publish_alert_changes,
+    daily_budget=max(1.0, quota_ledger.daily_limit * float(os.getenv("WATCHLIST_QUOTA_SHARE", "0.25"))
+                     / int(os.getenv("MCP_WORKERS", "1"))),
+    min_interval=float(os.getenv(
+        "WATCHLIST_MIN_INTERVAL_SECONDS",
+        str(0.9 * forecast_cache.ttls["current"]),
+    )),
+    alert_speedup=float(os.getenv("WATCHLIST_ALERT_SPEEDUP", "4")),
+    burst=int(os.getenv("WATCHLIST_BURST", "10")),
+    max_locations=int(os.getenv("WATCHLIST_MAX_LOCATIONS", "100")),
+    quota_is_low=quota_ledger.is_low,
+)
+watchlist_seeded = False
+
+
+def delivery_data_path(path: str):
+    """Resolve a tool-supplied path against DELIVERY_DATA_DIR; None if it points outside it"""
+    resolved = (DELIVERY_DATA_DIR / path).resolve()
+    return resolved if resolved.is_relative_to(DELIVERY_DATA_DIR) else None
+
+
+def watchlist_seeds() -> list[str]:
+    """WATCHLIST_LOCATIONS (separated by ";") plus every destination in WATCHLIST_SEED_LOG"""
+    seeds = [location for location in os.getenv("WATCHLIST_LOCATIONS", "").split(";") if location.strip()]
+    seed_log = pathlib.Path(os.getenv("WATCHLIST_SEED_LOG", "delivery_log.txt"))
+    if seed_log.exists():
+        seeds += [city for order_id, city in delivery_enrichment.iter_deliveries(seed_log) if order_id is not None]
+    return seeds
+
+
+@contextlib.asynccontextmanager
+async def watchlist_running():
+    """Runs the watchlist scheduler while the server runs, when the watchlist is enabled"""
+    if os.getenv("WATCHLIST_ENABLED", "0") != "1":
+        yield
+        return
+    global watchlist_seeded
+    if not watchlist_seeded:
+        # Seeded once per process: sessions come and go, and removed locations must stay removed
+        watchlist_seeded = True
+        watchlist.add(await asyncio.to_thread(watchlist_seeds))
+    async with watchlist.running():
+        yield
+
+
+@contextlib.asynccontextmanager
+async def server_lifespan(server):
+    # Entered once per session; an HTTP app already runs the watchlist from its own lifespan
+    async with watchlist_running():
+        yield {}
+
+
+# Initialize the FastMCP server.
+# Multi-worker HTTP deployments run stateless, since consecutive requests may hit different workers.
+mcp = FastMCP("WeatherAssistant", stateless_http=os.getenv("MCP_STATELESS_HTTP", "0") == "1",
+              lifespan=server_lifespan)
+
+# Sessions subscribed to each resource URI, notified with notifications/resources/updated
+resource_subscribers = {}
+
+
+@mcp._mcp_server.subscribe_resource()
+async def subscribe_resource(uri):
+    session = mcp._mcp_server.request_context.session
+    resource_subscribers.setdefault(str(uri), weakref.WeakSet()).add(session)
+
+
+@mcp._mcp_server.unsubscribe_resource()
+async def unsubscribe_resource(uri):
+    session = mcp._mcp_server.request_context.session
+    resource_subscribers.get(str(uri), weakref.WeakSet()).discard(session)
+
+
+def _advertise_subscriptions(get_capabilities):
+    # FastMCP always advertises resources.subscribe=False, even with subscribe handlers registered
+    def get_capabilities_with_subscribe(*args, **kwargs):
+        capabilities = get_capabilities(*args, **kwargs)
+        if capabilities.resources is not None:
+            capabilities.resources.subscribe = True
+        return capabilities
+    return get_capabilities_with_subscribe
+
+
+mcp._mcp_server.get_capabilities = _advertise_subscriptions(mcp._mcp_server.get_capabilities)
+
+
+async def notify_resource_updated(uri: str):
+    """Send a resource-updated notification to every session subscribed to `uri`"""
+    subscribers = resource_subscribers.get(uri, ())
+    for session in list(subscribers):
+        try:
+            await session.send_resource_updated(AnyUrl(uri))
+        except Exception:
+            subscribers.discard(session)  # The session has gone away
     
 @mcp.tool()
+@timed_handler(stage_timings, "tool:list_available_tools")
 def list_available_tools() -> dict:
     """
     Lists all available tools in this MCP server.
@@ -41,7 +351,9 @@ def list_available_tools() -> dict:
                 "name": "get_weather",
                 "description": "Fetches comprehensive weather data using OpenWeatherMap One Call API 3.0",
                 "parameters": {
-                    "location": "City name with optional country code (e.g., 'London,uk')"
+                    "location": "City name with optional country code (e.g., 'London,uk')",
+                    "detail": "Optional: 'current_only', 'summary' or 'full' (default)",
+                    "compact": "Optional: numeric values with units declared once"
                 },
                 "features": [
                     "Current weather conditions",
@@ -51,6 +363,109 @@ def list_available_tools() -> dict:
                     "UV index and visibility data"
                 ]
             },
+            {
+                "name": "get_weather_batch",
+                "description": "Fetches weather for several locations concurrently in a single call",
+                "parameters": {
+                    "locations": "List of city names with optional country codes (e.g., ['London,uk', 'Paris,fr'])",
+                    "max_concurrency": "Optional limit on simultaneous upstream lookups"
+                },
+                "features": [
+                    "Duplicate locations fetched once",
+                    "Concurrent geocoding and forecast lookups",
+                    "Per-location results or errors in one response"
+                ]
+            },
+            {
+                "name": "compare_weather",
+                "description": "Compares the weather in two or more locations and returns the differences",
+                "parameters": {
+                    "locations": "List of city names; the first one is the baseline (e.g., ['London,uk', 'Paris,fr'])"
+                },
+                "features": [
+                    "All locations fetched concurrently",
+                    "Temperature, wind and humidity deltas",
+                    "Condition and precipitation changes",
+                    "Warmest/coldest/windiest/wettest location"
+                ]
+            },
+            {
+                "name": "find_delivery_windows",
+                "description": "Finds the best delivery windows in the next 48 hours from the hourly forecast",
+                "parameters": {
+                    "location": "City name with optional country code",
+                    "window_hours": "Optional: window length in hours (default 3)",
+                    "top_k": "Optional: number of windows to return (default 3)",
+                    "horizon_hours": "Optional: how far ahead to look, up to 48 (default 48)",
+                    "weights": "Optional: relative weights of 'pop', 'rain', 'wind' and 'temp'",
+                    "thresholds": "Optional: hard limits 'max_pop', 'max_wind', 'max_rain_mm', 'min_temp', "
+                                  "'max_temp' and the ideal band 'ideal_min_temp'/'ideal_max_temp'"
+                },
+                "features": [
+                    "Vectorized rolling-window scoring of the hourly forecast",
+                    "Configurable weights and thresholds",
+                    "Top-k non-overlapping windows in local time"
+                ]
+            },
+            {
+                "name": "query_forecasts",
+                "description": "Filters, ranks and aggregates the forecasts of every location fetched so far",
+                "parameters": {
+                    "filters": "Optional: conditions like {'field': 'daily.pop', 'op': '>', 'value': 70}",
+                    "sort_by": "Optional: field to rank by (default: the first filter's field)",
+                    "top_k": "Optional: number of locations to return (default 10)",
+                    "ascending": "Optional: rank lowest first",
+                    "aggregates": "Optional: fields to summarize (count/min/mean/max) over the matches",
+                    "day": "Optional: day daily fields refer to, 0 = today, 1 = tomorrow (default)",
+                    "hours": "Optional: hours from now hourly fields cover (default 24)",
+                    "max_age_minutes": "Optional: ignore forecasts older than this"
+                },
+                "features": [
+                    "No upstream calls: answers from forecasts already fetched",
+                    "Vectorized filters across every cached location",
+                    "Top-k ranking and aggregates"
+                ]
+            },
+            {
+                "name": "suggest_locations",
+                "description": "Autocompletes a partial location name",
+                "parameters": {
+                    "prefix": "Start of a city name, optionally with a country code (e.g., 'san d' or 'spring,us')",
+                    "limit": "Optional: number of suggestions (default 5)"
+                },
+                "features": [
+                    "Offline gazetteer with prefix and fuzzy matching",
+                    "Most populous places first",
+                    "Each suggestion includes a query string for get_weather"
+                ]
+            },
+            {
+                "name": "manage_watchlist",
+                "description": "Adds or removes locations whose forecasts are kept warm in the background",
+                "parameters": {
+                    "add": "Optional: locations to start watching",
+                    "remove": "Optional: locations to stop watching"
+                },
+                "features": [
+                    "Forecasts refreshed within the daily quota",
+                    "Locations with alerts refreshed more often",
+                    "Alert changes pushed to clients subscribed to watchlist://alerts"
+                ]
+            },
+            {
+                "name": "enrich_delivery_log",
+                "description": "Adds destination weather to every order in a delivery log (JSONL output)",
+                "parameters": {
+                    "log_path": "Delivery log file (default: 'delivery_log.txt')",
+                    "output_path": "Optional output .jsonl file",
+                    "max_concurrency": "Optional limit on simultaneous upstream lookups"
+                },
+                "features": [
+                    "Streams logs of any size",
+                    "Each unique city fetched once",
+                    "Per-order enriched JSONL records"
+                ]
+            },
             {
                 "name": "list_available_tools",
                 "description": "Lists all available tools in this MCP server",
@@ -61,156 +476,749 @@ def list_available_tools() -> dict:
         "server_info": {
             "name": "WeatherAssistant",
             "api_version": "One Call API 3.0",
-            "total_tools": 2
+            "total_tools": 9
         }
     }
 
 
-@mcp.tool()
-def get_weather(location: str) -> dict:
-    """
-    Fetches comprehensive weather data for a specified location using OpenWeatherMap One Call API 3.0.
-    
-    This includes current weather, hourly forecast (48h), daily forecast (8 days), and weather alerts.
+# get_weather detail levels -> forecast cache sections they depend on
+DETAIL_LEVELS = {
+    "current_only": ("current",),
+    "summary": ("current", "daily", "alerts"),
+    "full": ("current", "daily", "alerts"),
+}
 
-    Args:
-        location: The city name and optional country code (e.g., "London,uk").
+# Units for compact reports, declared once instead of repeated in every value
+COMPACT_UNITS = {
+    "temp": "°C",
+    "wind": "m/s",
+    "pressure": "hPa",
+    "humidity": "%",
+    "clouds": "%",
+    "pop": "%",
+    "visibility": "m",
+    "time": "UTC",
+}
 
-    Returns:
-        A dictionary containing comprehensive weather information or an error message.
-    """
-    if not OPENWEATHERMAP_API_KEY:
-        return {"error": "OpenWeatherMap API key is not configured on the server."}
 
-    try:
-        # Step 1: Get coordinates from location name using Geocoding API
-        geocoding_url = "http://api.openweathermap.org/geo/1.0/direct"
-        geocoding_params = {
-            "q": location,
-            "limit": 1,
-            "appid": OPENWEATHERMAP_API_KEY
-        }
-        
-        geo_response = requests.get(geocoding_url, params=geocoding_params)
-        geo_response.raise_for_status()
-        geo_data = geo_response.json()
-        
-        if not geo_data:
-            return {"error": f"Could not find coordinates for '{location}'. Please check the location name."}
-        
-        lat = geo_data[0]["lat"]
-        lon = geo_data[0]["lon"]
-        city_name = geo_data[0]["name"]
-        country = geo_data[0].get("country", "")
-        
-        # Step 2: Get weather data using One Call API 3.0
-        onecall_url = "https://api.openweathermap.org/data/3.0/onecall"
-        onecall_params = {
-            "lat": lat,
-            "lon": lon,
-            "exclude": "minutely",  # Exclude minutely data to reduce response size
-            "units": "metric",
-            "appid": OPENWEATHERMAP_API_KEY
+def format_weather_report(geo_result, weather_data, detail="full"):
+    """Build the get_weather response from a geocoding result and a raw One Call payload"""
+    lat = geo_result["lat"]
+    lon = geo_result["lon"]
+    city_name = geo_result["name"]
+    country = geo_result["country"]
+
+    # Extract and format the relevant weather information
+    current = weather_data["current"]
+    daily = weather_data.get("daily", [])
+    alerts = weather_data.get("alerts", [])
+
+    # Format current weather
+    formatted_data = {
+        "location": f"{city_name}, {country}" if country else city_name,
+        "coordinates": {"latitude": lat, "longitude": lon},
+        "current_weather": {
+            "description": current["weather"][0]["description"],
+            "temperature_celsius": f"{current['temp']}°C",
+            "feels_like_celsius": f"{current['feels_like']}°C",
+            "humidity": f"{current['humidity']}%",
+            "pressure": f"{current['pressure']} hPa",
+            "wind_speed_mps": f"{current['wind_speed']} m/s",
+            "wind_direction": f"{current.get('wind_deg', 'N/A')}°",
+            "clouds": f"{current['clouds']}%",
+            "uv_index": current['uvi'],
+            "visibility": f"{current.get('visibility', 'N/A')} m"
         }
-        
-        weather_response = requests.get(onecall_url, params=onecall_params)
-        weather_response.raise_for_status()
-        weather_data = weather_response.json()
-        
-        # Extract and format the relevant weather information
-        current = weather_data["current"]
-        daily = weather_data.get("daily", [])
-        alerts = weather_data.get("alerts", [])
-        
-        # Format current weather
-        formatted_data = {
-            "location": f"{city_name}, {country}" if country else city_name,
-            "coordinates": {"latitude": lat, "longitude": lon},
-            "current_weather": {
-                "description": current["weather"][0]["description"],
-                "temperature_celsius": f"{current['temp']}°C",
-                "feels_like_celsius": f"{current['feels_like']}°C",
-                "humidity": f"{current['humidity']}%",
-                "pressure": f"{current['pressure']} hPa",
-                "wind_speed_mps": f"{current['wind_speed']} m/s",
-                "wind_direction": f"{current.get('wind_deg', 'N/A')}°",
-                "clouds": f"{current['clouds']}%",
-                "uv_index": current['uvi'],
-                "visibility": f"{current.get('visibility', 'N/A')} m"
-            }
+    }
+
+    if detail == "current_only":
+        return formatted_data
+
+    if detail == "summary":
+        # Headline numbers only: no coordinates, multi-day forecast or alert texts
+        del formatted_data["coordinates"]
+        formatted_data["current_weather"] = {
+            key: formatted_data["current_weather"][key]
+            for key in ("description", "temperature_celsius", "feels_like_celsius", "humidity", "wind_speed_mps")
         }
-        
-        # Add today's forecast
         if daily:
             today = daily[0]
             formatted_data["today_forecast"] = {
                 "summary": today.get("summary", "No summary available"),
                 "min_temp": f"{today['temp']['min']}°C",
                 "max_temp": f"{today['temp']['max']}°C",
-                "morning_temp": f"{today['temp']['morn']}°C",
-                "evening_temp": f"{today['temp']['eve']}°C",
-                "precipitation_probability": f"{int(today['pop'] * 100)}%",
-                "sunrise": unix_to_human_time(today['sunrise']),
-                "sunset": unix_to_human_time(today['sunset'])
+                "precipitation_probability": f"{int(today['pop'] * 100)}%"
             }
-        
-        # Add next 3 days forecast
-        if len(daily) > 1:
-            formatted_data["3_day_forecast"] = []
-            for day in daily[1:4]:  # Next 3 days
-                formatted_data["3_day_forecast"].append({
-                    "date": unix_to_human_time(day['dt']),
-                    "summary": day.get("summary", "No summary available"),
-                    "min_temp": f"{day['temp']['min']}°C",
-                    "max_temp": f"{day['temp']['max']}°C",
-                    "weather": day["weather"][0]["description"],
-                    "precipitation_probability": f"{int(day['pop'] * 100)}%"
-                })
-        
-        # Add weather alerts if any
         if alerts:
-            formatted_data["alerts"] = []
-            for alert in alerts[:3]:  # Limit to 3 alerts
-                formatted_data["alerts"].append({
+            formatted_data["alerts"] = [alert["event"] for alert in alerts[:3]]
+        return formatted_data
+
+    # Add today's forecast
+    if daily:
+        today = daily[0]
+        formatted_data["today_forecast"] = {
+            "summary": today.get("summary", "No summary available"),
+            "min_temp": f"{today['temp']['min']}°C",
+            "max_temp": f"{today['temp']['max']}°C",
+            "morning_temp": f"{today['temp']['morn']}°C",
+            "evening_temp": f"{today['temp']['eve']}°C",
+            "precipitation_probability": f"{int(today['pop'] * 100)}%",
+            "sunrise": unix_to_human_time(today['sunrise']),
+            "sunset": unix_to_human_time(today['sunset'])
+        }
+
+    # Add next 3 days forecast
+    if len(daily) > 1:
+        formatted_data["3_day_forecast"] = []
+        for day in daily[1:4]:  # Next 3 days
+            formatted_data["3_day_forecast"].append({
+                "date": unix_to_human_time(day['dt']),
+                "summary": day.get("summary", "No summary available"),
+                "min_temp": f"{day['temp']['min']}°C",
+                "max_temp": f"{day['temp']['max']}°C",
+                "weather": day["weather"][0]["description"],
+                "precipitation_probability": f"{int(day['pop'] * 100)}%"
+            })
+
+    # Add weather alerts if any
+    if alerts:
+        formatted_data["alerts"] = []
+        for alert in alerts[:3]:  # Limit to 3 alerts
+            formatted_data["alerts"].append({
+                "event": alert["event"],
+                "description": (alert["description"][:200] + "..." 
+                               if len(alert["description"]) > 200 
+                               else alert["description"]),
+                "start": unix_to_human_time(alert['start']),
+                "end": unix_to_human_time(alert['end'])
+            })
+
+    return formatted_data
+
+
+def _utc(unix_timestamp, fmt):
+    return datetime.fromtimestamp(unix_timestamp, tz=timezone.utc).strftime(fmt)
+
+
+def format_compact_report(geo_result, weather_data, detail="full"):
+    """
+    Build a compact get_weather response: plain numbers with units declared once,
+    which costs the model far fewer tokens than the pre-formatted strings.
+    """
+    city_name = geo_result["name"]
+    country = geo_result["country"]
+    current = weather_data["current"]
+    daily = weather_data.get("daily", [])
+    alerts = weather_data.get("alerts", [])
+
+    # Only declare the units this detail level actually uses
+    units = ["temp", "wind", "humidity"]
+    if detail != "summary":
+        units += ["pressure", "clouds", "visibility"]
+    if detail != "current_only" and daily:
+        units.append("pop")
+    if detail == "full":
+        units.append("time")
+
+    report = {
+        "location": f"{city_name}, {country}" if country else city_name,
+        "units": {unit: COMPACT_UNITS[unit] for unit in units},
+        "current": {
+            "desc": current["weather"][0]["description"],
+            "temp": current["temp"],
+            "feels": current["feels_like"],
+            "humidity": current["humidity"],
+            "wind": current["wind_speed"],
+        },
+    }
+
+    if detail != "summary":
+        report["current"].update({
+            "wind_deg": current.get("wind_deg"),
+            "pressure": current["pressure"],
+            "clouds": current["clouds"],
+            "uvi": current["uvi"],
+            "visibility": current.get("visibility"),
+        })
+    if detail == "current_only":
+        return report
+
+    if daily:
+        today = daily[0]
+        report["today"] = {
+            "summary": today.get("summary"),
+            "min": today["temp"]["min"],
+            "max": today["temp"]["max"],
+            "pop": round(today["pop"] * 100),
+        }
+        if detail == "full":
+            report["today"].update({
+                "morn": today["temp"]["morn"],
+                "eve": today["temp"]["eve"],
+                "sunrise": _utc(today["sunrise"], "%H:%M"),
+                "sunset": _utc(today["sunset"], "%H:%M"),
+            })
+
+    if detail == "full" and len(daily) > 1:
+        report["next_days"] = [
+            {
+                "date": _utc(day["dt"], "%Y-%m-%d"),
+                "desc": day["weather"][0]["description"],
+                "min": day["temp"]["min"],
+                "max": day["temp"]["max"],
+                "pop": round(day["pop"] * 100),
+            }
+            for day in daily[1:4]
+        ]
+
+    if alerts:
+        if detail == "full":
+            report["alerts"] = [
+                {
                     "event": alert["event"],
-                    "description": (alert["description"][:200] + "..." 
-                                   if len(alert["description"]) > 200 
-                                   else alert["description"]),
-                    "start": unix_to_human_time(alert['start']),
-                    "end": unix_to_human_time(alert['end'])
-                })
+                    "start": _utc(alert["start"], "%Y-%m-%d %H:%M"),
+                    "end": _utc(alert["end"], "%Y-%m-%d %H:%M"),
+                    "desc": alert["description"][:200],
+                }
+                for alert in alerts[:3]
+            ]
+        else:
+            report["alerts"] = [alert["event"] for alert in alerts[:3]]
+
+    return report
+
+
+def display_name(geo_result) -> str:
+    """The "City, CC" display name of a geocoding result"""
+    return f"{geo_result['name']}, {geo_result['country']}" if geo_result["country"] else geo_result["name"]
+
+
+def drop_past(weather_data: dict, now: float) -> dict:
+    """
+    A One Call payload without the forecast rows and alerts that have already ended,
+    so a cached payload never reports an earlier day as today.
+    """
+    return {
+        **weather_data,
+        # Daily rows are stamped at local noon, so a day ends about 12 hours after its dt
+        "daily": [day for day in weather_data.get("daily", []) if day["dt"] + 43200 > now],
+        "hourly": [hour for hour in weather_data.get("hourly", []) if hour["dt"] + 3600 > now],
+        "alerts": [alert for alert in weather_data.get("alerts", []) if not alert.get("end") or alert["end"] > now],
+    }
+
+
+def weather_error(error_class: str, message: str) -> dict:
+    """An {"error": ...} result, counted by error class for the metrics"""
+    counters.inc("weather_errors", error_class=error_class)
+    return {"error": message}
+
+
+async def fetch_weather(location: str, detail: str = "full", compact: bool = False) -> dict:
+    """
+    Geocodes a location and builds its formatted weather report.
+    Shared by the weather tools; failures are returned as {"error": ...} instead of raised.
+    """
+    def build(geo_result, weather_data):
+        with stage_timings.time("format"):
+            if compact:
+                return format_compact_report(geo_result, weather_data, detail)
+            return format_weather_report(geo_result, weather_data, detail)
+
+    return await with_forecast(location, DETAIL_LEVELS[detail], build)
+
+
+async def with_forecast(location: str, sections, build) -> dict:
+    """
+    Geocodes a location, gets its One Call data (from the forecast cache when possible)
+    and returns build(geo_result, weather_data).
+    Failures are returned as {"error": ...} instead of raised.
+
+    Args:
+        location: City name with optional country code.
+        sections: Forecast sections the result depends on (decides cache freshness).
+        build: Turns the geocoding result and One Call payload into the response.
+    """
+    if not OPENWEATHERMAP_API_KEY:
+        return weather_error("not_configured", "OpenWeatherMap API key is not configured on the server.")
+
+    # Tracks which upstream API is being called, for error reporting
+    stage = "geocoding"
+    try:
+        # Step 1: Get coordinates from location name, using the geocode cache when possible
+        with stage_timings.time("geocode"):
+            geo_result = await geocode_location(location)
+        if geo_result is None:
+            return weather_error("unknown_location", f"Could not find coordinates for '{location}'. Please check the location name.")
         
-        return formatted_data
+        lat = geo_result["lat"]
+        lon = geo_result["lon"]
+        name = display_name(geo_result)
+        
+        # Step 2: Get weather data using One Call API 3.0, served from the forecast cache when possible
+        stage = "weather"
+        # When quota is running low, prefer any cached copy over spending a call
+        with stage_timings.time("onecall"):
+            low_quota = quota_ledger.is_low()
+            weather_data, cache_state = forecast_cache.get(
+                lat, lon, "metric", sections=sections, allow_expired=low_quota
+            )
+            if cache_state == STALE and not low_quota:
+                # Serve the stale copy right away and refresh it in the background
+                refresh_forecast_in_background(lat, lon, "metric", name)
+            elif weather_data is None:
+                weather_data = await fetch_onecall(lat, lon, "metric", name)
+        
+        now = time.time()
+        result = build(geo_result, drop_past(weather_data, now))
+        if cache_state == STALE and "error" not in result:
+            # Say how old the data is instead of presenting it as current
+            result.update(stale=True, data_age_seconds=round(now - weather_data["current"]["dt"]))
+        return result
 
-    except requests.exceptions.HTTPError as http_err:
-        # Check which response caused the error
-        if 'geo_response' in locals():
-            status_code = geo_response.status_code
+    except httpx.HTTPStatusError as http_err:
+        # Check which API caused the error
+        status_code = http_err.response.status_code
+        if stage == "geocoding":
             if status_code == 401:
-                return {"error": "Authentication failed. Please check your OpenWeatherMap API key."}
+                return weather_error("geocoding_401", "Authentication failed. Please check your OpenWeatherMap API key.")
             elif status_code == 404:
-                return {"error": f"Could not find location '{location}'. Please check the location name."}
+                return weather_error("geocoding_404", f"Could not find location '{location}'. Please check the location name.")
             else:
-                return {"error": f"Geocoding API error: {http_err}"}
-        elif 'weather_response' in locals():
-            status_code = weather_response.status_code
+                return weather_error(f"geocoding_{status_code}", f"Geocoding API error: {http_err}")
+        elif stage == "weather":
             if status_code == 401:
-                return {"error": "Authentication failed. Please check your API key and ensure you're subscribed to One Call API 3.0."}
+                return weather_error("onecall_401", "Authentication failed. Please check your API key and ensure you're subscribed to One Call API 3.0.")
             elif status_code == 402:
-                return {"error": ("Subscription required. One Call API 3.0 requires a separate "
-                                "'One Call by Call' subscription.")}
+                return weather_error("onecall_402", ("Subscription required. One Call API 3.0 requires a separate "
+                                "'One Call by Call' subscription."))
             elif status_code == 429:
-                return {"error": "API rate limit exceeded. Please try again later."}
+                return weather_error("onecall_429", "API rate limit exceeded. Please try again later.")
             else:
-                return {"error": f"Weather API error: {http_err}"}
+                return weather_error(f"onecall_{status_code}", f"Weather API error: {http_err}")
         else:
-            return {"error": f"HTTP error occurred: {http_err}"}
-    except requests.exceptions.RequestException as req_err:
-        return {"error": f"Network error occurred: {req_err}"}
+            return weather_error(f"http_{status_code}", f"HTTP error occurred: {http_err}")
+    except QuotaExceededError as quota_err:
+        return weather_error("quota_exceeded", f"{quota_err} Please try again after midnight UTC.")
+    except httpx.RequestError as req_err:
+        return weather_error("network", f"Network error occurred: {req_err}")
     except KeyError as key_err:
-        return {"error": f"Unexpected data format from weather API: missing field {key_err}"}
+        return weather_error("bad_data", f"Unexpected data format from weather API: missing field {key_err}")
     except Exception as e:
-        return {"error": f"An unexpected error occurred: {e}"}
+        return weather_error(type(e).__name__, f"An unexpected error occurred: {e}")
+
+
+@mcp.tool()
+@timed_handler(stage_timings, "tool:get_weather")
+async def get_weather(location: str, detail: str = "full", compact: bool = False) -> dict:
+    """
+    Fetches comprehensive weather data for a specified location using OpenWeatherMap One Call API 3.0.
+    
+    This includes current weather, hourly forecast (48h), daily forecast (8 days), and weather alerts.
+    Ask only for what the question needs: "current_only" for "what's it like now" questions,
+    "summary" for a quick overview, "full" when the multi-day forecast or alert details matter.
+
+    Args:
+        location: The city name and optional country code (e.g., "London,uk").
+        detail: "current_only", "summary" or "full" (default).
+        compact: Return plain numbers with units declared once instead of formatted strings.
+
+    Returns:
+        A dictionary containing comprehensive weather information or an error message.
+    """
+    if detail not in DETAIL_LEVELS:
+        return {"error": f"Invalid detail '{detail}'. Use one of: {', '.join(DETAIL_LEVELS)}."}
+
+    with stage_timings.time("get_weather"):
+        report = await fetch_weather(location, detail, compact)
+    if "error" not in report:
+        response_sizes.record(f"{detail}{'+compact' if compact else ''}", estimate_tokens(report))
+    return report
+
+
+@mcp.tool()
+@timed_handler(stage_timings, "tool:get_weather_batch")
+async def get_weather_batch(locations: list[str], max_concurrency: int | None = None,
+                            detail: str = "full", compact: bool = False) -> dict:
+    """
+    Fetches weather data for several locations in a single call.
+    This is the best choice when a user asks about, or wants to compare, more than one place.
+
+    Duplicate locations (e.g., "London,uk" and "london, GB") are fetched only once, and all
+    locations are geocoded and fetched concurrently.
+
+    Args:
+        locations: City names with optional country codes (e.g., ["London,uk", "Paris,fr"]).
+        max_concurrency: Optional limit on simultaneous upstream lookups.
+        detail: "current_only", "summary" or "full" (default), as for get_weather.
+        compact: Return plain numbers with units declared once instead of formatted strings.
+
+    Returns:
+        A dictionary with one result (weather data or an error) per unique location.
+    """
+    if not locations:
+        return {"error": "Please provide at least one location."}
+    if detail not in DETAIL_LEVELS:
+        return {"error": f"Invalid detail '{detail}'. Use one of: {', '.join(DETAIL_LEVELS)}."}
+
+    # Dedupe on the normalized location, keeping the caller's order and spelling
+    unique_locations = {}
+    for location in locations:
+        unique_locations.setdefault(normalize_location(location), location)
+    if len(unique_locations) > WEATHER_BATCH_MAX_LOCATIONS:
+        return {"error": f"Too many locations: at most {WEATHER_BATCH_MAX_LOCATIONS} are allowed per batch."}
+
+    concurrency = max(1, min(max_concurrency or WEATHER_BATCH_CONCURRENCY, WEATHER_BATCH_CONCURRENCY))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch_one(location):
+        async with semaphore:
+            return await fetch_weather(location, detail, compact)
+
+    reports = await asyncio.gather(*(fetch_one(location) for location in unique_locations.values()))
+
+    results = []
+    for location, report in zip(unique_locations.values(), reports):
+        if "error" in report:
+            results.append({"query": location, "error": report["error"]})
+        else:
+            results.append({"query": location, "weather": report})
+
+    failed = sum(1 for result in results if "error" in result)
+    return {
+        "results": results,
+        "summary": {
+            "requested": len(locations),
+            "unique": len(results),
+            "succeeded": len(results) - failed,
+            "failed": failed
+        }
+    }
+
+
+@mcp.tool()
+@timed_handler(stage_timings, "tool:compare_weather")
+async def compare_weather(locations: list[str]) -> dict:
+    """
+    Compares the weather in two or more locations in a single call.
+    This is the best choice when a user asks to compare, contrast, or see the difference
+    in weather between places. The differences are already computed, so summarize them
+    instead of fetching each location with get_weather.
+
+    Args:
+        locations: City names with optional country codes (e.g., ["London,uk", "Paris,fr"]).
+            The first location is the baseline the others are compared with.
+
+    Returns:
+        Headline numbers per location, each other location's differences from the first
+        (temperature, feels-like, wind and humidity deltas, condition and precipitation
+        changes), the warmest/coldest/windiest/wettest location, and any per-location errors.
+    """
+    # Dedupe on the normalized location, keeping the caller's order and spelling
+    unique_locations = {}
+    for location in locations or []:
+        unique_locations.setdefault(normalize_location(location), location)
+    if len(unique_locations) < 2:
+        return {"error": "Please provide at least two different locations to compare."}
+    if len(unique_locations) > WEATHER_BATCH_MAX_LOCATIONS:
+        return {"error": f"Too many locations: at most {WEATHER_BATCH_MAX_LOCATIONS} can be compared."}
+
+    semaphore = asyncio.Semaphore(WEATHER_BATCH_CONCURRENCY)
+
+    async def fetch_one(location):
+        async with semaphore:
+            return await fetch_weather(location, "summary", compact=True)
+
+    reports = await asyncio.gather(*(fetch_one(location) for location in unique_locations.values()))
+    # Forecasts are always fetched in metric units, whichever of the reports succeeded
+    units = {unit: COMPACT_UNITS[unit] for unit in ("temp", "wind", "humidity", "pop")}
+    comparison = compare_reports(list(zip(unique_locations.values(), reports)), units)
+    if len(comparison["locations"]) < 2:
+        return {"error": "Could not get the weather for enough of the locations to compare them.",
+                "errors": comparison.get("errors", [])}
+    response_sizes.record("compare", estimate_tokens(comparison))
+    return comparison
+
+
+@mcp.tool()
+@timed_handler(stage_timings, "tool:find_delivery_windows")
+async def find_delivery_windows(location: str, window_hours: int = 3, top_k: int = 3, horizon_hours: int = 48,
+                                weights: dict[str, float] | None = None,
+                                thresholds: dict[str, float] | None = None) -> dict:
+    """
+    Finds the best times in the next 48 hours for a delivery (or any outdoor activity)
+    at a location, based on the hourly forecast. Use this for "when should we deliver",
+    "best time in the next two days" or "driest window tomorrow" questions instead of
+    reasoning over hourly forecast data.
+
+    Each window is scored 0-100 from the chance of precipitation, rain/snow volume, wind
+    and temperature. Windows containing an hour past a hard threshold are skipped.
+
+    Args:
+        location: The city name and optional country code (e.g., "London,uk").
+        window_hours: Length of each window in hours (1-24, default 3).
+        top_k: Number of non-overlapping windows to return (1-10, default 3).
+        horizon_hours: How many hours ahead to consider (up to 48, default 48).
+        weights: Optional relative weights for "pop", "rain", "wind" and "temp"
+            (defaults: pop 0.4, rain 0.25, wind 0.2, temp 0.15).
+        thresholds: Optional limits: "max_pop" (%, default 60), "max_wind" (m/s, 12),
+            "max_rain_mm" (per hour, 2), "min_temp"/"max_temp" (°C, -10/38) and the
+            ideal band "ideal_min_temp"/"ideal_max_temp" (°C, 5/25).
+
+    Returns:
+        The best windows (start/end in local time, score, temperature range, max
+        precipitation chance, max wind, total precipitation) or an error message.
+    """
+    if not 1 <= window_hours <= 24:
+        return weather_error("invalid_arguments", "window_hours must be between 1 and 24.")
+    if not 1 <= top_k <= 10:
+        return weather_error("invalid_arguments", "top_k must be between 1 and 10.")
+    if not window_hours <= horizon_hours <= 48:
+        return weather_error("invalid_arguments", "horizon_hours must be between window_hours and 48.")
+    unknown = set(weights or {}) - set(delivery_windows.DEFAULT_WEIGHTS)
+    unknown |= set(thresholds or {}) - set(delivery_windows.DEFAULT_THRESHOLDS)
+    if unknown:
+        return weather_error("invalid_arguments", f"Unknown weight or threshold: {', '.join(sorted(unknown))}.")
+    if weights and (min(weights.values()) < 0 or sum(dict(delivery_windows.DEFAULT_WEIGHTS, **weights).values()) <= 0):
+        return weather_error("invalid_arguments", "Weights must be non-negative and not all zero.")
+    limits = dict(delivery_windows.DEFAULT_THRESHOLDS, **(thresholds or {}))
+    if min(limits["max_pop"], limits["max_wind"], limits["max_rain_mm"]) <= 0:
+        return weather_error("invalid_arguments", "max_pop, max_wind and max_rain_mm must be positive.")
+    if limits["ideal_min_temp"] > limits["ideal_max_temp"]:
+        return weather_error("invalid_arguments", "ideal_min_temp must not be above ideal_max_temp.")
+    if limits["min_temp"] > limits["max_temp"]:
+        return weather_error("invalid_arguments", "min_temp must not be above max_temp.")
+
+    def build(geo_result, weather_data):
+        if not weather_data.get("hourly"):
+            return {"error": "No hourly forecast is available for this location."}
+        with stage_timings.time("score_windows"):
+            result = delivery_windows.best_windows(
+                weather_data["hourly"], window_hours, top_k, horizon_hours, weights, thresholds,
+                utc_offset_seconds=weather_data.get("timezone_offset", 0),
+            )
+        offset = weather_data.get("timezone_offset", 0)
+        sign = "+" if offset >= 0 else "-"
+        return {
+            "location": display_name(geo_result),
+            "times": f"local (UTC{sign}{abs(offset) // 3600:02d}:{abs(offset) % 3600 // 60:02d})",
+            "units": {"temp": "°C", "wind": "m/s", "pop": "%", "precip": "mm"},
+            "window_hours": window_hours,
+            **result,
+            **({} if result["windows"] else
+               {"note": "No window meets the thresholds; try relaxing them or a shorter window_hours."}),
+        }
+
+    return await with_forecast(location, ("hourly",), build)
+
+
+@mcp.tool()
+@timed_handler(stage_timings, "tool:query_forecasts")
+def query_forecasts(filters: list[dict] | None = None, sort_by: str | None = None, top_k: int = 10,
+                    ascending: bool = False, aggregates: list[str] | None = None, day: int = 1,
+                    hours: int = 24, max_age_minutes: float | None = None) -> dict:
+    """
+    Answers questions across many locations at once, such as "which of our delivery cities
+    will have more than 70% chance of rain tomorrow" or "the 5 windiest cities right now",
+    from the forecasts the server has already fetched (no upstream calls). Fetch any missing
+    locations first with get_weather_batch or enrich_delivery_log.
+
+    Fields: "current.temp", "current.feels", "current.humidity", "current.wind";
+    "daily.temp_min", "daily.temp_max", "daily.pop", "daily.wind", "daily.precip" for the
+    chosen day; "hourly.temp_min", "hourly.temp_max", "hourly.pop", "hourly.wind" (highest
+    or lowest over the next `hours`) and "hourly.precip" (total over the next `hours`).
+    Temperatures are °C, wind m/s, pop (chance of precipitation) % and precip mm.
+
+    Args:
+        filters: Conditions that must all hold, each {"field": ..., "op": ">", "value": 70};
+            op is one of >, >=, <, <=, ==, !=.
+        sort_by: Field to rank the matches by (default: the first filter's field).
+        top_k: Number of matching locations to return (1-100, default 10).
+        ascending: Rank lowest values first instead of highest.
+        aggregates: Fields to summarize (count, min, mean, max) over all matching locations.
+        day: Which local day daily fields refer to: 0 = today, 1 = tomorrow (default), up to 7.
+        hours: How many hours from now hourly fields cover (1-48, default 24).
+        max_age_minutes: Ignore locations whose forecast is older than this.
+
+    Returns:
+        How many locations were scanned and matched, the top matches with their values
+        and forecast age, and the aggregates, or an error message.
+    """
+    if not 1 <= top_k <= 100:
+        return {"error": "top_k must be between 1 and 100."}
+    if not 0 <= day < DAYS:
+        return {"error": f"day must be between 0 and {DAYS - 1}."}
+    if not 1 <= hours <= HOURS:
+        return {"error": f"hours must be between 1 and {HOURS}."}
+    for condition in filters or []:
+        if not isinstance(condition, dict) or not {"field", "op", "value"} <= set(condition):
+            return {"error": "Each filter needs a 'field', an 'op' and a 'value'."}
+    requested = ([condition["field"] for condition in filters or []] + ([sort_by] if sort_by else [])
+                 + list(aggregates or []))
+    known = field_names()
+    unknown = set(requested) - set(known)
+    if unknown:
+        return {"error": f"Unknown field: {', '.join(sorted(unknown))}. Use one of: {', '.join(known)}."}
+
+    try:
+        with stage_timings.time("store_query"):
+            result = forecast_store.query(
+                filters, sort_by, top_k, ascending, aggregates, day, hours,
+                max_age=max_age_minutes * 60 if max_age_minutes is not None else None,
+            )
+    except (TypeError, ValueError) as e:
+        return {"error": str(e)}
+
+    response = {
+        "day": day,
+        "hours": hours,
+        "units": {field: FIELD_UNITS[field.partition(".")[2]] for field in dict.fromkeys(requested)},
+        **result,
+    }
+    if not result["scanned"]:
+        response["note"] = "No forecasts have been fetched yet; fetch the locations first with get_weather_batch."
+    response_sizes.record("query_forecasts", estimate_tokens(response))
+    return response
+
+
+def location_query(name: str, state: str, country: str) -> str:
+    """The get_weather location string for a place (the Geocoding API takes a state for US places only)"""
+    if country == "US" and state:
+        return f"{name},{state},{country}"
+    return f"{name},{country}" if country else name
+
+
+@mcp.tool()
+@timed_handler(stage_timings, "tool:suggest_locations")
+async def suggest_locations(prefix: str, limit: int = 5) -> dict:
+    """
+    Suggests places matching a partial or misspelled location name, most populous first.
+    Use this to autocomplete a location or to find the intended place when get_weather
+    cannot find a location or the name is ambiguous (e.g., "Portland" or "Springfield").
+
+    Args:
+        prefix: The start of a city name, optionally followed by a state and/or country code
+            (e.g., "san d", "springf,us", "portland,me,us").
+        limit: Maximum number of suggestions (1-20, default 5).
+
+    Returns:
+        Suggestions with name, state, country, coordinates and a "query" string to pass
+        to get_weather, or an error message.
+    """
+    if not prefix or not prefix.strip(" ,"):
+        return {"error": "Please provide the start of a location name."}
+    if not 1 <= limit <= 20:
+        return {"error": "limit must be between 1 and 20."}
+
+    if gazetteer.available:
+        with stage_timings.time("gazetteer_suggest"):
+            places = gazetteer.suggest(normalize_location(prefix), limit)
+        return {
+            "source": "gazetteer",
+            "suggestions": [
+                {"query": location_query(place["name"], place["state"], place["country"]), **place}
+                for place in places
+            ],
+        }
+
+    # No offline gazetteer: the Geocoding API matches whole names only, not prefixes
+    if not OPENWEATHERMAP_API_KEY:
+        return weather_error("not_configured", "OpenWeatherMap API key is not configured on the server.")
+    try:
+        places = await upstream.get_json(
+            GEOCODING_URL, {"q": prefix, "limit": limit, "appid": OPENWEATHERMAP_API_KEY}
+        )
+    except httpx.HTTPStatusError as http_err:
+        return weather_error(f"geocoding_{http_err.response.status_code}", f"Geocoding API error: {http_err}")
+    except httpx.RequestError as req_err:
+        return weather_error("network", f"Network error occurred: {req_err}")
+    return {
+        "source": "geocoding_api",
+        "suggestions": [
+            {
+                # The API returns full state names, but queries take state codes
+                "query": location_query(place["name"], "", place.get("country", "")),
+                "lat": place["lat"],
+                "lon": place["lon"],
+                "name": place["name"],
+                "country": place.get("country", ""),
+                "state": place.get("state", ""),
+            }
+            for place in places
+        ],
+    }
+
+
+@mcp.tool()
+@timed_handler(stage_timings, "tool:manage_watchlist")
+async def manage_watchlist(add: list[str] | None = None, remove: list[str] | None = None) -> dict:
+    """
+    Adds locations to or removes them from the watchlist, then returns its status.
+    Watched locations are refreshed in the background, so get_weather answers for them come
+    from a warm cache, and their weather alerts can be read from the watchlist://alerts resource.
+    Use this when a user wants to keep an eye on, monitor or be alerted about places.
+
+    Args:
+        add: Locations to start watching (e.g., ["London,uk", "Austin,us"]).
+        remove: Locations to stop watching.
+
+    Returns:
+        The locations added and removed, and every watched location with its active alert
+        count and refresh timing, or an error message.
+    """
+    if os.getenv("WATCHLIST_ENABLED", "0") != "1":
+        return {"error": "The watchlist is disabled on this server (start it with --watchlist or WATCHLIST_ENABLED=1)."}
+    alerting = len(watchlist.alerts())
+    removed = watchlist.remove(remove or [])
+    added = watchlist.add(add or [])
+    if len(watchlist.alerts()) != alerting:
+        await notify_resource_updated("watchlist://alerts")
+
+    response = {"added": added, "removed": removed}
+    not_added = [location for location in add or [] if location.strip() not in added]
+    if not_added:
+        response["not_added"] = not_added
+        response["note"] = f"Already watched, or the watchlist is full (at most {watchlist.max_locations} locations)."
+    return {**response, **watchlist.status()}
+
+
+@mcp.tool()
+@timed_handler(stage_timings, "tool:enrich_delivery_log")
+async def enrich_delivery_log(log_path: str = "delivery_log.txt", output_path: str | None = None,
+                              max_concurrency: int | None = None) -> dict:
+    """
+    Enriches every order in a delivery log with the weather at its destination.
+    Use this instead of calling get_weather once per city when working with delivery data.
+
+    Each unique destination city is fetched only once, concurrently, and one JSON record
+    per order is written to a JSONL file. The log is streamed, so very large logs are fine.
+
+    Args:
+        log_path: Delivery log with lines like "Order #10583: Delivered to San Diego",
+            relative to the server's delivery data directory.
+        output_path: JSONL file to write inside that directory
+            (default: <log_path> with an .enriched.jsonl suffix).
+        max_concurrency: Optional limit on simultaneous weather lookups.
+
+    Returns:
+        A summary with order and city counts and the path of the enriched JSONL file.
+    """
+    log_file = delivery_data_path(log_path)
+    if log_file is None:
+        return {"error": "log_path must be inside the server's delivery data directory."}
+    if not log_file.is_file():
+        return {"error": f"The delivery log '{log_path}' was not found on the server."}
+
+    output_file = delivery_data_path(output_path) if output_path else log_file.with_suffix(".enriched.jsonl")
+    if output_file is None:
+        return {"error": "output_path must be inside the server's delivery data directory."}
+    if output_file.suffix != ".jsonl":
+        return {"error": "output_path must be a .jsonl file."}
+
+    concurrency = max(1, min(max_concurrency or WEATHER_BATCH_CONCURRENCY, WEATHER_BATCH_CONCURRENCY))
+    try:
+        return await delivery_enrichment.enrich_delivery_log(log_file, output_file, fetch_weather, concurrency)
+    except OSError as e:
+        return {"error": f"Could not process the delivery log: {e}"}
 
 
 @mcp.prompt()
@@ -231,16 +1239,110 @@ def compare_weather_prompt(location_a: str, location_b: str) -> str:
     The user wants to compare the weather between "{location_a}" and "{location_b}".
 
     To accomplish this, follow these steps:
-    1. First, gather the necessary weather data for both "{location_a}" and "{location_b}".
-    2. Once you have the weather data for both locations, DO NOT simply list the raw results.
+    1. Call the `compare_weather` tool once with locations ["{location_a}", "{location_b}"].
+       It fetches both places and returns the differences already computed.
+    2. Once you have the comparison, DO NOT simply list the raw results.
     3. Instead, synthesize the information into a concise summary. Your final response
        should highlight the key differences, focusing on temperature, the general conditions
-       (e.g., 'sunny' vs 'rainy'), and wind speed.
+       (e.g., 'sunny' vs 'rainy'), wind speed and the chance of precipitation.
     4. Present the comparison in a structured format, like a markdown table or a clear
        bulleted list, to make it easy for the user to understand at a glance.
     """
 
+@mcp.resource("cache://stats")
+@timed_handler(stage_timings, "resource:cache://stats")
+def cache_stats_resource() -> dict:
+    """
+    Returns hit/miss counters for the geocoding and forecast caches and the offline
+    gazetteer, the forecast store's size, plus issued/coalesced counts for concurrent identical upstream requests.
+    Useful for tuning cache TTLs and sizes.
+    """
+    return {
+        "geocode_cache": geocode_cache.stats(),
+        "forecast_cache": forecast_cache.stats(),
+        "forecast_store": forecast_store.stats(),
+        "gazetteer": gazetteer.stats(),
+        "request_coalescing": {
+            "geocoding": geocode_flights.stats(),
+            "onecall": onecall_flights.stats(),
+        },
+    }
+
+@mcp.resource("quota://status")
+@timed_handler(stage_timings, "resource:quota://status")
+def quota_status_resource() -> dict:
+    """
+    Returns the remaining daily One Call API quota, rate limiter state and retry count.
+    When remaining quota is low, cached forecasts are served instead of new calls.
+    """
+    return {
+        "onecall_quota": quota_ledger.status(),
+        "rate_limit": rate_limiter.stats(),
+        "upstream_retries": upstream.retries,
+    }
+
+@mcp.resource("metrics://stages")
+@timed_handler(stage_timings, "resource:metrics://stages")
+def stage_timings_resource() -> dict:
+    """
+    Returns per-stage timings of weather requests: cumulative count and total
+    milliseconds, plus mean/p50/p95 over recent samples.
+    """
+    return stage_timings.snapshot()
+
+@mcp.resource("metrics://all")
+@timed_handler(stage_timings, "resource:metrics://all")
+def all_metrics_resource() -> dict:
+    """
+    Returns every server metric in one document: per-stage and per-handler timings with
+    histogram buckets, upstream status code and transport error counts, weather error
+    classes, cache and request coalescing counters, quota and rate limiter state.
+    """
+    histograms = stage_timings.histograms()
+    return {
+        "stages": {
+            name: {**timing, "buckets": {"+Inf" if le == float("inf") else str(le): count
+                                         for le, count in histograms[name]["buckets"]}}
+            for name, timing in stage_timings.snapshot().items()
+        },
+        "counters": counters.snapshot(),
+        "caches": cache_stats_resource(),
+        "quota": quota_status_resource(),
+        "response_sizes": response_sizes.snapshot(),
+    }
+
+@mcp.resource("watchlist://alerts")
+@timed_handler(stage_timings, "resource:watchlist://alerts")
+def watchlist_alerts_resource() -> dict:
+    """
+    Returns the active weather alerts of every watched location. Subscribe to this resource
+    to be notified (notifications/resources/updated) whenever a watched location's alerts change.
+    """
+    return {
+        "watched": len(watchlist),
+        "locations_with_alerts": watchlist.alerts(),
+    }
+
+@mcp.resource("watchlist://status")
+@timed_handler(stage_timings, "resource:watchlist://status")
+def watchlist_status_resource() -> dict:
+    """
+    Returns the watched locations with their last and next refresh, the refresh intervals
+    derived from the daily budget, and refresh, failure and alert change counts.
+    """
+    return {"enabled": os.getenv("WATCHLIST_ENABLED", "0") == "1", **watchlist.status()}
+
+@mcp.resource("metrics://response_sizes")
+@timed_handler(stage_timings, "resource:metrics://response_sizes")
+def response_sizes_resource() -> dict:
+    """
+    Returns the approximate size in tokens of get_weather responses per detail level
+    (e.g., "full", "summary+compact"), to measure the context saved by smaller responses.
+    """
+    return response_sizes.snapshot()
+
 @mcp.resource("file://delivery_log")
+@timed_handler(stage_timings, "resource:file://delivery_log")
 def delivery_log_resource() -> list[str]:
     """
     Reads a delivery log file and returns its contents as a list of lines.
@@ -258,6 +1360,7 @@ def delivery_log_resource() -> list[str]:
         return [f"An unexpected error occurred while reading the delivery log: {str(e)}"]
 
 @mcp.resource("file://index")
+@timed_handler(stage_timings, "resource:file://index")
 def index_resource() -> list[str]:
     """
     Reads the index.md file and returns its contents as a list of lines.
@@ -275,7 +1378,125 @@ def index_resource() -> list[str]:
         return [f"An unexpected error occurred while reading the index file: {str(e)}"]
     
 
+def prometheus_text() -> str:
+    """All metrics in the Prometheus text format"""
+    geocode, forecast = geocode_cache.stats(), forecast_cache.stats()
+    quota = quota_ledger.status()
+    totals = {
+        "geocode_cache_hits": geocode["hits"],
+        "geocode_cache_negative_hits": geocode["negative_hits"],
+        "geocode_cache_misses": geocode["misses"],
+        "gazetteer_hits": gazetteer.hits,
+        "gazetteer_misses": gazetteer.misses,
+        "forecast_cache_hits": forecast["hits"],
+        "forecast_cache_nearby_hits": forecast["nearby_hits"],
+        "forecast_cache_stale_hits": forecast["stale_hits"],
+        "forecast_cache_misses": forecast["misses"],
+        "forecast_cache_evictions": forecast["evictions"],
+        "geocode_requests_coalesced": geocode_flights.stats()["coalesced"],
+        "onecall_requests_coalesced": onecall_flights.stats()["coalesced"],
+        "upstream_retries": upstream.retries,
+        "rate_limit_throttled_waits": rate_limiter.stats()["throttled_waits"],
+        "watchlist_refreshes": watchlist.refreshes,
+        "watchlist_refresh_failures": watchlist.failures,
+    }
+    gauges = {
+        "forecast_cache_entries": forecast["entries"],
+        "forecast_store_locations": forecast_store.stats()["locations"],
+        "watchlist_locations": len(watchlist),
+        "geocode_cache_memory_entries": geocode["memory_entries"],
+        "onecall_quota_remaining": quota["remaining"],
+        "onecall_quota_used": quota["used"],
+    }
+    return render_prometheus(stage_timings, counters, totals, gauges)
+
+
+async def prometheus_endpoint(request):
+    from starlette.responses import PlainTextResponse
+    return PlainTextResponse(prometheus_text(), media_type="text/plain; version=0.0.4")
+
+
+def create_http_app():
+    """
+    Builds the ASGI app for the HTTP transports (selected by MCP_TRANSPORT).
+    Also used as the uvicorn factory when running several worker processes.
+    With MCP_PROMETHEUS_METRICS=1 it also serves GET /metrics for Prometheus.
+    """
+    transport = os.getenv("MCP_TRANSPORT", "streamable-http")
+    app = mcp.sse_app() if transport == "sse" else mcp.streamable_http_app()
+    if os.getenv("MCP_PROMETHEUS_METRICS", "0") == "1":
+        # Each worker process has its own metrics; scrape workers individually if there are several
+        app.add_route("/metrics", prometheus_endpoint, methods=["GET"])
+    session_manager_lifespan = app.router.lifespan_context
+
+    @contextlib.asynccontextmanager
+    async def app_lifespan(app):
+        # One shared upstream client serves every session; close it only when the app stops
+        # The watchlist runs once per process, not once per session
+        async with session_manager_lifespan(app), watchlist_running():
+            try:
+                yield
+            finally:
+                await upstream.aclose()
+
+    app.router.lifespan_context = app_lifespan
+    return app
+
+
+def run_http(transport, host, port, workers):
+    """Serve MCP over streamable HTTP or SSE so many agents can share one warm server"""
+    import uvicorn
+
+    os.environ["MCP_TRANSPORT"] = transport
+    # Each worker runs its own watchlist and takes an equal share of its quota budget
+    os.environ["MCP_WORKERS"] = str(workers)
+    if workers > 1:
+        # Workers are separate processes that import this module by name
+        os.environ["MCP_STATELESS_HTTP"] = "1"
+        uvicorn.run(
+            "main:create_http_app",
+            factory=True,
+            host=host,
+            port=port,
+            workers=workers,
+            app_dir=str(pathlib.Path(__file__).parent),
+        )
+    else:
+        uvicorn.run(create_http_app(), host=host, port=port)
+
+
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Weather MCP server")
+    parser.add_argument("--transport", choices=["stdio", "streamable-http", "sse"],
+                        default=os.getenv("MCP_TRANSPORT", "stdio"),
+                        help="stdio (default) for a private server per client, or an HTTP transport to share one server")
+    parser.add_argument("--host", default=os.getenv("MCP_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("MCP_PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("MCP_WORKERS", "1")),
+                        help="Worker processes for streamable-http (each has its own in-memory caches)")
+    parser.add_argument("--prometheus", action="store_true",
+                        default=os.getenv("MCP_PROMETHEUS_METRICS", "0") == "1",
+                        help="Serve Prometheus metrics at GET /metrics (HTTP transports only)")
+    parser.add_argument("--watchlist", action="store_true",
+                        default=os.getenv("WATCHLIST_ENABLED", "0") == "1",
+                        help="Keep watched locations (seeded from WATCHLIST_SEED_LOG) warm in the background")
+    args = parser.parse_args()
+    if args.prometheus:
+        os.environ["MCP_PROMETHEUS_METRICS"] = "1"
+    if args.watchlist:
+        os.environ["WATCHLIST_ENABLED"] = "1"
+
+    if args.transport != "stdio":
+        if args.workers > 1 and args.transport == "sse":
+            parser.error("--workers > 1 requires --transport streamable-http (SSE sessions are tied to one process)")
+        try:
+            run_http(args.transport, args.host, args.port, args.workers)
+        except KeyboardInterrupt:
+            pass
+        raise SystemExit(0)
+
     # The server will run and listen for requests from the client over stdio
     try:
         mcp.run()
@@ -0,0 +1,229 @@
+"""
+Lightweight timing instrumentation for the weather MCP server.
+
+StageTimings records how long each stage of a request took (geocoding, One
+Call, formatting, ...). Counts and totals are cumulative, so a client can
+diff two snapshots to get per-stage means over an interval, and a bounded
+window of recent samples gives percentiles. Every sample also lands in a
+fixed-bucket histogram (one bisect and an increment), which is what the
+Prometheus endpoint exports. ValueStats does the same kind of bookkeeping for
+plain values such as response sizes, and Counters counts labelled events
+(upstream status codes, error classes).
+"""
+import bisect
+import contextlib
+import functools
+import inspect
+import json
+import threading
+import time
+from collections import deque
+
+# Histogram bucket upper bounds in seconds (a final +Inf bucket is implied)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def percentile(sorted_values, pct: float):
+    """Nearest-rank percentile of an already sorted sequence"""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class StageTimings:
+    """
+    Per-stage duration recorder.
+
+    Args:
+        window: Number of recent samples kept per stage for percentiles.
+    """
+
+    def __init__(self, window: int = 1024, buckets: tuple = LATENCY_BUCKETS):
+        self.window = window
+        self.buckets = buckets
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def time(self, stage: str):
+        """Time the enclosed block (also works around `await` expressions)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def record(self, stage: str, seconds: float):
+        with self._lock:
+            entry = self._stages.get(stage)
+            if entry is None:
+                entry = self._stages[stage] = {
+                    "count": 0, "total": 0.0, "recent": deque(maxlen=self.window),
+                    "buckets": [0] * (len(self.buckets) + 1),
+                }
+            entry["count"] += 1
+            entry["total"] += seconds
+            entry["recent"].append(seconds)
+            entry["buckets"][bisect.bisect_left(self.buckets, seconds)] += 1
+
+    def snapshot(self) -> dict:
+        """Return cumulative count/total and recent percentiles (milliseconds) per stage"""
+        with self._lock:
+            stages = {name: (entry["count"], entry["total"], sorted(entry["recent"]))
+                      for name, entry in self._stages.items()}
+        return {
+            name: {
+                "count": count,
+                "total_ms": round(total * 1000, 3),
+                "mean_ms": round(total * 1000 / count, 3),
+                "p50_ms": round(percentile(recent, 50) * 1000, 3),
+                "p95_ms": round(percentile(recent, 95) * 1000, 3),
+            }
+            for name, (count, total, recent) in stages.items()
+        }
+
+    def histograms(self) -> dict:
+        """Cumulative bucket counts per stage: {stage: {"buckets": [(le, count), ...], "count", "sum"}}"""
+        with self._lock:
+            stages = {name: (entry["count"], entry["total"], list(entry["buckets"]))
+                      for name, entry in self._stages.items()}
+        histograms = {}
+        for name, (count, total, buckets) in stages.items():
+            cumulative, running = [], 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), buckets):
+                running += bucket_count
+                cumulative.append((bound, running))
+            histograms[name] = {"buckets": cumulative, "count": count, "sum": total}
+        return histograms
+
+
+def estimate_tokens(payload) -> int:
+    """Rough LLM token count of a JSON payload (about 4 characters per token)"""
+    return len(json.dumps(payload, ensure_ascii=False)) // 4 + 1
+
+
+class ValueStats:
+    """Count/mean/min/max of values recorded under a key"""
+
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def record(self, key: str, value: float):
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                self._values[key] = {"count": 1, "total": value, "min": value, "max": value}
+            else:
+                entry["count"] += 1
+                entry["total"] += value
+                entry["min"] = min(entry["min"], value)
+                entry["max"] = max(entry["max"], value)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                key: {
+                    "count": entry["count"],
+                    "mean": round(entry["total"] / entry["count"], 1),
+                    "min": entry["min"],
+                    "max": entry["max"],
+                }
+                for key, entry in self._values.items()
+            }
+
+
+class Counters:
+    """Monotonic counters keyed by a name and a set of labels"""
+
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, amount: int = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counts[key] = self._counts.get(key, 0) + amount
+
+    def snapshot(self) -> dict:
+        """{name: {"label=value,...": count}} (an empty label string for unlabelled counters)"""
+        with self._lock:
+            counts = dict(self._counts)
+        snapshot = {}
+        for (name, labels), count in sorted(counts.items()):
+            snapshot.setdefault(name, {})[",".join(f"{key}={value}" for key, value in labels)] = count
+        return snapshot
+
+    def items(self):
+        """(name, labels dict, count) triples"""
+        with self._lock:
+            counts = dict(self._counts)
+        return [(name, dict(labels), count) for (name, labels), count in sorted(counts.items())]
+
+
+def timed_handler(timings: StageTimings, stage: str):
+    """
+    Decorator that records a tool/resource handler's duration under `stage`.
+    Sync and async handlers keep their kind and signature, so FastMCP still
+    derives the same schema from them.
+    """
+    def decorate(handler):
+        if inspect.iscoroutinefunction(handler):
+            @functools.wraps(handler)
+            async def timed(*args, **kwargs):
+                with timings.time(stage):
+                    return await handler(*args, **kwargs)
+        else:
+            @functools.wraps(handler)
+            def timed(*args, **kwargs):
+                with timings.time(stage):
+                    return handler(*args, **kwargs)
+        return timed
+    return decorate
+
+
+def _label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_label_value(value)}"' for key, value in labels.items()) + "}"
+
+
+def render_prometheus(timings: StageTimings, counters: Counters, totals: dict, gauges: dict,
+                      prefix: str = "weather_mcp") -> str:
+    """
+    Prometheus text exposition (version 0.0.4) of the stage histograms, the
+    labelled counters and flat {name: value} dicts of other cumulative counts
+    (both exported as <name>_total) and of gauges.
+    """
+    lines = [f"# HELP {prefix}_stage_seconds Duration of request stages and tool/resource handlers",
+             f"# TYPE {prefix}_stage_seconds histogram"]
+    for stage, histogram in sorted(timings.histograms().items()):
+        for bound, count in histogram["buckets"]:
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f"{prefix}_stage_seconds_bucket{_labels({'stage': stage, 'le': le})} {count}")
+        lines.append(f"{prefix}_stage_seconds_sum{_labels({'stage': stage})} {histogram['sum']:.6f}")
+        lines.append(f"{prefix}_stage_seconds_count{_labels({'stage': stage})} {histogram['count']}")
+
+    declared = set()
+    for name, labels, count in counters.items():
+        metric = f"{prefix}_{name}_total"
+        if metric not in declared:
+            declared.add(metric)
+            lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric}{_labels(labels)} {count}")
+
+    for name, value in sorted(totals.items()):
+        lines.append(f"# TYPE {prefix}_{name}_total counter")
+        lines.append(f"{prefix}_{name}_total {value}")
+
+    for name, value in sorted(gauges.items()):
+        if value is None:
+            continue
+        lines.append(f"# TYPE {prefix}_{name} gauge")
+        lines.append(f"{prefix}_{name} {value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,174 @@
+"""
+Rate limiting and daily quota accounting for OpenWeatherMap calls.
+
+- TokenBucket smooths bursts so we stay under the per-minute call limit.
+- QuotaLedger counts One Call requests per UTC day in SQLite, so the
+  1,000 calls/day budget is tracked across server restarts (and across
+  worker processes sharing the same file). Reads (is_low, remaining,
+  status) come from an in-memory copy of the count, so they cost no query
+  on the request path.
+"""
+import asyncio
+import pathlib
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+
+class QuotaExceededError(Exception):
+    """Raised when the daily One Call quota has been used up"""
+
+
+class TokenBucket:
+    """
+    Async token bucket.
+
+    Args:
+        rate: Tokens added per second.
+        capacity: Maximum burst size.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+        self.throttled = 0
+
+    async def acquire(self):
+        """Wait until a token is available, then take it"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                self.throttled += 1
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def stats(self) -> dict:
+        return {
+            "rate_per_minute": self.rate * 60,
+            "burst": self.capacity,
+            "available_tokens": round(min(
+                self.capacity,
+                self._tokens + (time.monotonic() - self._updated) * self.rate
+            ), 2),
+            "throttled_waits": self.throttled,
+        }
+
+
+class QuotaLedger:
+    """
+    Persistent per-day call counter.
+
+    consume() and refund() write to SQLite and bring the in-memory count up to
+    date with the database's (including other workers' calls); they block, so
+    async callers run them with asyncio.to_thread. used(), remaining(),
+    is_low() and status() only read the in-memory count.
+
+    Args:
+        path: Location of the SQLite database file (created if missing).
+        daily_limit: Calls allowed per UTC day.
+        low_threshold: Remaining calls at or below which quota counts as "low".
+    """
+
+    def __init__(self, path, daily_limit: int = 1000, low_threshold: int = 100):
+        self.path = pathlib.Path(path)
+        self.daily_limit = daily_limit
+        self.low_threshold = low_threshold
+        self._lock = threading.Lock()
+        self.rejected = 0
+        self.refunded = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS quota ("
+            " day TEXT PRIMARY KEY,"
+            " used INTEGER NOT NULL)"
+        )
+        self._db.commit()
+
+        self._day = self.today()
+        row = self._db.execute("SELECT used FROM quota WHERE day = ?", (self._day,)).fetchone()
+        self._used = row[0] if row else 0
+
+    @staticmethod
+    def today() -> str:
+        return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+    def used(self) -> int:
+        """Calls recorded today, as of this process's last consume() or refund()"""
+        with self._lock:
+            today = self.today()
+            if self._day != today:
+                # A new UTC day starts with an unused quota
+                self._day, self._used = today, 0
+            return self._used
+
+    def _sync(self, day: str, row):
+        """Adopt the database's count for `day` (the lock must be held)"""
+        if row is not None and day >= self._day:
+            self._day, self._used = day, row[0]
+
+    def remaining(self) -> int:
+        return max(0, self.daily_limit - self.used())
+
+    def is_low(self) -> bool:
+        """True once remaining quota drops to the low-water threshold"""
+        return self.remaining() <= self.low_threshold
+
+    def consume(self) -> str:
+        """
+        Record one call, raising QuotaExceededError if the daily budget is spent.
+
+        Returns:
+            The UTC day the call was charged to (pass it to refund()).
+        """
+        day = self.today()
+        with self._lock:
+            # Single conditional UPSERT so concurrent processes can't overspend
+            row = self._db.execute(
+                "INSERT INTO quota (day, used) VALUES (?, 1) "
+                "ON CONFLICT(day) DO UPDATE SET used = used + 1 WHERE used < ? "
+                "RETURNING used",
+                (day, self.daily_limit),
+            ).fetchone()
+            self._db.commit()
+            self._sync(day, row if row is not None else (self.daily_limit,))
+            if row is None:
+                self.rejected += 1
+                raise QuotaExceededError(
+                    f"Daily One Call quota of {self.daily_limit} calls has been used up."
+                )
+        return day
+
+    def refund(self, day: str):
+        """Give back a call charged by consume() that the API did not serve (e.g. a 429)"""
+        with self._lock:
+            row = self._db.execute(
+                "UPDATE quota SET used = used - 1 WHERE day = ? AND used > 0 RETURNING used", (day,)
+            ).fetchone()
+            self._db.commit()
+            self._sync(day, row)
+            self.refunded += 1
+
+    def status(self) -> dict:
+        used = self.used()
+        remaining = max(0, self.daily_limit - used)
+        return {
+            "day_utc": self.today(),
+            "daily_limit": self.daily_limit,
+            "used": used,
+            "remaining": remaining,
+            "low_quota_threshold": self.low_threshold,
+            "low": remaining <= self.low_threshold,
+            "rejected_calls": self.rejected,
+            "refunded_calls": self.refunded,
+        }
@@ -0,0 +1,54 @@
+"""
+In-process request coalescing ("single-flight") for upstream lookups.
+
+When several callers ask for the same key at the same time, only the first
+one issues the upstream call; the others wait on that call and receive the
+same result. Errors are propagated to every waiter but never stored, so the
+next request after a failure tries again.
+"""
+import asyncio
+
+
+class SingleFlight:
+    """Share one in-flight coroutine per key between concurrent callers"""
+
+    def __init__(self):
+        self._calls = {}
+        self.issued = 0
+        self.coalesced = 0
+
+    async def do(self, key, fn):
+        """
+        Run `fn()` for a key, or join the call already running for it.
+
+        Args:
+            key: Hashable identity of the request (e.g., normalized location).
+            fn: Zero-argument callable returning a coroutine.
+
+        Returns:
+            The coroutine's result (exceptions are re-raised to every caller).
+        """
+        task = self._calls.get(key)
+        if task is None:
+            self.issued += 1
+            # Run as a task so a cancelled caller doesn't cancel the call for everyone else
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        """Return issued/coalesced counters for monitoring"""
+        return {
+            "issued": self.issued,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._calls),
+        }
+
+    def _forget(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # Mark as retrieved even if every caller was cancelled
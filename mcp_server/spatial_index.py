@@ -0,0 +1,115 @@
+"""
+Geohash index for finding the nearest cached forecast to a coordinate pair.
+
+Every point is stored under its 9-character geohash in a sorted list. All
+points inside a geohash cell share the cell's prefix, so they form one
+contiguous run of the list, and bisect finds that run in O(log n). A radius
+query picks the finest precision whose cells are at least as large as the
+radius. It then reads the query point's cell and its 8 neighbours, which
+together cover the whole circle, and measures the great-circle distance only
+to the points found there.
+"""
+import math
+from bisect import bisect_left, insort
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+PRECISION = 9  # ~5 m cells
+EARTH_RADIUS_KM = 6371.0088
+
+
+def encode(lat: float, lon: float, precision: int = PRECISION) -> str:
+    """Geohash of a point"""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        target, span = (lon, lon_range) if even else (lat, lat_range)
+        middle = (span[0] + span[1]) / 2
+        value <<= 1
+        if target >= middle:
+            value |= 1
+            span[0] = middle
+        else:
+            span[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits, value = 0, 0
+    return "".join(chars)
+
+
+def cell_size_degrees(precision: int) -> tuple[float, float]:
+    """(height, width) of a geohash cell in degrees"""
+    lon_bits = math.ceil(precision * 5 / 2)
+    lat_bits = precision * 5 // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance in kilometres"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def covering_cells(lat: float, lon: float, radius_km: float) -> set[str]:
+    """The query point's cell and its 8 neighbours, at a precision whose cells span at least radius_km"""
+    km_per_degree = math.pi * EARTH_RADIUS_KM / 180
+    # Longitude degrees shrink towards the poles; use the narrowest latitude the circle reaches
+    reach = min(89.0, abs(lat) + radius_km / km_per_degree)
+    precision = 1
+    for candidate in range(PRECISION, 0, -1):
+        height, width = cell_size_degrees(candidate)
+        if (height * km_per_degree >= radius_km
+                and width * km_per_degree * math.cos(math.radians(reach)) >= radius_km):
+            precision = candidate
+            break
+
+    height, width = cell_size_degrees(precision)
+    cells = set()
+    for d_lat in (-height, 0.0, height):
+        neighbour_lat = lat + d_lat
+        if not -90.0 <= neighbour_lat <= 90.0:
+            continue
+        for d_lon in (-width, 0.0, width):
+            neighbour_lon = (lon + d_lon + 180.0) % 360.0 - 180.0
+            cells.add(encode(neighbour_lat, neighbour_lon, precision))
+    return cells
+
+
+class GeohashIndex:
+    """Sorted (geohash, key) pairs; keys must be unique and comparable"""
+
+    def __init__(self):
+        self._entries = []
+        self._points = {}  # key -> (geohash, lat, lon)
+
+    def __len__(self):
+        return len(self._points)
+
+    def add(self, key, lat: float, lon: float):
+        if key in self._points:
+            return
+        geohash = encode(lat, lon)
+        insort(self._entries, (geohash, key))
+        self._points[key] = (geohash, lat, lon)
+
+    def remove(self, key):
+        point = self._points.pop(key, None)
+        if point is None:
+            return
+        index = bisect_left(self._entries, (point[0], key))
+        del self._entries[index]
+
+    def nearby(self, lat: float, lon: float, radius_km: float):
+        """Yields (distance_km, key) for every indexed point within radius_km, in no particular order"""
+        for prefix in covering_cells(lat, lon, radius_km):
+            start = bisect_left(self._entries, (prefix,))
+            # "~" sorts after every geohash character, so this is the end of the prefix's run
+            end = bisect_left(self._entries, (prefix + "~",))
+            for _, key in self._entries[start:end]:
+                _, point_lat, point_lon = self._points[key]
+                distance = haversine_km(lat, lon, point_lat, point_lon)
+                if distance <= radius_km:
+                    yield distance, key
@@ -0,0 +1,233 @@
+"""
+Background refresher that keeps the forecasts of watched locations warm.
+
+The watchlist (for example, every destination in a delivery log) is refreshed
+from upstream on a schedule. Queries for watched locations are then answered
+from the forecast cache, and alerts are noticed as soon as they are issued
+rather than when someone happens to ask.
+
+Scheduling:
+
+- The watchlist may spend `daily_budget` One Call requests a day. Every
+  location gets a refresh interval derived from that budget. Locations with
+  active alerts are refreshed `alert_speedup` times as often as the others,
+  and no location more often than every `min_interval` seconds.
+- A newly watched location is fetched right away (the warm-up). Later
+  refreshes are paced by a token bucket at the budget's rate, with a small
+  burst, so calls are spread over the day instead of arriving together.
+  When two refreshes are due, the location with alerts goes first.
+- While the daily quota is running low, only locations with active alerts
+  are refreshed.
+
+Whenever a location's set of active alerts changes, `on_alerts_changed` is
+awaited with the changes. The server uses it to send MCP resource-updated
+notifications.
+"""
+import asyncio
+import contextlib
+import logging
+import time
+
+from geocode_cache import normalize_location
+from rate_limiter import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+def active_alerts(payload: dict, now: float | None = None) -> list[dict]:
+    """The alerts of a One Call payload that have not ended yet"""
+    now = time.time() if now is None else now
+    return [
+        {
+            "event": alert.get("event", "Weather alert"),
+            "sender": alert.get("sender_name", ""),
+            "start": alert.get("start"),
+            "end": alert.get("end"),
+        }
+        for alert in payload.get("alerts", [])
+        if not alert.get("end") or alert["end"] > now
+    ]
+
+
+def _signature(alerts: list[dict]) -> tuple:
+    return tuple(sorted((alert["event"], alert["sender"], alert["start"] or 0, alert["end"] or 0)
+                        for alert in alerts))
+
+
+class Watchlist:
+    """
+    Locations whose forecasts are refreshed in the background.
+
+    Args:
+        refresh: Async callable(location) that fetches a location from upstream (updating the
+            caches) and returns (display_name, one_call_payload).
+        on_alerts_changed: Async callable(changes) awaited with a list of
+            {"location", "alerts", "previous"} whenever a location's active alerts change.
+        daily_budget: One Call requests per day the watchlist may spend.
+        min_interval: Shortest time between refreshes of one location (seconds).
+        alert_speedup: How many times more often locations with active alerts are refreshed.
+        burst: Refreshes allowed back to back before pacing applies (warm-ups are not paced).
+        max_locations: Upper bound on the number of watched locations.
+        quota_is_low: Optional callable; while it returns True only locations with alerts are refreshed.
+    """
+
+    def __init__(self, refresh, on_alerts_changed, daily_budget: float = 250, min_interval: float = 540,
+                 alert_speedup: float = 4, burst: int = 10, max_locations: int = 100, quota_is_low=None):
+        self.refresh = refresh
+        self.on_alerts_changed = on_alerts_changed
+        self.daily_budget = daily_budget
+        self.min_interval = min_interval
+        self.alert_speedup = alert_speedup
+        self.max_locations = max_locations
+        self.quota_is_low = quota_is_low or (lambda: False)
+        self.pacer = TokenBucket(rate=daily_budget / 86400, capacity=burst)
+        self._entries = {}  # normalized location -> entry dict
+        self._changed = asyncio.Event()
+        self._task = None
+
+        self.refreshes = 0
+        self.failures = 0
+        self.skipped_low_quota = 0
+        self.alert_changes = 0
+
+    def add(self, locations) -> list[str]:
+        """Watch more locations (due for a refresh right away); returns the ones added"""
+        added = []
+        for location in locations:
+            key = normalize_location(location)
+            if not key or key in self._entries or len(self._entries) >= self.max_locations:
+                continue
+            self._entries[key] = {
+                "query": location.strip(),
+                "location": None,
+                "due": time.time(),
+                "last_refresh": None,
+                "alerts": [],
+                "failures": 0,
+                "last_error": None,
+            }
+            added.append(location.strip())
+        if added:
+            self._changed.set()
+        return added
+
+    def remove(self, locations) -> list[str]:
+        """Stop watching locations; returns the ones removed"""
+        removed = [self._entries.pop(normalize_location(location))["query"]
+                   for location in locations if normalize_location(location) in self._entries]
+        if removed:
+            self._changed.set()
+        return removed
+
+    def __len__(self):
+        return len(self._entries)
+
+    def intervals(self) -> tuple[float, float]:
+        """(normal, with alerts) refresh intervals that keep the watchlist within its daily budget"""
+        with_alerts = sum(1 for entry in self._entries.values() if entry["alerts"])
+        weighted = self.alert_speedup * with_alerts + (len(self._entries) - with_alerts)
+        normal = max(self.min_interval, 86400 * weighted / self.daily_budget) if weighted else self.min_interval
+        return normal, max(self.min_interval, normal / self.alert_speedup)
+
+    def _next(self):
+        """The entry to refresh next: earliest due, locations with alerts first on ties"""
+        if not self._entries:
+            return None, None
+        return min(self._entries.items(), key=lambda item: (item[1]["due"], not item[1]["alerts"]))
+
+    async def run(self):
+        """Refresh due locations until cancelled"""
+        while True:
+            key, entry = self._next()
+            wait = None if entry is None else entry["due"] - time.time()
+            if wait is None or wait > 0:
+                # Sleep until the next refresh is due or the watchlist changes
+                self._changed.clear()
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self._changed.wait(), wait)
+                continue
+
+            if self.quota_is_low() and not entry["alerts"]:
+                self.skipped_low_quota += 1
+                entry["due"] = time.time() + self.intervals()[0]
+                continue
+            if entry["last_refresh"] is not None:
+                # New locations are warmed up right away; later refreshes are paced
+                await self.pacer.acquire()
+                if self._entries.get(key) is not entry:
+                    continue  # Removed while waiting for the pacer
+            await self._refresh(entry)
+            normal, alerting = self.intervals()
+            entry["due"] = time.time() + (alerting if entry["alerts"] else normal)
+            if entry["failures"]:
+                # Retry failures sooner, backing off up to the regular interval
+                entry["due"] = min(entry["due"], time.time() + 60 * 2 ** min(entry["failures"] - 1, 6))
+
+    async def _refresh(self, entry: dict):
+        try:
+            name, payload = await self.refresh(entry["query"])
+        except Exception as e:
+            self.failures += 1
+            entry["failures"] += 1
+            entry["last_error"] = str(e) or type(e).__name__
+            logger.warning("Watchlist refresh of %s failed: %s", entry["query"], entry["last_error"])
+            return
+
+        self.refreshes += 1
+        entry.update(location=name, last_refresh=time.time(), failures=0, last_error=None)
+        previous, alerts = entry["alerts"], active_alerts(payload)
+        entry["alerts"] = alerts
+        if _signature(alerts) != _signature(previous):
+            self.alert_changes += 1
+            try:
+                await self.on_alerts_changed([{"location": name, "query": entry["query"],
+                                               "alerts": alerts, "previous": previous}])
+            except Exception as e:
+                logger.warning("Alert notification failed: %s", e)
+
+    @contextlib.asynccontextmanager
+    async def running(self):
+        """Run the scheduler for the duration of the block (no-op if it is already running)"""
+        if self._task is not None and not self._task.done():
+            yield
+            return
+        self._task = asyncio.create_task(self.run())
+        try:
+            yield
+        finally:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    def alerts(self) -> list[dict]:
+        """Watched locations that currently have active alerts"""
+        return [
+            {"location": entry["location"] or entry["query"], "query": entry["query"], "alerts": entry["alerts"]}
+            for entry in self._entries.values() if entry["alerts"]
+        ]
+
+    def status(self) -> dict:
+        normal, alerting = self.intervals()
+        now = time.time()
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "locations": [
+                {
+                    "query": entry["query"],
+                    "location": entry["location"],
+                    "active_alerts": len(entry["alerts"]),
+                    "last_refresh_seconds_ago": round(now - entry["last_refresh"]) if entry["last_refresh"] else None,
+                    "next_refresh_in_seconds": max(0, round(entry["due"] - now)),
+                    **({"last_error": entry["last_error"]} if entry["last_error"] else {}),
+                }
+                for entry in self._entries.values()
+            ],
+            "refresh_interval_seconds": round(normal),
+            "alert_refresh_interval_seconds": round(alerting),
+            "daily_budget": self.daily_budget,
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+            "skipped_low_quota": self.skipped_low_quota,
+            "alert_changes": self.alert_changes,
+        }
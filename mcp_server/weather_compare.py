@@ -0,0 +1,104 @@
+"""
+Structured weather comparison for the compare_weather tool.
+
+Works on compact "summary" reports (see format_compact_report), where every
+value is a plain number with its unit declared once. The first location is
+the baseline. For every other location it lists the differences: temperature,
+feels-like, wind and humidity deltas, whether the conditions differ, and
+today's precipitation chance and temperature range. Deltas are
+"location minus baseline", so +3.0 means 3 degrees warmer than the first
+location.
+
+The result is precomputed here, so the model only has to put it into words
+instead of diffing two full reports itself.
+"""
+
+
+def _delta(value, baseline):
+    if value is None or baseline is None:
+        return None
+    return round(value - baseline, 1)
+
+
+def location_snapshot(query: str, report: dict) -> dict:
+    """The headline numbers of one compact summary report"""
+    current = report["current"]
+    snapshot = {
+        "query": query,
+        "location": report["location"],
+        "desc": current["desc"],
+        "temp": current["temp"],
+        "feels": current["feels"],
+        "humidity": current["humidity"],
+        "wind": current["wind"],
+    }
+    today = report.get("today")
+    if today:
+        snapshot["today"] = {"min": today["min"], "max": today["max"], "pop": today["pop"]}
+    if report.get("alerts"):
+        snapshot["alerts"] = report["alerts"]
+    return snapshot
+
+
+def diff_snapshots(baseline: dict, other: dict) -> dict:
+    """Differences of `other` relative to `baseline`"""
+    difference = {
+        "location": other["location"],
+        "vs": baseline["location"],
+        "temp_delta": _delta(other["temp"], baseline["temp"]),
+        "feels_delta": _delta(other["feels"], baseline["feels"]),
+        "condition": {
+            "changed": other["desc"] != baseline["desc"],
+            "from": baseline["desc"],
+            "to": other["desc"],
+        },
+        "wind_delta": _delta(other["wind"], baseline["wind"]),
+        "humidity_delta": _delta(other["humidity"], baseline["humidity"]),
+    }
+    if "today" in baseline and "today" in other:
+        difference["precipitation"] = {
+            "pop_delta": other["today"]["pop"] - baseline["today"]["pop"],
+            "from": baseline["today"]["pop"],
+            "to": other["today"]["pop"],
+        }
+        difference["today_max_delta"] = _delta(other["today"]["max"], baseline["today"]["max"])
+        difference["today_min_delta"] = _delta(other["today"]["min"], baseline["today"]["min"])
+    return difference
+
+
+def compare_reports(results: list[tuple[str, dict]], units: dict) -> dict:
+    """
+    Builds the compare_weather response.
+
+    Args:
+        results: (query, report) pairs in the caller's order; a report may be {"error": ...}.
+        units: Units of the compared values, from the request (the reports all use the same units).
+
+    Returns:
+        Units, per-location snapshots, differences from the first location that succeeded,
+        the warmest/coldest/windiest/wettest locations, and any per-location errors.
+    """
+    snapshots, errors = [], []
+    for query, report in results:
+        if "error" in report:
+            errors.append({"query": query, "error": report["error"]})
+            continue
+        snapshots.append(location_snapshot(query, report))
+
+    response = {"units": units, "locations": snapshots}
+    if len(snapshots) >= 2:
+        baseline = snapshots[0]
+        response["differences"] = [diff_snapshots(baseline, other) for other in snapshots[1:]]
+        response["extremes"] = {
+            "warmest": max(snapshots, key=lambda s: s["temp"])["location"],
+            "coldest": min(snapshots, key=lambda s: s["temp"])["location"],
+            "windiest": max(snapshots, key=lambda s: s["wind"])["location"],
+        }
+        with_pop = [s for s in snapshots if "today" in s]
+        if with_pop:
+            response["extremes"]["wettest"] = max(with_pop, key=lambda s: s["today"]["pop"])["location"]
+    else:
+        response["differences"] = []
+    if errors:
+        response["errors"] = errors
+    return response
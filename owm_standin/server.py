@@ -0,0 +1,434 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the OpenWeatherMap endpoints used by the MCP server.
+
+Implements `/geo/1.0/direct` and `/data/3.0/onecall` with realistic,
+deterministic payloads so the server can be load-tested and benchmarked
+without burning real quota. Latency, error rates and payload sizes are
+configurable, and a record/replay mode captures real API responses to JSON
+fixtures and serves them back later.
+
+Usage:
+    python owm_standin/server.py --port 8765 --latency-ms 80 --errors 429=0.02,500=0.01
+    python owm_standin/server.py --record https://api.openweathermap.org
+    python owm_standin/server.py --replay
+
+Then point the MCP server at it:
+    OWM_BASE_URL=http://127.0.0.1:8765 python mcp_server/main.py
+"""
+import argparse
+import hashlib
+import json
+import math
+import pathlib
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_FIXTURES_DIR = pathlib.Path(__file__).parent / "fixtures"
+
+# A few well-known cities so geocoding results look familiar
+KNOWN_CITIES = {
+    "london": ("London", "GB", 51.5073, -0.1276),
+    "paris": ("Paris", "FR", 48.8589, 2.3200),
+    "new york": ("New York", "US", 40.7127, -74.0060),
+    "tokyo": ("Tokyo", "JP", 35.6828, 139.7595),
+    "sydney": ("Sydney", "AU", -33.8698, 151.2083),
+    "seattle": ("Seattle", "US", 47.6038, -122.3301),
+    "portland": ("Portland", "US", 45.5202, -122.6742),
+    "los angeles": ("Los Angeles", "US", 34.0537, -118.2428),
+    "san diego": ("San Diego", "US", 32.7174, -117.1628),
+    "austin": ("Austin", "US", 30.2711, -97.7437),
+    "raleigh": ("Raleigh", "US", 35.7804, -78.6391),
+    "omaha": ("Omaha", "US", 41.2587, -95.9379),
+    "orlando": ("Orlando", "US", 28.5421, -81.3790),
+    "denver": ("Denver", "US", 39.7392, -104.9849),
+    "kansas city": ("Kansas City", "US", 39.1000, -94.5781),
+    "madison": ("Madison", "US", 43.0748, -89.3838),
+    "sacramento": ("Sacramento", "US", 38.5811, -121.4939),
+    "miami": ("Miami", "US", 25.7741, -80.1935),
+}
+
+CONDITIONS = [
+    (800, "Clear", "clear sky", "01d"),
+    (801, "Clouds", "few clouds", "02d"),
+    (803, "Clouds", "broken clouds", "04d"),
+    (500, "Rain", "light rain", "10d"),
+    (501, "Rain", "moderate rain", "10d"),
+    (701, "Mist", "mist", "50d"),
+    (600, "Snow", "light snow", "13d"),
+    (211, "Thunderstorm", "thunderstorm", "11d"),
+]
+
+
+@dataclass
+class StandinSettings:
+    """Behaviour knobs for the stand-in server"""
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rates: dict = field(default_factory=dict)  # status code -> probability
+    hourly_hours: int = 48
+    daily_days: int = 8
+    alert_probability: float = 0.2
+    pad_bytes: int = 0
+    api_key: str | None = None
+    record_from: str | None = None
+    replay: bool = False
+    fixtures_dir: pathlib.Path = DEFAULT_FIXTURES_DIR
+    seed: int = 0
+
+
+def parse_error_rates(spec: str) -> dict:
+    """Parse "429=0.05,500=0.01" into {429: 0.05, 500: 0.01}"""
+    rates = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        code, _, rate = item.partition("=")
+        rates[int(code)] = float(rate)
+    return rates
+
+
+def _rng(*parts) -> random.Random:
+    """Deterministic RNG derived from the request parameters"""
+    digest = hashlib.sha256("|".join(str(p) for p in parts).encode()).digest()
+    return random.Random(int.from_bytes(digest[:8], "big"))
+
+
+def geocode(query: str, limit: int) -> list:
+    """Synthesize a Geocoding API response"""
+    parts = [part.strip() for part in query.split(",") if part.strip()]
+    if not parts or parts[0].lower().startswith(("nowhere", "invalid")):
+        return []
+    city = parts[0].lower()
+    if city in KNOWN_CITIES:
+        name, country, lat, lon = KNOWN_CITIES[city]
+    else:
+        rng = _rng("geo", city)
+        name = parts[0].title()
+        country = parts[-1].upper() if len(parts) > 1 else "US"
+        lat, lon = round(rng.uniform(-60, 70), 4), round(rng.uniform(-180, 180), 4)
+    return [{
+        "name": name,
+        "local_names": {"en": name},
+        "lat": lat,
+        "lon": lon,
+        "country": country,
+    }][:max(1, limit)]
+
+
+def _convert(celsius: float, units: str) -> float:
+    if units == "imperial":
+        return round(celsius * 9 / 5 + 32, 2)
+    if units == "standard":
+        return round(celsius + 273.15, 2)
+    return round(celsius, 2)
+
+
+def _wind(mps: float, units: str) -> float:
+    return round(mps * 2.23694, 2) if units == "imperial" else round(mps, 2)
+
+
+def _weather(rng: random.Random) -> list:
+    code, main, description, icon = rng.choice(CONDITIONS)
+    return [{"id": code, "main": main, "description": description, "icon": icon}]
+
+
+def onecall(lat: float, lon: float, units: str, exclude: set, settings: StandinSettings) -> dict:
+    """Synthesize a One Call API 3.0 response"""
+    now = int(time.time())
+    hour = now - now % 3600
+    day = now - now % 86400
+    # Stable within an hour for a given location, like the real API's update cadence
+    rng = _rng("onecall", round(lat, 2), round(lon, 2), hour, settings.seed)
+    base_temp = 25 - abs(lat) * 0.45 + rng.uniform(-4, 4)
+
+    payload = {
+        "lat": round(lat, 4),
+        "lon": round(lon, 4),
+        "timezone": "Etc/UTC",
+        "timezone_offset": 0,
+    }
+
+    if "current" not in exclude:
+        payload["current"] = {
+            "dt": now,
+            "sunrise": day + 6 * 3600,
+            "sunset": day + 18 * 3600,
+            "temp": _convert(base_temp, units),
+            "feels_like": _convert(base_temp - rng.uniform(0, 3), units),
+            "pressure": rng.randint(990, 1030),
+            "humidity": rng.randint(30, 95),
+            "dew_point": _convert(base_temp - rng.uniform(2, 10), units),
+            "uvi": round(rng.uniform(0, 9), 2),
+            "clouds": rng.randint(0, 100),
+            "visibility": rng.choice([10000, 10000, 8000, 5000]),
+            "wind_speed": _wind(rng.uniform(0, 12), units),
+            "wind_deg": rng.randint(0, 359),
+            "wind_gust": _wind(rng.uniform(0, 18), units),
+            "weather": _weather(rng),
+        }
+
+    if "minutely" not in exclude:
+        payload["minutely"] = [
+            {"dt": hour + 60 * i, "precipitation": round(max(0.0, rng.gauss(0, 0.3)), 2)}
+            for i in range(60)
+        ]
+
+    if "hourly" not in exclude:
+        hourly = []
+        for i in range(settings.hourly_hours):
+            temp = base_temp + 4 * math.sin((i - 9) / 24 * 2 * math.pi) + rng.uniform(-1, 1)
+            pop = round(min(1.0, max(0.0, rng.gauss(0.3, 0.3))), 2)
+            entry = {
+                "dt": hour + 3600 * i,
+                "temp": _convert(temp, units),
+                "feels_like": _convert(temp - rng.uniform(0, 3), units),
+                "pressure": rng.randint(990, 1030),
+                "humidity": rng.randint(30, 95),
+                "dew_point": _convert(temp - rng.uniform(2, 10), units),
+                "uvi": round(rng.uniform(0, 9), 2),
+                "clouds": rng.randint(0, 100),
+                "visibility": 10000,
+                "wind_speed": _wind(rng.uniform(0, 12), units),
+                "wind_deg": rng.randint(0, 359),
+                "wind_gust": _wind(rng.uniform(0, 18), units),
+                "weather": _weather(rng),
+                "pop": pop,
+            }
+            if pop > 0.4:
+                entry["rain"] = {"1h": round(rng.uniform(0.1, 4), 2)}
+            hourly.append(entry)
+        payload["hourly"] = hourly
+
+    if "daily" not in exclude:
+        daily = []
+        for i in range(settings.daily_days):
+            low = base_temp - rng.uniform(3, 8)
+            high = base_temp + rng.uniform(2, 7)
+            weather = _weather(rng)
+            pop = round(rng.uniform(0, 1), 2)
+            entry = {
+                "dt": day + 12 * 3600 + 86400 * i,
+                "sunrise": day + 6 * 3600 + 86400 * i,
+                "sunset": day + 18 * 3600 + 86400 * i,
+                "moonrise": day + 20 * 3600 + 86400 * i,
+                "moonset": day + 8 * 3600 + 86400 * i,
+                "moon_phase": round((i * 0.034) % 1, 2),
+                "summary": f"Expect a day of {weather[0]['description']}",
+                "temp": {
+                    "day": _convert((low + high) / 2, units),
+                    "min": _convert(low, units),
+                    "max": _convert(high, units),
+                    "night": _convert(low + 1, units),
+                    "eve": _convert(high - 2, units),
+                    "morn": _convert(low + 2, units),
+                },
+                "feels_like": {
+                    "day": _convert((low + high) / 2 - 1, units),
+                    "night": _convert(low, units),
+                    "eve": _convert(high - 3, units),
+                    "morn": _convert(low + 1, units),
+                },
+                "pressure": rng.randint(990, 1030),
+                "humidity": rng.randint(30, 95),
+                "dew_point": _convert(low - 2, units),
+                "wind_speed": _wind(rng.uniform(0, 12), units),
+                "wind_deg": rng.randint(0, 359),
+                "wind_gust": _wind(rng.uniform(0, 18), units),
+                "weather": weather,
+                "clouds": rng.randint(0, 100),
+                "pop": pop,
+                "uvi": round(rng.uniform(0, 9), 2),
+            }
+            if pop > 0.4:
+                entry["rain"] = round(rng.uniform(0.5, 20), 2)
+            daily.append(entry)
+        payload["daily"] = daily
+
+    if "alerts" not in exclude and rng.random() < settings.alert_probability:
+        payload["alerts"] = [{
+            "sender_name": "Stand-in Weather Service",
+            "event": rng.choice(["Wind Advisory", "Flood Watch", "Heat Advisory", "Winter Storm Warning"]),
+            "start": hour,
+            "end": hour + 12 * 3600,
+            "description": "This is a synthetic alert generated by the OpenWeatherMap stand-in. " * 4,
+            "tags": ["Wind"],
+        }]
+
+    if settings.pad_bytes:
+        payload["_padding"] = "x" * settings.pad_bytes
+    return payload
+
+
+def fixture_path(settings: StandinSettings, path: str, query: dict) -> pathlib.Path:
+    """Fixture file for a request; the API key is not part of the identity"""
+    identity = {key: value for key, value in sorted(query.items()) if key != "appid"}
+    if "q" in identity:
+        identity["q"] = ",".join(part.strip().lower() for part in identity["q"].split(","))
+    digest = hashlib.sha256(json.dumps([path, identity]).encode()).hexdigest()[:16]
+    endpoint = "geo" if path.startswith("/geo/") else "onecall"
+    return settings.fixtures_dir / f"{endpoint}-{digest}.json"
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    server_version = "OWMStandin/1.0"
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+    # Headers and body are written separately; without TCP_NODELAY, keep-alive clients
+    # hit the Nagle/delayed-ACK stall (~40ms) on every response
+    disable_nagle_algorithm = True
+
+    @property
+    def settings(self) -> StandinSettings:
+        return self.server.settings
+
+    def log_message(self, format, *args):
+        pass  # Per-request logging would dominate benchmark output
+
+    def do_GET(self):
+        parsed = urllib.parse.urlsplit(self.path)
+        query = dict(urllib.parse.parse_qsl(parsed.query))
+        settings = self.settings
+
+        if parsed.path not in ("/geo/1.0/direct", "/data/3.0/onecall"):
+            return self._send(404, {"cod": 404, "message": "Not found"})
+
+        delay = settings.latency_ms + self.server.rng.uniform(-settings.jitter_ms, settings.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+        if settings.record_from:
+            return self._proxy_and_record(parsed.path, query)
+        if settings.replay:
+            return self._replay(parsed.path, query)
+
+        if "appid" not in query or (settings.api_key and query["appid"] != settings.api_key):
+            return self._send(401, {"cod": 401, "message": "Invalid API key."})
+
+        roll = self.server.rng.random()
+        for code, rate in settings.error_rates.items():
+            if roll < rate:
+                return self._send_error_status(code)
+            roll -= rate
+
+        try:
+            if parsed.path == "/geo/1.0/direct":
+                body = geocode(query.get("q", ""), int(query.get("limit", 5)))
+            else:
+                exclude = set(filter(None, query.get("exclude", "").split(",")))
+                body = onecall(
+                    float(query["lat"]), float(query["lon"]),
+                    query.get("units", "standard"), exclude, settings,
+                )
+        except (KeyError, ValueError):
+            return self._send(400, {"cod": "400", "message": "Nothing to geocode or wrong lat/lon"})
+        self._send(200, body)
+
+    def _send_error_status(self, code: int):
+        messages = {
+            401: "Invalid API key.",
+            402: "Please subscribe to One Call by Call.",
+            429: "Your account is temporary blocked due to exceeding of requests limitation.",
+        }
+        headers = {"Retry-After": "1"} if code == 429 else {}
+        self._send(code, {"cod": code, "message": messages.get(code, "Internal error")}, headers)
+
+    def _proxy_and_record(self, path: str, query: dict):
+        url = f"{self.settings.record_from.rstrip('/')}{path}?{urllib.parse.urlencode(query)}"
+        try:
+            with urllib.request.urlopen(url, timeout=15) as response:
+                status, raw = response.status, response.read()
+        except urllib.error.HTTPError as err:
+            status, raw = err.code, err.read()
+        body = json.loads(raw or b"null")
+        if status == 200:
+            target = fixture_path(self.settings, path, query)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_text(json.dumps({"path": path, "status": status, "body": body}, indent=2))
+        self._send(status, body)
+
+    def _replay(self, path: str, query: dict):
+        target = fixture_path(self.settings, path, query)
+        if not target.exists():
+            return self._send(404, {"cod": 404, "message": f"No fixture recorded for {path} {query.get('q', '')}"})
+        fixture = json.loads(target.read_text())
+        self._send(fixture["status"], fixture["body"])
+
+    def _send(self, status: int, body, headers=None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def make_server(host: str = "127.0.0.1", port: int = 8765, settings: StandinSettings | None = None):
+    """Create (but don't start) a stand-in server; port 0 picks a free port"""
+    server = ThreadingHTTPServer((host, port), StandinHandler)
+    server.daemon_threads = True
+    server.settings = settings or StandinSettings()
+    # Drives latency jitter and error injection (payloads are seeded per request)
+    server.rng = random.Random(server.settings.seed or None)
+    return server
+
+
+def start_in_thread(host: str = "127.0.0.1", port: int = 0, settings: StandinSettings | None = None):
+    """Start a stand-in server on a background thread; returns (server, base_url)"""
+    server = make_server(host, port, settings)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    bound_host, bound_port = server.server_address[:2]
+    return server, f"http://{bound_host}:{bound_port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenWeatherMap stand-in server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Added latency per request")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Random +/- latency jitter")
+    parser.add_argument("--errors", default="", help="Error rates, e.g. '429=0.05,500=0.01,402=0.001'")
+    parser.add_argument("--hourly-hours", type=int, default=48, help="Entries in the hourly forecast")
+    parser.add_argument("--daily-days", type=int, default=8, help="Entries in the daily forecast")
+    parser.add_argument("--alert-probability", type=float, default=0.2)
+    parser.add_argument("--pad-bytes", type=int, default=0, help="Extra bytes added to One Call payloads")
+    parser.add_argument("--api-key", help="Only accept this appid (any non-empty key by default)")
+    parser.add_argument("--record", metavar="UPSTREAM_URL",
+                        help="Proxy to the real API (e.g. https://api.openweathermap.org) and save fixtures")
+    parser.add_argument("--replay", action="store_true", help="Serve recorded fixtures only")
+    parser.add_argument("--fixtures-dir", type=pathlib.Path, default=DEFAULT_FIXTURES_DIR)
+    parser.add_argument("--seed", type=int, default=0, help="Seed for payloads and error injection")
+    args = parser.parse_args()
+
+    settings = StandinSettings(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rates=parse_error_rates(args.errors),
+        hourly_hours=args.hourly_hours,
+        daily_days=args.daily_days,
+        alert_probability=args.alert_probability,
+        pad_bytes=args.pad_bytes,
+        api_key=args.api_key,
+        record_from=args.record,
+        replay=args.replay,
+        fixtures_dir=args.fixtures_dir,
+        seed=args.seed,
+    )
+    server = make_server(args.host, args.port, settings)
+    mode = "record" if args.record else "replay" if args.replay else "synthetic"
+    print(f"OpenWeatherMap stand-in ({mode}) listening on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
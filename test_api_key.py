@@ -6,6 +6,9 @@ import os
 import requests
 from dotenv import load_dotenv
 
+# Set OWM_BASE_URL to validate against a local stand-in (see owm_standin/) instead of the live API
+OWM_BASE_URL = os.getenv('OWM_BASE_URL', 'https://api.openweathermap.org').rstrip('/')
+
 def test_geocoding_api():
     """Test the Geocoding API first"""
     load_dotenv()
@@ -13,7 +16,7 @@ def test_geocoding_api():
     
     print("🗺️  Testing Geocoding API...")
     
-    url = 'http://api.openweathermap.org/geo/1.0/direct'
+    url = f'{OWM_BASE_URL}/geo/1.0/direct'
     params = {
         'q': 'London',
         'limit': 1,
@@ -46,7 +49,7 @@ def test_onecall_api(lat, lon):
     
     print("🌤️  Testing One Call API 3.0...")
     
-    url = 'https://api.openweathermap.org/data/3.0/onecall'
+    url = f'{OWM_BASE_URL}/data/3.0/onecall'
     params = {
         'lat': lat,
         'lon': lon,
@@ -1,58 +1,129 @@
+import argparse
 import asyncio
 import os
 import pathlib
+import sys
 from typing import List
+
+# agent_startup.py is shared by both agents and lives in the repository root
+sys.path.append(str(pathlib.Path(__file__).parent.parent))
+from agent_startup import StartupProfile, ainput
 from dotenv import load_dotenv
 
-# LlamaIndex imports for the agent, LLM, and MCP tools
-from llama_index.core.agent.workflow import ReActAgent
-from llama_index.llms.google_genai import GoogleGenAI
-from llama_index.tools.mcp import BasicMCPClient, McpToolSpec
+# LlamaIndex imports (agent, LLM and MCP tools) are deferred: they take seconds to
+# load, so they happen in the background while the prompt is already shown
 
 # Load environment variables from the parent directory's .env file
 env_path = pathlib.Path(__file__).parent.parent / '.env'
 load_dotenv(env_path)
 
-async def main():
-    """
-    Main function to set up and run the LlamaIndex agent.
-    """
-    print("Initializing LlamaIndex agent...")
-
-    # 1. Set up the LLM
+def create_llm(profile: StartupProfile):
+    """Imports LlamaIndex's agent and Gemini modules and creates the LLM (run on a worker thread)"""
     # Load API key from environment variable
     google_api_key = os.getenv("GOOGLE_GEMINI_API_KEY")
     if not google_api_key:
         raise ValueError("GOOGLE_GEMINI_API_KEY environment variable is not set. Please check your .env file.")
-    
-    llm = GoogleGenAI(
-        model_name="gemini-1.5-flash",
-        api_key=google_api_key
-    )
-    # 2. Set up the MCP client and tools
-    # We pass the stdio configuration dictionary directly to the client
+
+    with profile.span("import LlamaIndex agent + Gemini LLM (thread)"):
+        from llama_index.core.agent.workflow import ReActAgent
+        from llama_index.llms.google_genai import GoogleGenAI
+
+    with profile.span("create Gemini client (thread)"):
+        llm = GoogleGenAI(
+            model_name="gemini-1.5-flash",
+            api_key=google_api_key
+        )
+    return ReActAgent, llm
+
+
+def create_mcp_client(server_url: str | None, health_interval: float):
+    """
+    Creates the long-lived MCP client (the session is opened on first use).
+
+    Args:
+        server_url: URL of a shared MCP server; when omitted a private stdio server is spawned.
+        health_interval: Seconds between health-check pings while idle.
+    """
+    from mcp_session import PersistentMCPClient
+
+    if server_url:
+        # Connect to a shared server (streamable HTTP, or SSE for URLs ending in /sse)
+        return PersistentMCPClient(server_url, health_interval=health_interval)
     # Use absolute path to the MCP server
     mcp_server_path = pathlib.Path(__file__).parent.parent / 'mcp_server' / 'main.py'
-    mcp_client = BasicMCPClient("python", args=[str(mcp_server_path)])
+    return PersistentMCPClient(sys.executable, args=[str(mcp_server_path)], health_interval=health_interval)
+
+
+async def create_agent(mcp_client, profile: StartupProfile):
+    """
+    Sets up the MCP tools and the LLM concurrently and returns the ReActAgent.
+
+    Args:
+        mcp_client: PersistentMCPClient shared by every tool call.
+        profile: Startup timeline recorder.
+    """
+    with profile.span("import LlamaIndex MCP tools"):
+        from llama_index.tools.mcp import McpToolSpec
+
+    # 1. Start creating the LLM on a worker thread while the MCP server starts below
+    llm_ready = asyncio.create_task(asyncio.to_thread(create_llm, profile))
 
-    # McpToolSpec is a LlamaIndex-native way to wrap MCP tools
+    # 2. Set up the MCP tools. McpToolSpec is a LlamaIndex-native way to wrap MCP tools;
+    # with BasicMCPClient it would open a new session (and spawn a new stdio server) for
+    # every tool call, so it is given the persistent client instead
     tool_spec = McpToolSpec(client=mcp_client)
 
     # The agent will use the tools loaded from the MCP server
     # We use the async method to fetch the tool definitions
-    mcp_tools: List = await tool_spec.to_tool_list_async()
-    print(f"Successfully loaded {len(mcp_tools)} tool(s) from the MCP server.")
+    with profile.span("start MCP server + load tools"):
+        await mcp_client.start()
+        mcp_tools: List = await tool_spec.to_tool_list_async()
+    ReActAgent, llm = await llm_ready
 
     # 3. Create the LlamaIndex Agent
     # We use a ReActAgent, a standard and powerful agent type in LlamaIndex
     # It will use the Gemini LLM to reason about when to use the loaded MCP tools
     agent = ReActAgent(tools=mcp_tools, llm=llm, verbose=False)
+    profile.mark("agent ready")
+    profile.report()
+    return agent
+
+
+async def main(server_url: str | None = None, profile_startup: bool = False, health_interval: float = 30.0):
+    """
+    Main function to set up and run the LlamaIndex agent.
+
+    Args:
+        server_url: URL of a shared MCP server; when omitted a private stdio server is spawned.
+        profile_startup: Print a timeline of imports and initialization once the agent is ready.
+        health_interval: Seconds between MCP health-check pings while idle.
+    """
+    profile = StartupProfile(profile_startup)
+
+    # One MCP session for the whole REPL, reopened automatically if the server goes away
+    mcp_client = create_mcp_client(server_url, health_interval)
+    # The agent is set up in the background; the prompt is available right away
+    startup = asyncio.create_task(create_agent(mcp_client, profile))
+    try:
+        await run_repl(startup, profile)
+    finally:
+        startup.cancel()
+        await mcp_client.close()
+
+
+async def run_repl(startup: asyncio.Task, profile: StartupProfile):
+    agent = None
 
     print("\nWeather MCP agent is ready. Ask for the weather (e.g., 'What is the weather in London?').")
+    profile.mark("prompt ready")
 
     # 4. Start the conversation loop
     while True:
-        user_input = input("\nYou: ").strip()
+        try:
+            user_input = (await ainput("\nYou: ")).strip()
+        except EOFError:
+            print("Exiting.")
+            break
         if user_input.lower() in {"exit", "quit", "q"}:
             print("Exiting.")
             break
@@ -60,6 +131,15 @@ async def main():
         if not user_input:
             continue
 
+        if agent is None:
+            if not startup.done():
+                print("(still starting up...)")
+            try:
+                agent = await startup
+            except Exception as e:
+                print(f"The agent could not start: {e}")
+                break
+
         try:
             # The agent's chat method handles the full reasoning and tool-calling loop
             response = await agent.run(user_input)
@@ -69,7 +149,17 @@ async def main():
 
 if __name__ == "__main__":
     # Ensure you have a running asyncio event loop
+    parser = argparse.ArgumentParser(description="LlamaIndex weather agent")
+    parser.add_argument("--server-url", default=os.getenv("WEATHER_MCP_URL"),
+                        help="URL of a shared MCP server (default: spawn a private stdio server)")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="Print a timeline of imports and initialization once the agent is ready")
+    parser.add_argument("--health-interval", type=float,
+                        default=float(os.getenv("AGENT_MCP_HEALTH_INTERVAL", "30")),
+                        help="Seconds between MCP session health checks while idle (0 disables them)")
+    args = parser.parse_args()
+
     try:
-        asyncio.run(main())
+        asyncio.run(main(args.server_url, args.profile_startup, args.health_interval))
     except KeyboardInterrupt:
         print("\nProgram interrupted by user.")
\ No newline at end of file
@@ -0,0 +1,226 @@
+"""
+Long-lived MCP session for the LlamaIndex agent.
+
+llama_index's BasicMCPClient opens a new session for every request: over
+stdio that means spawning a fresh server process and repeating the
+initialize handshake for each tool call. PersistentMCPClient keeps a single
+session open for the life of the REPL instead. It offers the methods
+McpToolSpec calls (list_tools, call_tool, list_resources, ...), so it can be
+passed as McpToolSpec(client=...).
+
+The connection is watched by a periodic ping. When a ping or a request fails
+because the server went away, the session is reopened (with backoff) and the
+request is retried once. A request that times out is not retried: the server
+may still be running it, and some tools have side effects (enrich_delivery_log
+writes files, manage_watchlist changes the watchlist), so the timeout is
+raised to the caller instead.
+"""
+import asyncio
+import contextlib
+import logging
+from datetime import timedelta
+
+import anyio
+from mcp import ClientSession, McpError
+from mcp.types import CONNECTION_CLOSED
+
+logger = logging.getLogger(__name__)
+
+# McpError codes that mean the session is unusable rather than that the request was rejected.
+# A request timeout (408) is not one of them: the server may still be working on the request.
+SESSION_LOST = {CONNECTION_CLOSED}
+# Transport errors raised when the server process or connection has gone away
+TRANSPORT_ERRORS = (anyio.ClosedResourceError, anyio.BrokenResourceError, anyio.EndOfStream,
+                    ConnectionError, OSError)
+
+
+class PersistentMCPClient:
+    """
+    One MCP session shared by every tool call, with health checks and reconnect.
+
+    Args:
+        command_or_url: Shared server URL (streamable HTTP, or SSE for URLs ending in /sse),
+            or the command that starts a private stdio server.
+        args: Arguments for the stdio command.
+        env: Environment for the stdio server (default: inherit).
+        health_interval: Seconds between pings while idle (0 disables health checks).
+        timeout: Seconds to wait for a response, a ping or a (re)connect.
+        max_retries: Reconnect-and-retry attempts for a request that hit a lost session
+            (requests that time out are never retried).
+    """
+
+    def __init__(self, command_or_url: str, args: list[str] | None = None, env: dict | None = None,
+                 health_interval: float = 30.0, timeout: float = 30.0, max_retries: int = 1):
+        self.command_or_url = command_or_url
+        self.args = args or []
+        self.env = env
+        self.health_interval = health_interval
+        self.timeout = timeout
+        self.max_retries = max_retries
+
+        self._session = None
+        self._generation = 0
+        self._last_error = None
+        self._connected = asyncio.Event()
+        self._reconnect = asyncio.Event()
+        self._closing = asyncio.Event()
+        self._task = None
+
+        self.connects = 0
+        self.failed_health_checks = 0
+        self.retried_requests = 0
+
+    @contextlib.asynccontextmanager
+    async def _transport(self):
+        url = self.command_or_url
+        if url.startswith(("http://", "https://")):
+            if url.rstrip("/").endswith("/sse"):
+                from mcp.client.sse import sse_client
+                async with sse_client(url) as (read, write):
+                    yield read, write
+            else:
+                from mcp.client.streamable_http import streamablehttp_client
+                async with streamablehttp_client(url) as (read, write, _):
+                    yield read, write
+        else:
+            from mcp import StdioServerParameters
+            from mcp.client.stdio import stdio_client
+            parameters = StdioServerParameters(command=url, args=self.args, env=self.env)
+            async with stdio_client(parameters) as (read, write):
+                yield read, write
+
+    async def start(self):
+        """Open the session (waits until the first connection succeeds)"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        await self._current_session()
+
+    async def close(self):
+        self._closing.set()
+        if self._task:
+            with contextlib.suppress(Exception):
+                await self._task
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def _run(self):
+        # The transport's contexts must be entered and exited in this same task
+        backoff = 0.5
+        while not self._closing.is_set():
+            try:
+                async with contextlib.AsyncExitStack() as stack:
+                    read, write = await stack.enter_async_context(self._transport())
+                    session = await stack.enter_async_context(
+                        ClientSession(read, write, read_timeout_seconds=timedelta(seconds=self.timeout))
+                    )
+                    await asyncio.wait_for(session.initialize(), self.timeout)
+
+                    self._session = session
+                    self._generation += 1
+                    self.connects += 1
+                    self._last_error = None
+                    self._reconnect.clear()
+                    self._connected.set()
+                    backoff = 0.5
+                    await self._supervise(session)
+            except Exception as e:
+                self._last_error = e
+                logger.warning("MCP session lost: %s", e)
+            finally:
+                self._session = None
+                self._connected.clear()
+
+            if not self._closing.is_set():
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self._closing.wait(), backoff)
+                backoff = min(backoff * 2, 10.0)
+
+    async def _supervise(self, session: ClientSession):
+        """Returns when the session should be closed: shutdown, reconnect request or failed ping"""
+        while True:
+            wakeups = [asyncio.ensure_future(self._closing.wait()), asyncio.ensure_future(self._reconnect.wait())]
+            try:
+                done, _ = await asyncio.wait(wakeups, timeout=self.health_interval or None,
+                                             return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                for wakeup in wakeups:
+                    wakeup.cancel()
+            if done:
+                return
+            try:
+                await asyncio.wait_for(session.send_ping(), self.timeout)
+            except Exception as e:
+                self.failed_health_checks += 1
+                logger.warning("MCP health check failed: %s", e)
+                return
+
+    async def _current_session(self) -> tuple[ClientSession, int]:
+        try:
+            await asyncio.wait_for(self._connected.wait(), self.timeout)
+        except asyncio.TimeoutError:
+            raise ConnectionError(f"Could not connect to the MCP server: {self._last_error}") from self._last_error
+        return self._session, self._generation
+
+    async def _request(self, method: str, *args, **kwargs):
+        if self._task is None:
+            await self.start()
+        for attempt in range(self.max_retries + 1):
+            session, generation = await self._current_session()
+            try:
+                return await getattr(session, method)(*args, **kwargs)
+            except McpError as e:
+                if e.error.code not in SESSION_LOST or attempt == self.max_retries:
+                    raise
+            except TRANSPORT_ERRORS:
+                if attempt == self.max_retries:
+                    raise
+            # The session is gone: reopen it (once, however many requests noticed) and retry
+            self.retried_requests += 1
+            if generation == self._generation:
+                self._reconnect.set()
+                self._connected.clear()
+
+    async def is_healthy(self) -> bool:
+        """Ping the server now"""
+        try:
+            session, _ = await self._current_session()
+            await asyncio.wait_for(session.send_ping(), self.timeout)
+            return True
+        except Exception:
+            return False
+
+    def stats(self) -> dict:
+        return {
+            "connected": self._connected.is_set(),
+            "connects": self.connects,
+            "failed_health_checks": self.failed_health_checks,
+            "retried_requests": self.retried_requests,
+        }
+
+    # The ClientSession methods McpToolSpec uses
+
+    async def list_tools(self):
+        return await self._request("list_tools")
+
+    async def call_tool(self, name: str, arguments: dict | None = None, **kwargs):
+        return await self._request("call_tool", name, arguments, **kwargs)
+
+    async def list_resources(self):
+        return await self._request("list_resources")
+
+    async def list_resource_templates(self):
+        return await self._request("list_resource_templates")
+
+    async def read_resource(self, uri):
+        return await self._request("read_resource", uri)
+
+    async def list_prompts(self):
+        return await self._request("list_prompts")
+
+    async def get_prompt(self, name: str, arguments: dict | None = None):
+        return await self._request("get_prompt", name, arguments)
@@ -0,0 +1,260 @@
+"""
+Persistent, bounded-memory checkpointer for the LangGraph agent.
+
+`MemorySaver` keeps every checkpoint of every thread in process memory and
+loses them all on restart. `CompactingSqliteSaver` stores checkpoints in a
+SQLite database (WAL mode, via langgraph-checkpoint-sqlite) so a conversation
+can be resumed after a restart, and keeps memory bounded:
+
+- only the latest checkpoint of the most recently used threads is held in a
+  small in-memory LRU ("hot set"). The hot set is write-through: each saved
+  checkpoint and its pending writes replace the cached copy, so the next
+  turn of a hot thread is loaded without touching the database;
+- every `compact_every` saves, older checkpoints of the thread are deleted,
+  keeping the newest `keep_per_thread` (the agent's state channels are full
+  snapshots, so the latest checkpoint is all a thread needs to resume);
+- threads idle for longer than `thread_ttl` seconds are deleted entirely.
+"""
+import contextlib
+import json
+import pathlib
+import time
+from collections import OrderedDict
+
+import aiosqlite
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    CheckpointTuple,
+    copy_checkpoint,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+    writes_sort_key,
+)
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+
+class CompactingSqliteSaver(AsyncSqliteSaver):
+    """
+    AsyncSqliteSaver with a hot-set LRU, per-thread compaction and idle-thread expiry.
+
+    Args:
+        conn: Open aiosqlite connection.
+        hot_threads: Number of threads whose latest checkpoint is kept in memory.
+        keep_per_thread: Checkpoints kept per thread when compacting.
+        compact_every: Compact a thread after this many saves to it.
+        thread_ttl: Seconds of inactivity after which a thread is deleted.
+    """
+
+    def __init__(self, conn, hot_threads: int = 32, keep_per_thread: int = 2,
+                 compact_every: int = 20, thread_ttl: float = 30 * 86400):
+        super().__init__(conn)
+        self.hot_threads = hot_threads
+        self.keep_per_thread = max(1, keep_per_thread)
+        self.compact_every = max(1, compact_every)
+        self.thread_ttl = thread_ttl
+        self._hot = OrderedDict()  # (thread_id, checkpoint_ns) -> (CheckpointTuple, writes)
+        self._saves_since_compaction = {}
+        self.hot_hits = 0
+        self.hot_misses = 0
+        self.compactions = 0
+        self.checkpoints_deleted = 0
+        self.threads_expired = 0
+
+    async def setup(self) -> None:
+        if self.is_setup:
+            return
+        # Let compaction hand freed pages back to the file system (only applies to new databases)
+        await self.conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        await super().setup()
+        async with self.lock:
+            await self.conn.execute("PRAGMA synchronous=NORMAL")
+            await self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS thread_activity ("
+                " thread_id TEXT PRIMARY KEY,"
+                " updated_at REAL NOT NULL)"
+            )
+            await self.conn.commit()
+
+    # Hot set -----------------------------------------------------------------
+
+    def _hot_key(self, config) -> tuple:
+        configurable = config["configurable"]
+        return str(configurable["thread_id"]), configurable.get("checkpoint_ns", "")
+
+    def _forget(self, thread_id: str):
+        for key in [key for key in self._hot if key[0] == thread_id]:
+            del self._hot[key]
+
+    def _remember(self, key: tuple, saved, writes):
+        """
+        Cache the latest checkpoint of a thread.
+
+        `writes` maps (task_id, idx) to (task_path, channel, value) for the checkpoint's
+        pending writes, or is None when they came from the database (their order keys
+        aren't known, so later writes to that checkpoint drop it from the hot set).
+        """
+        self._hot[key] = (saved, writes)
+        self._hot.move_to_end(key)
+        while len(self._hot) > self.hot_threads:
+            self._hot.popitem(last=False)
+
+    async def aget_tuple(self, config):
+        # Only "latest checkpoint of a thread" lookups go through the hot set
+        if get_checkpoint_id(config):
+            return await super().aget_tuple(config)
+
+        key = self._hot_key(config)
+        cached = self._hot.get(key)
+        if cached is not None:
+            self._hot.move_to_end(key)
+            self.hot_hits += 1
+            saved = cached[0]
+        else:
+            self.hot_misses += 1
+            saved = await super().aget_tuple(config)
+            if saved is None:
+                return None
+            self._remember(key, saved, None if saved.pending_writes else {})
+        # The graph updates the checkpoint it loads in place, so hand out a copy
+        return saved._replace(checkpoint=copy_checkpoint(saved.checkpoint))
+
+    # Writes ------------------------------------------------------------------
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        next_config = await super().aput(config, checkpoint, metadata, new_versions)
+        thread_id = str(config["configurable"]["thread_id"])
+        # Write-through: cache the checkpoint just saved the way aget_tuple would load it
+        checkpoint_ns = next_config["configurable"]["checkpoint_ns"]
+        parent_id = config["configurable"].get("checkpoint_id")
+        parent_config = {"configurable": {
+            "thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_id,
+        }} if parent_id else None
+        saved = CheckpointTuple(
+            {"configurable": {**next_config["configurable"], "thread_id": thread_id}},
+            copy_checkpoint(checkpoint),
+            json.loads(json.dumps(get_checkpoint_metadata(config, metadata), ensure_ascii=False)),
+            parent_config,
+            [],
+        )
+        self._remember((thread_id, checkpoint_ns), saved, {})
+        async with self.lock:
+            await self.conn.execute(
+                "INSERT INTO thread_activity (thread_id, updated_at) VALUES (?, ?)"
+                " ON CONFLICT(thread_id) DO UPDATE SET updated_at = excluded.updated_at",
+                (thread_id, time.time()),
+            )
+            await self.conn.commit()
+
+        saves = self._saves_since_compaction.get(thread_id, 0) + 1
+        if saves >= self.compact_every:
+            await self.acompact(thread_id)
+            saves = 0
+        self._saves_since_compaction[thread_id] = saves
+        return next_config
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        await super().aput_writes(config, writes, task_id, task_path)
+        # Pending writes are part of the cached tuple: add them the way the database stores them
+        key = self._hot_key(config)
+        cached = self._hot.get(key)
+        if cached is None:
+            return
+        saved, stored = cached
+        if stored is None or saved.config["configurable"]["checkpoint_id"] != get_checkpoint_id(config):
+            del self._hot[key]
+            return
+        if not self._has_task_path:
+            task_path = ""
+        # A batch of only special channels (errors, interrupts, ...) replaces earlier writes, others don't
+        replace = all(channel in WRITES_IDX_MAP for channel, _ in writes)
+        for idx, (channel, value) in enumerate(writes):
+            write_key = (task_id, WRITES_IDX_MAP.get(channel, idx))
+            if replace or write_key not in stored:
+                stored[write_key] = (task_path, channel, value)
+        ordered = sorted(stored.items(), key=lambda item: writes_sort_key(item[1][0], *item[0]))
+        pending = [(write_task, channel, value) for (write_task, _), (_, channel, value) in ordered]
+        self._hot[key] = (saved._replace(pending_writes=pending), stored)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await super().adelete_thread(thread_id)
+        self._forget(str(thread_id))
+        self._saves_since_compaction.pop(str(thread_id), None)
+        async with self.lock:
+            await self.conn.execute("DELETE FROM thread_activity WHERE thread_id = ?", (str(thread_id),))
+            await self.conn.commit()
+
+    # Compaction --------------------------------------------------------------
+
+    async def acompact(self, thread_id: str | None = None) -> dict:
+        """
+        Delete all but the newest checkpoints of one thread (or of every thread),
+        expire idle threads, and shrink the database and WAL files.
+
+        Returns:
+            Counts of deleted checkpoints and expired threads.
+        """
+        await self.setup()
+        async with self.lock:
+            cursor = await self.conn.execute(
+                "SELECT thread_id FROM thread_activity WHERE updated_at < ?",
+                (time.time() - self.thread_ttl,),
+            )
+            expired = [row[0] for row in await cursor.fetchall()]
+
+        for expired_thread in expired:
+            await self.adelete_thread(expired_thread)
+
+        params = (thread_id,) if thread_id is not None else ()
+        thread_filter = "WHERE thread_id = ?" if thread_id is not None else ""
+        async with self.lock:
+            # Checkpoint ids are time-ordered, so the highest ids are the newest
+            cursor = await self.conn.execute(
+                "DELETE FROM checkpoints WHERE rowid IN ("
+                " SELECT rowid FROM ("
+                "  SELECT rowid, ROW_NUMBER() OVER ("
+                "   PARTITION BY thread_id, checkpoint_ns ORDER BY checkpoint_id DESC) AS rank"
+                f"  FROM checkpoints {thread_filter})"
+                " WHERE rank > ?)",
+                (*params, self.keep_per_thread),
+            )
+            deleted = cursor.rowcount
+            # Writes belonging to deleted checkpoints
+            await self.conn.execute(
+                "DELETE FROM writes WHERE NOT EXISTS ("
+                " SELECT 1 FROM checkpoints c WHERE c.thread_id = writes.thread_id"
+                " AND c.checkpoint_ns = writes.checkpoint_ns AND c.checkpoint_id = writes.checkpoint_id)"
+                + (" AND thread_id = ?" if thread_id is not None else ""),
+                params,
+            )
+            await self.conn.commit()
+            # executescript runs each pragma to completion (execute would free one page per step)
+            await self.conn.executescript("PRAGMA incremental_vacuum; PRAGMA wal_checkpoint(TRUNCATE);")
+
+        self.compactions += 1
+        self.checkpoints_deleted += deleted
+        self.threads_expired += len(expired)
+        return {"checkpoints_deleted": deleted, "threads_expired": len(expired)}
+
+    def stats(self) -> dict:
+        """Hot-set and compaction counters"""
+        return {
+            "hot_threads": len(self._hot),
+            "hot_hits": self.hot_hits,
+            "hot_misses": self.hot_misses,
+            "compactions": self.compactions,
+            "checkpoints_deleted": self.checkpoints_deleted,
+            "threads_expired": self.threads_expired,
+        }
+
+
+@contextlib.asynccontextmanager
+async def open_checkpointer(path, **options):
+    """Open (creating if needed) a CompactingSqliteSaver on a database file"""
+    path = pathlib.Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    async with aiosqlite.connect(str(path)) as conn:
+        saver = CompactingSqliteSaver(conn, **options)
+        await saver.setup()
+        # Expire idle threads and compact what the last run left behind
+        await saver.acompact()
+        yield saver
@@ -0,0 +1,186 @@
+"""
+Deterministic fast path for simple weather questions.
+
+Questions like "weather in Paris" or "compare the weather in London and
+Rome" don't need an LLM to pick a tool and phrase the answer. The router
+recognises those shapes with regular expressions, scores how confident it is,
+and above a threshold calls the MCP weather tools directly and renders a
+templated answer. Anything ambiguous (time qualifiers, extra clauses,
+unknown locations) falls back to the full LangGraph agent.
+"""
+import json
+import re
+import statistics
+
+LOCATION = r"(?P<{name}>[A-Za-z][A-Za-z .'\-]*(?:,\s*[A-Za-z .]+){{0,2}})"
+
+# (pattern, base confidence) for single-location questions
+SINGLE_PATTERNS = [
+    (r"(?:what(?:'s|s| is)|how(?:'s|s| is))\s+the\s+weather(?:\s+like)?\s+(?:in|at|for)\s+" + LOCATION.format(name="a"), 0.95),
+    (r"(?:current\s+)?weather\s+(?:in|at|for)\s+" + LOCATION.format(name="a"), 0.95),
+    (r"(?:what(?:'s|s| is)\s+it\s+like|how\s+is\s+it)\s+(?:in|at)\s+" + LOCATION.format(name="a"), 0.85),
+    (LOCATION.format(name="a") + r"\s+weather", 0.85),
+]
+
+# (pattern, base confidence) for two-location comparisons
+COMPARE_PATTERNS = [
+    (r"compare\s+(?:the\s+)?weather\s+(?:between|in|for|of)\s+" + LOCATION.format(name="a")
+     + r"\s+(?:and|vs\.?|versus|with|to)\s+" + LOCATION.format(name="b"), 0.95),
+    (r"compare\s+" + LOCATION.format(name="a") + r"\s+(?:and|vs\.?|versus|with|to)\s+"
+     + LOCATION.format(name="b") + r"(?:\s+weather)?", 0.85),
+    (r"(?:weather\s+(?:in\s+)?)?" + LOCATION.format(name="a") + r"\s+(?:vs\.?|versus)\s+"
+     + LOCATION.format(name="b") + r"(?:\s+weather)?", 0.8),
+]
+
+# Words that mean the question needs more than "current conditions" reasoning
+LLM_HINTS = {
+    "tomorrow", "tonight", "week", "weekend", "hourly", "forecast", "yesterday", "later",
+    "should", "umbrella", "jacket", "wear", "why", "alert", "alerts", "uv", "sunrise", "sunset",
+    "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday",
+}
+
+# Trailing filler that doesn't change the meaning of a current-conditions question
+TRAILING_FILLER = re.compile(r"\s+(?:today|right now|now|currently|please)$", re.IGNORECASE)
+
+
+class FastPathRouter:
+    """
+    Intent router in front of the LangGraph agent.
+
+    Args:
+        threshold: Minimum confidence (0-1) required to answer without the LLM.
+    """
+
+    def __init__(self, threshold: float = 0.8):
+        self.threshold = threshold
+        self.counts = {"fast_path": 0, "llm_path": 0, "fast_path_fallbacks": 0}
+        self.latencies = {"fast_path": [], "llm_path": []}
+
+    def classify(self, text: str):
+        """
+        Returns (kind, locations, confidence) where kind is "single" or "compare",
+        or None when the question doesn't look like a simple weather query.
+        """
+        question = text.strip().rstrip("?!. ").strip()
+        question = TRAILING_FILLER.sub("", question)
+        if not question or len(question) > 120:
+            return None
+
+        for patterns, kind in ((COMPARE_PATTERNS, "compare"), (SINGLE_PATTERNS, "single")):
+            for pattern, confidence in patterns:
+                match = re.fullmatch(pattern, question, re.IGNORECASE)
+                if not match:
+                    continue
+                locations = [match.group(name).strip(" ,") for name in ("a", "b") if name in match.groupdict()]
+                return kind, locations, confidence * self._location_confidence(locations)
+        return None
+
+    @staticmethod
+    def _location_confidence(locations) -> float:
+        """Penalise captures that look like more than a place name"""
+        confidence = 1.0
+        for location in locations:
+            words = re.findall(r"[a-z]+", location.lower())
+            if not words:
+                return 0.0
+            if LLM_HINTS.intersection(words):
+                return 0.0
+            if "and" in words or "or" in words:
+                confidence *= 0.5  # Probably several places, or a question about something else
+            if len(words) > 4:
+                confidence *= 0.6
+        return confidence
+
+    async def try_answer(self, session, text: str) -> str | None:
+        """Answer directly via the MCP tools, or return None to use the LLM path"""
+        intent = self.classify(text)
+        if intent is None or intent[2] < self.threshold:
+            return None
+
+        kind, locations, _ = intent
+        try:
+            if kind == "single":
+                report = await self._call(session, "get_weather", {
+                    "location": locations[0], "detail": "summary", "compact": True
+                })
+                answer = render_single(report) if "error" not in report else None
+            else:
+                comparison = await self._call(session, "compare_weather", {"locations": locations})
+                answer = (render_comparison(comparison)
+                          if "error" not in comparison and not comparison.get("errors") else None)
+        except Exception:
+            answer = None
+
+        if answer is None:
+            # Unknown location, upstream error, ... let the LLM deal with it
+            self.counts["fast_path_fallbacks"] += 1
+        return answer
+
+    @staticmethod
+    async def _call(session, tool: str, arguments: dict) -> dict:
+        result = await session.call_tool(tool, arguments)
+        if result.isError or not result.content:
+            return {"error": "tool call failed"}
+        return json.loads(result.content[0].text)
+
+    def record(self, path: str, seconds: float):
+        """Count a handled turn and its latency ("fast_path" or "llm_path")"""
+        self.counts[path] += 1
+        self.latencies[path].append(seconds)
+
+    def stats(self) -> dict:
+        stats = dict(self.counts)
+        for path, samples in self.latencies.items():
+            if samples:
+                stats[f"{path}_median_ms"] = round(statistics.median(samples) * 1000, 1)
+        return stats
+
+
+def _alerts_line(report: dict) -> str:
+    alerts = report.get("alerts")
+    return f"\n⚠️ Active alerts: {', '.join(alerts)}" if alerts else ""
+
+
+def render_single(report: dict) -> str:
+    """Template answer for one location (compact summary report)"""
+    units = report["units"]
+    current = report["current"]
+    lines = [
+        f"Right now in {report['location']} it's {current['desc']}, "
+        f"{current['temp']}{units['temp']} (feels like {current['feels']}{units['temp']}), "
+        f"humidity {current['humidity']}{units['humidity']}, wind {current['wind']} {units['wind']}."
+    ]
+    today = report.get("today")
+    if today:
+        lines.append(
+            f"Today: {today['min']}–{today['max']}{units['temp']}, "
+            f"{today['pop']}% chance of precipitation."
+        )
+    return " ".join(lines) + _alerts_line(report)
+
+
+def render_comparison(comparison: dict) -> str:
+    """Template answer from a compare_weather result (two locations)"""
+    units = comparison["units"]
+    temp_unit, wind_unit = units["temp"], units["wind"]
+    a, b = comparison["locations"][:2]
+    rows = [
+        f"| | {a['location']} | {b['location']} |",
+        "|---|---|---|",
+        f"| Conditions | {a['desc']} | {b['desc']} |",
+        f"| Temperature | {a['temp']}{temp_unit} | {b['temp']}{temp_unit} |",
+        f"| Feels like | {a['feels']}{temp_unit} | {b['feels']}{temp_unit} |",
+        f"| Wind | {a['wind']} {wind_unit} | {b['wind']} {wind_unit} |",
+        f"| Humidity | {a['humidity']}% | {b['humidity']}% |",
+    ]
+    if a.get("today") and b.get("today"):
+        rows.append(f"| Precipitation today | {a['today']['pop']}% | {b['today']['pop']}% |")
+
+    # Deltas are relative to the first location
+    delta = comparison["differences"][0]["temp_delta"]
+    if delta == 0:
+        verdict = f"Both places are at about {a['temp']}{temp_unit}."
+    else:
+        warmer, colder = (b, a) if delta > 0 else (a, b)
+        verdict = f"{warmer['location']} is {abs(delta)}{temp_unit} warmer than {colder['location']}."
+    return "\n".join(rows) + f"\n\n{verdict}" + _alerts_line(a) + _alerts_line(b)
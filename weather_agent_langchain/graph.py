@@ -0,0 +1,98 @@
+"""
+LangGraph agent graph: state schema, chat node and tool routing.
+
+Kept apart from the REPL in main.py because it pulls in the heavy LangGraph /
+LangChain stack; main.py imports it in the background while the MCP server
+starts (see --profile-startup).
+"""
+import os
+from typing import Annotated, List
+
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_mcp_adapters.tools import load_mcp_tools
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.graph import END, START, StateGraph
+from langgraph.graph.message import AnyMessage, add_messages
+from langgraph.prebuilt import ToolNode, tools_condition
+from typing_extensions import TypedDict
+
+from history import ConversationWindow, merge_pinned
+
+
+# LangGraph state definition
+class State(TypedDict):
+    messages: Annotated[List[AnyMessage], add_messages]
+    # Compact digests of loaded resources, by URI (sent in the system prompt, not the history)
+    pinned: Annotated[dict, merge_pinned]
+    # Questions from turns that were trimmed out of the history window
+    earlier: List[str]
+
+
+SYSTEM_PROMPT = "You are a helpful assistant that uses tools to get the current weather for a location."
+
+
+def build_system_context(state: State) -> str:
+    """Extra system-prompt context: trimmed-turn questions and pinned resource digests"""
+    sections = []
+    if state.get("earlier"):
+        questions = "\n".join(f"- {question}" for question in state["earlier"])
+        sections.append(f"Earlier in this conversation the user asked:\n{questions}")
+    if state.get("pinned"):
+        sections.append("Context loaded by the user:\n" + "\n\n".join(state["pinned"].values()))
+    return "\n\n".join(sections)
+
+
+def create_llm():
+    """Gemini chat model (langchain_google_genai is only imported when it's actually used)"""
+    google_api_key = os.getenv("GOOGLE_GEMINI_API_KEY")
+    if not google_api_key:
+        raise ValueError("GOOGLE_GEMINI_API_KEY environment variable is not set")
+
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    return ChatGoogleGenerativeAI(model="gemini-2.0-flash", temperature=0, google_api_key=google_api_key)
+
+
+async def create_graph(session, history_window: ConversationWindow | None = None, checkpointer=None,
+                       llm=None):
+    # Load tools from MCP server
+    tools = await load_mcp_tools(session)
+
+    # LLM configuration (a different chat model, e.g. the load-test stand-in, can be passed in)
+    llm = llm or create_llm()
+    llm_with_tools = llm.bind_tools(tools)
+
+    # Prompt template with user/assistant chat plus pinned context in the system message
+    prompt_template = ChatPromptTemplate.from_messages([
+        ("system", SYSTEM_PROMPT + "\n\n{context}"),
+        MessagesPlaceholder("messages")
+    ])
+    history_window = history_window or ConversationWindow()
+
+    chat_llm = prompt_template | llm_with_tools
+
+    # Define chat node (async, so the event loop keeps serving MCP traffic while Gemini responds;
+    # under astream_events the model call streams its tokens to the REPL)
+    async def chat_node(state: State) -> State:
+        # Only the most recent turns that fit the token budget are sent to the model
+        window, removed = history_window.prepare(state["messages"])
+        update = {}
+        if removed:
+            update["earlier"] = history_window.earlier_questions(state.get("earlier"), removed)
+        context = build_system_context({**state, **update})
+        response = await chat_llm.ainvoke({"messages": window, "context": context})
+        # Trimmed messages are dropped from the checkpointed state too
+        update["messages"] = history_window.removals(removed) + [response]
+        return update
+
+    # Build LangGraph with tool routing
+    graph = StateGraph(State)
+    graph.add_node("chat_node", chat_node)
+    graph.add_node("tool_node", ToolNode(tools=tools))
+    graph.add_edge(START, "chat_node")
+    graph.add_conditional_edges("chat_node", tools_condition, {
+        "tools": "tool_node",
+        "__end__": END
+    })
+    graph.add_edge("tool_node", "chat_node")
+
+    return graph.compile(checkpointer=checkpointer or MemorySaver())
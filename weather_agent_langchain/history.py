@@ -0,0 +1,143 @@
+"""
+Token-budgeted conversation window for the LangGraph agent.
+
+Without a budget every turn resends the whole conversation (including old
+tool payloads and pasted resources) to Gemini, so prompts grow with the
+session. Before each model call the agent:
+
+- shortens tool outputs from earlier turns to a brief preview,
+- keeps only as many recent turns as fit in the token budget (the dropped
+  ones are removed from the checkpointed state and remembered as a short
+  list of earlier questions),
+- and sends loaded resources as compact "pinned" digests in the system
+  prompt instead of as chat messages.
+
+Token counts are estimates (about 4 characters per token), which is enough
+to keep prompt size roughly flat.
+"""
+import json
+import re
+from collections import Counter
+
+from langchain_core.messages import HumanMessage, RemoveMessage, ToolMessage, trim_messages
+
+# Number of dropped questions remembered in the "earlier in this conversation" note
+MAX_EARLIER_QUESTIONS = 10
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count of a string (about 4 characters per token)"""
+    return len(text) // 4 + 1
+
+
+def _message_text(message) -> str:
+    content = message.content
+    if isinstance(content, str):
+        text = content
+    else:
+        text = " ".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+    tool_calls = getattr(message, "tool_calls", None)
+    if tool_calls:
+        text += json.dumps([call["args"] for call in tool_calls])
+    return text
+
+
+def count_message_tokens(messages) -> int:
+    """Token counter for trim_messages (content plus tool-call arguments)"""
+    return sum(estimate_tokens(_message_text(message)) + 4 for message in messages)
+
+
+def merge_pinned(current: dict | None, update: dict | None) -> dict:
+    """State reducer: pinned digests are added or replaced per resource URI"""
+    return {**(current or {}), **(update or {})}
+
+
+def resource_digest(uri: str, content: str, max_tokens: int) -> str:
+    """
+    Compact a resource for pinning.
+
+    JSON is re-serialized without whitespace. Line-oriented text with repeated
+    shapes (e.g. "Order #10583: Delivered to Austin") is grouped by its shape
+    with numbers masked, and each group is listed once with a count. Whatever
+    is still over budget is cut off with a note.
+    """
+    text = content.strip()
+    try:
+        text = json.dumps(json.loads(text), separators=(",", ":"), ensure_ascii=False)
+    except ValueError:
+        lines = [re.sub(r"\s+", " ", line).strip() for line in text.splitlines() if line.strip()]
+        shapes = Counter(re.sub(r"\d+", "#", line) for line in lines)
+        if len(shapes) < len(lines):
+            text = "\n".join(f"{count} x {shape}" if count > 1 else shape for shape, count in shapes.items())
+            text = f"{len(lines)} lines, grouped (numbers shown as #):\n{text}"
+        else:
+            text = "\n".join(lines)
+
+    max_chars = max_tokens * 4
+    if len(text) > max_chars:
+        text = text[:max_chars] + f"\n... [truncated, {len(text) - max_chars} more characters]"
+    return f"[{uri}]\n{text}"
+
+
+class ConversationWindow:
+    """
+    Decides which part of the history is sent to the model.
+
+    Args:
+        max_tokens: Token budget for the chat history (pinned digests not included).
+        tool_output_chars: Characters kept from tool outputs of earlier turns.
+    """
+
+    def __init__(self, max_tokens: int = 4000, tool_output_chars: int = 300):
+        self.max_tokens = max_tokens
+        self.tool_output_chars = tool_output_chars
+
+    def _compact_tool_output(self, message):
+        content = message.content if isinstance(message.content, str) else _message_text(message)
+        if len(content) <= self.tool_output_chars:
+            return message
+        preview = content[:self.tool_output_chars]
+        return message.model_copy(update={
+            "content": f"{preview}... [earlier tool output shortened from {len(content)} characters]"
+        })
+
+    def prepare(self, messages):
+        """
+        Returns (window, removed) where window is the list of messages to send
+        and removed holds the older messages that no longer fit the budget.
+        The current turn (from the last user message on) is always kept whole.
+        """
+        last_human = max((i for i, m in enumerate(messages) if isinstance(m, HumanMessage)), default=0)
+        history, current = messages[:last_human], messages[last_human:]
+
+        # Old tool payloads are only needed in full for the turn that requested them
+        history = [self._compact_tool_output(m) if isinstance(m, ToolMessage) else m for m in history]
+
+        budget = max(0, self.max_tokens - count_message_tokens(current))
+        kept = trim_messages(
+            history,
+            max_tokens=budget,
+            token_counter=count_message_tokens,
+            strategy="last",
+            start_on="human",  # Never start on a tool result whose tool call was dropped
+            allow_partial=False,
+        ) if history else []
+
+        kept_ids = {m.id for m in kept}
+        removed = [m for m in history if m.id not in kept_ids]
+        return kept + current, removed
+
+    @staticmethod
+    def removals(removed) -> list:
+        """RemoveMessage updates that drop trimmed messages from the checkpointed state"""
+        return [RemoveMessage(id=m.id) for m in removed if m.id]
+
+    @staticmethod
+    def earlier_questions(previous: list, removed) -> list:
+        """Remember the user questions of dropped turns as short one-liners"""
+        questions = list(previous or [])
+        for message in removed:
+            if isinstance(message, HumanMessage):
+                text = re.sub(r"\s+", " ", _message_text(message)).strip()
+                questions.append(text[:100] + ("..." if len(text) > 100 else ""))
+        return questions[-MAX_EARLIER_QUESTIONS:]
@@ -0,0 +1,118 @@
+"""
+Scripted stand-in for the Gemini chat model, for load tests and benchmarks.
+
+It behaves like a well-behaved tool-calling model without network access or
+API keys. For a weather question it first asks for `get_weather` (or
+`compare_weather` for comparisons), then answers with a short summary of the
+tool result. The answer is streamed word by word. Latency per model call is
+configurable, so the agent's own overhead can be measured separately from the
+model's.
+"""
+import asyncio
+import json
+import time
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from fast_path import FastPathRouter
+
+_router = FastPathRouter(threshold=0.0)
+
+
+class StandinChatModel(BaseChatModel):
+    """
+    Deterministic tool-calling chat model.
+
+    Args:
+        latency_ms: Delay before each response (the first token, when streaming).
+        token_delay_ms: Delay between streamed words.
+    """
+
+    latency_ms: float = 0.0
+    token_delay_ms: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "weather-standin"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _respond(self, messages) -> AIMessage:
+        last = messages[-1]
+        if isinstance(last, ToolMessage):
+            return AIMessage(_summarize_tool_output(last.content))
+
+        intent = _router.classify(last.content if isinstance(last.content, str) else "")
+        if intent is None:
+            return AIMessage("I can look up current weather and forecasts. Which location are you interested in?")
+        kind, locations, _ = intent
+        call_id = f"standin-{time.monotonic_ns()}"
+        if kind == "compare":
+            call = {"name": "compare_weather", "args": {"locations": locations}, "id": call_id}
+        else:
+            call = {"name": "get_weather", "args": {"location": locations[0], "detail": "summary"}, "id": call_id}
+        return AIMessage("", tool_calls=[call])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self.latency_ms / 1000)
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self.latency_ms / 1000)
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency_ms / 1000)
+        message = self._respond(messages)
+        if message.tool_calls:
+            yield ChatGenerationChunk(message=AIMessageChunk(content="", tool_call_chunks=[
+                {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": index}
+                for index, call in enumerate(message.tool_calls)
+            ]))
+            return
+        words = message.content.split(" ")
+        for index, word in enumerate(words):
+            if index and self.token_delay_ms:
+                await asyncio.sleep(self.token_delay_ms / 1000)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word + (" " if index < len(words) - 1 else "")))
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+
+def _summarize_tool_output(content) -> str:
+    """One-sentence answer from a get_weather / get_weather_batch / compare_weather result"""
+    if not isinstance(content, str):
+        # MCP tool results arrive as a list of content blocks
+        content = "".join(block.get("text", "") if isinstance(block, dict) else str(block) for block in content)
+    try:
+        data = json.loads(content)
+    except ValueError:
+        return "Sorry, I couldn't read the weather data."
+    if "differences" in data:
+        return _summarize_comparison(data)
+    reports = [result.get("weather") for result in data.get("results", [])] if "results" in data else [data]
+    sentences = []
+    for report in reports:
+        if not report or "error" in report:
+            sentences.append("I couldn't get the weather for one of those locations.")
+            continue
+        current = report.get("current_weather", {})
+        sentences.append(
+            f"In {report.get('location')} it's {current.get('description')} "
+            f"at {current.get('temperature_celsius')}."
+        )
+    return " ".join(sentences)
+
+
+def _summarize_comparison(data: dict) -> str:
+    temp_unit = data.get("units", {}).get("temp", "")
+    sentences = [f"In {place['location']} it's {place['desc']} at {place['temp']}{temp_unit}."
+                 for place in data.get("locations", [])]
+    extremes = data.get("extremes")
+    if extremes:
+        sentences.append(f"{extremes['warmest']} is the warmest.")
+    return " ".join(sentences)
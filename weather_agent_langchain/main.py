@@ -1,22 +1,22 @@
+import argparse
 import asyncio
+import contextlib
 import os
 import shlex
-from mcp import ClientSession, StdioServerParameters
-from mcp.client.stdio import stdio_client
-
-from langgraph.graph import StateGraph, START, END
-from langgraph.graph.message import AnyMessage, add_messages
-from langgraph.checkpoint.memory import MemorySaver
-from langgraph.prebuilt import tools_condition, ToolNode
-from typing import Annotated, List
-from typing_extensions import TypedDict
-
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+import statistics
+import sys
+import time
+import pathlib
 
-from langchain_mcp_adapters.tools import load_mcp_tools
+# agent_startup.py is shared by both agents and lives in the repository root
+sys.path.append(str(pathlib.Path(__file__).parent.parent))
+from agent_startup import StartupProfile, ainput
 from dotenv import load_dotenv
-import pathlib
+from fast_path import FastPathRouter
+
+# The MCP client, LangGraph/LangChain and the checkpointer are imported lazily:
+# they take over a second to load, and that time is overlapped with starting the
+# MCP server instead of delaying the prompt (see --profile-startup)
 
 # Load environment variables from the parent directory's .env file
 env_path = pathlib.Path(__file__).parent.parent / '.env'
@@ -24,53 +24,95 @@ load_dotenv(env_path)
 
 # MCP server launch config
 mcp_server_path = pathlib.Path(__file__).parent.parent / 'mcp_server' / 'main.py'
-server_params = StdioServerParameters(
-    command="python",
-    args=[str(mcp_server_path)]
-)
-
-# LangGraph state definition
-class State(TypedDict):
-    messages: Annotated[List[AnyMessage], add_messages]
-
-
-async def create_graph(session):
-    # Load tools from MCP server
-    tools = await load_mcp_tools(session)
-
-    # LLM configuration 
-    google_api_key = os.getenv("GOOGLE_GEMINI_API_KEY")
-    if not google_api_key:
-        raise ValueError("GOOGLE_GEMINI_API_KEY environment variable is not set")
-    
-    llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash", temperature=0, google_api_key=google_api_key)
-    llm_with_tools = llm.bind_tools(tools)
-
-    # Prompt template with user/assistant chat only
-    prompt_template = ChatPromptTemplate.from_messages([
-        ("system", "You are a helpful assistant that uses tools to get the current weather for a location."),
-        MessagesPlaceholder("messages")
-    ])
-
-    chat_llm = prompt_template | llm_with_tools
-
-    # Define chat node
-    def chat_node(state: State) -> State:
-        state["messages"] = chat_llm.invoke({"messages": state["messages"]})
-        return state
-
-    # Build LangGraph with tool routing
-    graph = StateGraph(State)
-    graph.add_node("chat_node", chat_node)
-    graph.add_node("tool_node", ToolNode(tools=tools))
-    graph.add_edge(START, "chat_node")
-    graph.add_conditional_edges("chat_node", tools_condition, {
-        "tools": "tool_node",
-        "__end__": END
-    })
-    graph.add_edge("tool_node", "chat_node")
-
-    return graph.compile(checkpointer=MemorySaver())
+server_command = "python"
+server_args = [str(mcp_server_path)]
+
+
+@contextlib.asynccontextmanager
+async def connect_to_server(server_url: str | None):
+    """
+    Opens the MCP transport: a shared server over HTTP when a URL is given
+    (e.g. http://127.0.0.1:8000/mcp, or .../sse for SSE), otherwise a private
+    stdio subprocess.
+    """
+    if not server_url:
+        from mcp import StdioServerParameters
+        from mcp.client.stdio import stdio_client
+        async with stdio_client(StdioServerParameters(command=server_command, args=server_args)) as (read, write):
+            yield read, write
+    elif server_url.rstrip("/").endswith("/sse"):
+        from mcp.client.sse import sse_client
+        async with sse_client(server_url) as (read, write):
+            yield read, write
+    else:
+        from mcp.client.streamable_http import streamablehttp_client
+        async with streamablehttp_client(server_url) as (read, write, _):
+            yield read, write
+
+
+def chunk_text(chunk) -> str:
+    """Text of a streamed message chunk (Gemini may send a list of content parts)"""
+    content = chunk.content
+    if isinstance(content, str):
+        return content
+    return "".join(
+        part.get("text", "") if isinstance(part, dict) else str(part)
+        for part in content
+    )
+
+
+async def stream_agent_response(agent, message: str, config: dict, pinned: dict | None = None) -> dict:
+    """
+    Runs one agent turn and prints the answer token by token as it arrives.
+    `pinned` adds resource digests to the conversation's pinned context.
+
+    Returns:
+        Timings in seconds: "ttft" (time to first printed token, None if
+        nothing was streamed) and "total".
+    """
+    started = time.perf_counter()
+    first_token_at = None
+
+    inputs = {"messages": [("user", message)]}
+    if pinned:
+        inputs["pinned"] = pinned
+    async for event in agent.astream_events(inputs, config=config, version="v2"):
+        kind = event["event"]
+        if kind == "on_tool_start":
+            # Let the user know why the answer is taking a moment
+            print(f"  (calling {event['name']}...)", flush=True)
+        elif kind == "on_chat_model_stream" and event["metadata"].get("langgraph_node") == "chat_node":
+            text = chunk_text(event["data"]["chunk"])
+            if not text:
+                continue  # Tool-call chunks carry no text
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+                sys.stdout.write("AI: ")
+            sys.stdout.write(text)
+            sys.stdout.flush()
+
+    if first_token_at is None:
+        # The model didn't stream (or answered with no text); show the final message instead
+        state = await agent.aget_state(config)
+        print("AI:", state.values["messages"][-1].content)
+    else:
+        print()
+
+    return {
+        "ttft": first_token_at - started if first_token_at is not None else None,
+        "total": time.perf_counter() - started,
+    }
+
+
+def latency_stats(samples: dict) -> dict:
+    """Median/p95 (ms) of the recorded time-to-first-token and total latencies"""
+    stats = {}
+    for name, values in samples.items():
+        if values:
+            ordered = sorted(values)
+            stats[f"{name}_median_ms"] = round(statistics.median(ordered) * 1000, 1)
+            stats[f"{name}_p95_ms"] = round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 1)
+    return stats
 
 
 async def handle_resource(session, command: str) -> str | None:
@@ -143,99 +185,242 @@ async def list_resources(session):
         print(f"Error fetching resources: {e}")
 
 # Entry point
-async def main():
-    async with stdio_client(server_params) as (read, write):
-        async with ClientSession(read, write) as session:
-            await session.initialize()
+def import_agent_stack(with_checkpointer: bool, with_llm: bool, profile: StartupProfile):
+    """Imports the LangGraph/LangChain stack and creates the LLM client (run on a worker thread)"""
+    with profile.span("import LangGraph + LangChain (thread)"):
+        import graph
+        import history
+    checkpointer_module = None
+    if with_checkpointer:
+        with profile.span("import SQLite checkpointer (thread)"):
+            import checkpointer as checkpointer_module
+    llm = None
+    if with_llm:
+        with profile.span("import + create Gemini client (thread)"):
+            llm = graph.create_llm()
+    return graph, history, checkpointer_module, llm
+
+
+class AgentStartup:
+    """
+    Starts the MCP session and builds the agent in the background, so the REPL
+    prompt can be shown right away. The MCP server boots in its own process
+    while the agent stack is imported on a worker thread.
+
+    Args:
+        server_url: Shared MCP server URL, or None for a private stdio server.
+        history_tokens: Token budget for the conversation history.
+        checkpoint_db: SQLite checkpoint file, or None to keep conversations in memory.
+        profile: Startup timeline recorder.
+    """
 
-            agent = await create_graph(session)
+    def __init__(self, server_url: str | None, history_tokens: int, checkpoint_db: str | None,
+                 profile: StartupProfile):
+        self.server_url = server_url
+        self.history_tokens = history_tokens
+        self.checkpoint_db = checkpoint_db
+        self.profile = profile
+        self._ready = asyncio.get_running_loop().create_future()
+        self._shutdown = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        profile = self.profile
+        try:
+            # The MCP transports' contexts must be entered and exited in this same task
+            async with contextlib.AsyncExitStack() as stack:
+                with profile.span("import MCP client"):
+                    from mcp import ClientSession
+                imports = asyncio.create_task(asyncio.to_thread(
+                    import_agent_stack, self.checkpoint_db is not None, True, profile
+                ))
+                with profile.span("start MCP server + initialize session"):
+                    read, write = await stack.enter_async_context(connect_to_server(self.server_url))
+                    session = await stack.enter_async_context(ClientSession(read, write))
+                    await session.initialize()
+                graph, history, checkpointer_module, llm = await imports
+
+                checkpointer = None
+                if checkpointer_module:
+                    with profile.span("open checkpoint database"):
+                        checkpointer = await stack.enter_async_context(
+                            checkpointer_module.open_checkpointer(self.checkpoint_db)
+                        )
+                with profile.span("load MCP tools + compile graph"):
+                    window = history.ConversationWindow(max_tokens=self.history_tokens)
+                    agent = await graph.create_graph(session, window, checkpointer, llm)
+
+                profile.mark("agent ready")
+                profile.report()
+                self._ready.set_result((session, agent, checkpointer))
+                await self._shutdown.wait()
+        except Exception as e:
+            if not self._ready.done():
+                self._ready.set_exception(e)
+            else:
+                raise
+
+    async def wait(self):
+        """Returns (session, agent, checkpointer) once startup has finished"""
+        if not self._ready.done():
+            print("(still starting up...)")
+        return await self._ready
+
+    async def close(self):
+        self._shutdown.set()
+        with contextlib.suppress(Exception):
+            await self._task
+
+
+async def main(server_url: str | None = None, fast_path_threshold: float | None = None,
+               show_latency: bool = False, history_tokens: int = 4000, pinned_tokens: int = 1500,
+               checkpoint_db: str | None = None, thread_id: str = "weather-session",
+               profile_startup: bool = False):
+    profile = StartupProfile(profile_startup)
+    startup = AgentStartup(server_url, history_tokens, checkpoint_db, profile)
+    try:
+        await run_repl(startup, fast_path_threshold, show_latency, pinned_tokens, thread_id, profile)
+    finally:
+        await startup.close()
+
+
+async def run_repl(startup: AgentStartup, fast_path_threshold: float | None, show_latency: bool,
+                   pinned_tokens: int, thread_id: str, profile: StartupProfile):
+    config = {"configurable": {"thread_id": thread_id}}
+    session = agent = None
+
+    # Optional deterministic router that answers simple weather questions without the LLM
+    fast_path = FastPathRouter(fast_path_threshold) if fast_path_threshold is not None else None
+    # Per-turn latencies of LLM answers (perceived latency is time to first token)
+    latencies = {"ttft": [], "total": []}
+    # Resource digests waiting to be pinned with the next agent turn
+    pending_pins = {}
+
+    print("Weather MCP agent is ready.")
+    # Add instructions for the new prompt commands
+    print("Type a question, or use one of the following commands:")
+    print("  /prompts                           - to list available prompts")
+    print("  /prompt <prompt_name> \"args\"...  - to run a specific prompt")
+    print("  /resources                       - to list available resources")
+    print("  /resource <resource_uri>         - to load a resource for the agent")
+    print("  /stats                           - to show response latency statistics")
+    profile.mark("prompt ready")
+
+    while True:
+        # This variable will hold the final message to be sent to the agent
+        message_to_agent = ""
+        
+        try:
+            user_input = (await ainput("\nYou: ")).strip()
+        except (EOFError, KeyboardInterrupt):
+            print("\nGoodbye!")
+            break
             
-            print("Weather MCP agent is ready.")
-            # Add instructions for the new prompt commands
-            print("Type a question, or use one of the following commands:")
-            print("  /prompts                           - to list available prompts")
-            print("  /prompt <prompt_name> \"args\"...  - to run a specific prompt")
-            print("  /resources                       - to list available resources")
-            print("  /resource <resource_uri>         - to load a resource for the agent")
-
-            while True:
-                # This variable will hold the final message to be sent to the agent
-                message_to_agent = ""
-                
-                try:
-                    user_input = input("\nYou: ").strip()
-                except (EOFError, KeyboardInterrupt):
-                    print("\nGoodbye!")
-                    break
-                    
-                if user_input.lower() in {"exit", "quit", "q"}:
-                    print("Goodbye!")
-                    break
-
-                # --- Command Handling Logic ---
-                if user_input.lower() == "/prompts":
-                    await list_prompts(session)
-                    continue # Command is done, loop back for next input
-
-                elif user_input.startswith("/prompt"):
-                    # The handle_prompt function now returns the prompt text or None
-                    prompt_text = await handle_prompt(session, user_input)
-                    if prompt_text:
-                        message_to_agent = prompt_text
-                    else:
-                        # If prompt fetching failed, loop back for next input
-                        continue
-                elif user_input.lower() == "/resources":
-                    await list_resources(session)
-                    continue # Command is done, loop back for next input
-
-                elif user_input.startswith("/resource"):
-                    # Fetch the resource content using our new function
-                    resource_content = await handle_resource(session, user_input)
-
-                    if resource_content:
-                        # Ask the user what action to take on the loaded content
-                        action_prompt = input(
-                            "Resource loaded. What should I do with this content? "
-                            "(Press Enter to just save to context)\n> "
-                        ).strip()
-                        
-                        # If user provides an action, combine it with the resource content
-                        if action_prompt:
-                            message_to_agent = f"""
-                            CONTEXT from a loaded resource:
-                            ---
-                            {resource_content}
-                            ---
-                            TASK: {action_prompt}
-                            """
-                        # If user provides no action, create a default message to save the context
-                        else:
-                            print("No action specified. Adding resource content to conversation memory...")
-                            message_to_agent = f"""
-                            Please remember the following context for our conversation. Just acknowledge that you have received it.
-                            ---
-                            CONTEXT:
-                            {resource_content}
-                            ---
-                            """
+        if user_input.lower() in {"exit", "quit", "q"}:
+            print("Goodbye!")
+            break
+
+        # Everything but /stats needs the MCP session and the agent (started in the background)
+        if agent is None and user_input.lower() != "/stats":
+            try:
+                session, agent, checkpointer = await startup.wait()
+            except Exception as e:
+                print(f"Error: the agent could not start: {e}")
+                break
+            if checkpointer:
+                saved = await agent.aget_state(config)
+                if saved.values.get("messages"):
+                    print(f"Resuming conversation '{thread_id}' ({len(saved.values['messages'])} messages).")
+
+        # --- Command Handling Logic ---
+        if user_input.lower() == "/stats":
+            stats = latency_stats(latencies)
+            if fast_path:
+                stats.update(fast_path.stats())
+            if not stats:
+                print("  No answers yet.")
+            for name, value in stats.items():
+                print(f"  {name}: {value}")
+            continue
+
+        elif user_input.lower() == "/prompts":
+            await list_prompts(session)
+            continue # Command is done, loop back for next input
+
+        elif user_input.startswith("/prompt"):
+            # The handle_prompt function now returns the prompt text or None
+            prompt_text = await handle_prompt(session, user_input)
+            if prompt_text:
+                message_to_agent = prompt_text
+            else:
+                # If prompt fetching failed, loop back for next input
+                continue
+        elif user_input.lower() == "/resources":
+            await list_resources(session)
+            continue # Command is done, loop back for next input
+
+        elif user_input.startswith("/resource"):
+            # Fetch the resource content using our new function
+            resource_content = await handle_resource(session, user_input)
+
+            if resource_content:
+                # The resource is pinned as a compact digest in the system prompt rather than
+                # pasted into the history, so later turns don't resend the whole payload
+                resource_uri = shlex.split(user_input)[1]
+                from history import resource_digest
+                pending_pins[resource_uri] = resource_digest(resource_uri, resource_content, pinned_tokens)
+
+                # Ask the user what action to take on the loaded content
+                action_prompt = (await ainput(
+                    "Resource loaded. What should I do with this content? "
+                    "(Press Enter to just save to context)\n> "
+                )).strip()
                 
+                # If user provides an action, run it against the pinned context
+                if action_prompt:
+                    message_to_agent = f"Using the loaded context from {resource_uri}: {action_prompt}"
+                # If user provides no action, keep the context for the next question
                 else:
-                    # For a normal chat message, the message is just the user's input
-                    message_to_agent = user_input
-
-                # Final agent invocation
-                # All paths (regular chat or successful prompt) now lead to this single block
-                if message_to_agent:
-                    try:
-                        # LangGraph expects a list of messages
-                        response = await agent.ainvoke(
-                            {"messages": [("user", message_to_agent)]},
-                            config={"configurable": {"thread_id": "weather-session"}}
-                        )
-                        print("AI:", response["messages"][-1].content)
-                    except Exception as e:
-                        print("Error:", e)
+                    print("No action specified. The resource will be added to the conversation context.")
+                    continue
+        
+        else:
+            # For a normal chat message, the message is just the user's input
+            message_to_agent = user_input
+
+            # Simple weather questions can be answered without an LLM round-trip
+            if fast_path:
+                started = time.perf_counter()
+                answer = await fast_path.try_answer(session, user_input)
+                if answer:
+                    print("AI:", answer)
+                    # Keep the exchange in memory so follow-up questions have context
+                    from langchain_core.messages import AIMessage, HumanMessage
+                    update = {"messages": [HumanMessage(user_input), AIMessage(answer)]}
+                    if pending_pins:
+                        update["pinned"] = pending_pins
+                        pending_pins = {}
+                    await agent.aupdate_state(config, update, as_node="chat_node")
+                    fast_path.record("fast_path", time.perf_counter() - started)
+                    continue
+
+        # Final agent invocation
+        # All paths (regular chat or successful prompt) now lead to this single block
+        if message_to_agent:
+            try:
+                # Stream the answer token by token instead of waiting for the full response
+                timings = await stream_agent_response(agent, message_to_agent, config, pending_pins)
+                pending_pins = {}
+                if timings["ttft"] is not None:
+                    latencies["ttft"].append(timings["ttft"])
+                latencies["total"].append(timings["total"])
+                if show_latency:
+                    ttft = f"{timings['ttft']:.2f}s" if timings["ttft"] is not None else "n/a"
+                    print(f"  [first token {ttft}, total {timings['total']:.2f}s]")
+                if fast_path:
+                    fast_path.record("llm_path", timings["total"])
+            except Exception as e:
+                print("\nError:", e)
 
 
 async def list_prompts(session):
@@ -320,4 +505,34 @@ async def handle_prompt(session, command: str) -> str | None:
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="LangGraph weather agent")
+    parser.add_argument("--server-url", default=os.getenv("WEATHER_MCP_URL"),
+                        help="URL of a shared MCP server (default: spawn a private stdio server)")
+    parser.add_argument("--fast-path", action="store_true",
+                        default=os.getenv("AGENT_FAST_PATH", "0") == "1",
+                        help="Answer simple weather questions directly, without the LLM")
+    parser.add_argument("--fast-path-threshold", type=float,
+                        default=float(os.getenv("AGENT_FAST_PATH_THRESHOLD", "0.8")),
+                        help="Minimum router confidence (0-1) for the fast path")
+    parser.add_argument("--show-latency", action="store_true",
+                        default=os.getenv("AGENT_SHOW_LATENCY", "0") == "1",
+                        help="Print time-to-first-token and total time after each answer")
+    parser.add_argument("--history-tokens", type=int,
+                        default=int(os.getenv("AGENT_HISTORY_TOKENS", "4000")),
+                        help="Token budget for the conversation history sent to the model")
+    parser.add_argument("--pinned-tokens", type=int,
+                        default=int(os.getenv("AGENT_PINNED_TOKENS", "1500")),
+                        help="Token budget for each loaded resource's pinned digest")
+    parser.add_argument("--checkpoint-db", default=os.getenv("AGENT_CHECKPOINT_DB"),
+                        help="SQLite file for conversation checkpoints (default: keep them in memory)")
+    parser.add_argument("--thread-id", default=os.getenv("AGENT_THREAD_ID", "weather-session"),
+                        help="Conversation to start or resume")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="Print a timeline of imports and initialization once the agent is ready")
+    args = parser.parse_args()
+    try:
+        asyncio.run(main(args.server_url, args.fast_path_threshold if args.fast_path else None,
+                         args.show_latency, args.history_tokens, args.pinned_tokens,
+                         args.checkpoint_db, args.thread_id, args.profile_startup))
+    except KeyboardInterrupt:
+        print("\nGoodbye!")
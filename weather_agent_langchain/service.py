@@ -0,0 +1,266 @@
+"""
+Multi-session HTTP/WebSocket service for the LangGraph weather agent.
+
+Instead of one process (and one private MCP server) per user, the service
+compiles the agent graph once, keeps one MCP ClientSession that every
+conversation's tool calls are multiplexed over, and gives each caller their
+own LangGraph thread ("user:<user_id>"). Turns for the same user run one at
+a time; turns for different users run concurrently, up to --max-in-flight.
+Up to --max-queued further turns wait for a slot; beyond that the service
+answers 503 with Retry-After instead of queueing without bound.
+
+Endpoints:
+    POST /chat          {"user_id": "...", "message": "..."} -> {"answer", "thread_id", "latency_ms", ...}
+    WS   /ws/{user_id}  send a question as text; receive {"type": "token", "text": ...}
+                        messages, then {"type": "done", "ttft_ms": ..., "latency_ms": ...}
+    GET  /health        in-flight/queued turn counts and totals
+
+Usage:
+    python weather_agent_langchain/service.py --port 8080
+    python weather_agent_langchain/service.py --server-url http://127.0.0.1:8000/mcp --checkpoint-db sessions.sqlite
+    python weather_agent_langchain/service.py --llm-standin   # no Gemini calls, for load tests
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import re
+import time
+import weakref
+
+from mcp import ClientSession
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route, WebSocketRoute
+from starlette.websockets import WebSocket, WebSocketDisconnect, WebSocketState
+
+from checkpointer import open_checkpointer
+from graph import create_graph
+from history import ConversationWindow
+from main import chunk_text, connect_to_server
+
+USER_ID = re.compile(r"^[A-Za-z0-9_.@-]{1,128}$")
+
+
+class ServiceOverloaded(Exception):
+    """Raised when both the in-flight slots and the wait queue are full"""
+
+
+class AgentService:
+    """
+    Runs agent turns for many users over one compiled graph.
+
+    Args:
+        agent: Compiled LangGraph agent (with a checkpointer).
+        max_in_flight: Turns processed concurrently.
+        max_queued: Turns allowed to wait for a slot before new ones are rejected.
+    """
+
+    def __init__(self, agent, max_in_flight: int = 32, max_queued: int = 128):
+        self.agent = agent
+        self.max_in_flight = max_in_flight
+        self.max_queued = max_queued
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._user_locks = weakref.WeakValueDictionary()
+        self.admitted = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    @staticmethod
+    def thread_config(user_id: str) -> dict:
+        return {"configurable": {"thread_id": f"user:{user_id}"}}
+
+    @contextlib.asynccontextmanager
+    async def turn(self, user_id: str):
+        """Admission control: reject when full, otherwise wait for a slot and the user's lock"""
+        if self.admitted >= self.max_in_flight + self.max_queued:
+            self.rejected += 1
+            raise ServiceOverloaded()
+
+        lock = self._user_locks.get(user_id)
+        if lock is None:
+            lock = self._user_locks[user_id] = asyncio.Lock()
+
+        self.admitted += 1
+        try:
+            # One turn per thread at a time, so a user's checkpoints stay linear
+            async with lock, self._slots:
+                self.in_flight += 1
+                try:
+                    yield
+                    self.completed += 1
+                except Exception:
+                    self.failed += 1
+                    raise
+                finally:
+                    self.in_flight -= 1
+        finally:
+            self.admitted -= 1
+
+    async def ask(self, user_id: str, message: str) -> dict:
+        """Run one turn and return the final answer"""
+        started = time.perf_counter()
+        async with self.turn(user_id):
+            response = await self.agent.ainvoke({"messages": [("user", message)]}, self.thread_config(user_id))
+        return {
+            "answer": response["messages"][-1].content,
+            "thread_id": self.thread_config(user_id)["configurable"]["thread_id"],
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+
+    async def ask_stream(self, user_id: str, message: str):
+        """Run one turn, yielding answer text as it is generated"""
+        async with self.turn(user_id):
+            async for event in self.agent.astream_events(
+                {"messages": [("user", message)]}, self.thread_config(user_id), version="v2"
+            ):
+                if event["event"] == "on_chat_model_stream" and event["metadata"].get("langgraph_node") == "chat_node":
+                    text = chunk_text(event["data"]["chunk"])
+                    if text:
+                        yield text
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.admitted - self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "max_queued": self.max_queued,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+        }
+
+
+def _overloaded_response() -> JSONResponse:
+    return JSONResponse({"error": "Too many requests in flight, retry shortly"}, status_code=503,
+                        headers={"Retry-After": "1"})
+
+
+async def chat_endpoint(request: Request):
+    service = request.app.state.service
+    try:
+        body = await request.json()
+    except ValueError:
+        return JSONResponse({"error": "Body must be JSON"}, status_code=400)
+
+    user_id, message = str(body.get("user_id", "")), str(body.get("message", "")).strip()
+    if not USER_ID.match(user_id) or not message:
+        return JSONResponse({"error": "'user_id' (letters, digits, _.@-) and 'message' are required"},
+                            status_code=400)
+    try:
+        return JSONResponse(await service.ask(user_id, message))
+    except ServiceOverloaded:
+        return _overloaded_response()
+    except Exception as e:
+        return JSONResponse({"error": f"Agent error: {e}"}, status_code=500)
+
+
+async def websocket_endpoint(websocket: WebSocket):
+    service = websocket.app.state.service
+    user_id = websocket.path_params["user_id"]
+    if not USER_ID.match(user_id):
+        await websocket.close(code=1008)
+        return
+
+    await websocket.accept()
+    try:
+        while True:
+            message = (await websocket.receive_text()).strip()
+            if not message:
+                continue
+            started = time.perf_counter()
+            first_token_at = None
+            try:
+                # Closing the stream right away releases the user's turn and in-flight slot on disconnect
+                async with contextlib.aclosing(service.ask_stream(user_id, message)) as stream:
+                    async for text in stream:
+                        if first_token_at is None:
+                            first_token_at = time.perf_counter()
+                        await websocket.send_json({"type": "token", "text": text})
+            except WebSocketDisconnect:
+                raise
+            except ServiceOverloaded:
+                await websocket.send_json({"type": "error", "error": "Too many requests in flight, retry shortly"})
+                continue
+            except Exception as e:
+                if websocket.application_state != WebSocketState.CONNECTED:
+                    return  # send_json failed on a socket that is already closed
+                await websocket.send_json({"type": "error", "error": f"Agent error: {e}"})
+                continue
+            await websocket.send_json({
+                "type": "done",
+                "ttft_ms": round((first_token_at - started) * 1000, 1) if first_token_at else None,
+                "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+            })
+    except WebSocketDisconnect:
+        pass
+
+
+async def health_endpoint(request: Request):
+    return JSONResponse(request.app.state.service.stats())
+
+
+def create_app(server_url: str | None = None, checkpoint_db: str | None = None, max_in_flight: int = 32,
+               max_queued: int = 128, history_tokens: int = 4000, llm=None) -> Starlette:
+    """Build the ASGI app; the MCP session and graph are set up in its lifespan"""
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        async with contextlib.AsyncExitStack() as stack:
+            read, write = await stack.enter_async_context(connect_to_server(server_url))
+            session = await stack.enter_async_context(ClientSession(read, write))
+            await session.initialize()
+            checkpointer = (await stack.enter_async_context(open_checkpointer(checkpoint_db))
+                            if checkpoint_db else None)
+            agent = await create_graph(session, ConversationWindow(max_tokens=history_tokens), checkpointer, llm)
+            app.state.service = AgentService(agent, max_in_flight, max_queued)
+            yield
+
+    return Starlette(
+        routes=[
+            Route("/chat", chat_endpoint, methods=["POST"]),
+            Route("/health", health_endpoint),
+            WebSocketRoute("/ws/{user_id}", websocket_endpoint),
+        ],
+        lifespan=lifespan,
+    )
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Multi-session HTTP/WebSocket service for the weather agent")
+    parser.add_argument("--host", default=os.getenv("AGENT_SERVICE_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("AGENT_SERVICE_PORT", "8080")))
+    parser.add_argument("--server-url", default=os.getenv("WEATHER_MCP_URL"),
+                        help="URL of a shared MCP server (default: spawn one stdio server for the service)")
+    parser.add_argument("--checkpoint-db", default=os.getenv("AGENT_CHECKPOINT_DB"),
+                        help="SQLite file for conversation checkpoints (default: keep them in memory)")
+    parser.add_argument("--max-in-flight", type=int,
+                        default=int(os.getenv("AGENT_SERVICE_MAX_IN_FLIGHT", "32")),
+                        help="Agent turns processed concurrently")
+    parser.add_argument("--max-queued", type=int,
+                        default=int(os.getenv("AGENT_SERVICE_MAX_QUEUED", "128")),
+                        help="Turns that may wait for a slot before requests get 503")
+    parser.add_argument("--history-tokens", type=int,
+                        default=int(os.getenv("AGENT_HISTORY_TOKENS", "4000")),
+                        help="Token budget for the conversation history sent to the model")
+    parser.add_argument("--llm-standin", action="store_true",
+                        default=os.getenv("AGENT_LLM_STANDIN", "0") == "1",
+                        help="Use the scripted stand-in model instead of Gemini (load tests)")
+    parser.add_argument("--llm-standin-latency-ms", type=float,
+                        default=float(os.getenv("AGENT_LLM_STANDIN_LATENCY_MS", "0")),
+                        help="Delay per stand-in model call")
+    args = parser.parse_args()
+
+    llm = None
+    if args.llm_standin:
+        from llm_standin import StandinChatModel
+        llm = StandinChatModel(latency_ms=args.llm_standin_latency_ms)
+
+    app = create_app(args.server_url, args.checkpoint_db, args.max_in_flight, args.max_queued,
+                     args.history_tokens, llm)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")